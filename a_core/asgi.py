@@ -3,6 +3,10 @@ ASGI config for a_core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Run it with an ASGI server, e.g. ``uvicorn a_core.asgi:application``. The
+request event streams (request_app.views.RequestEventsView) are async views
+and only stay cheap to hold open when served this way.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
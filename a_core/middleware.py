@@ -0,0 +1,240 @@
+"""
+Static and media file serving that does not need a separate web server.
+
+FileServingMiddleware answers GET/HEAD requests under STATIC_URL (from
+STATIC_ROOT, i.e. after collectstatic) and MEDIA_URL (from MEDIA_ROOT)
+before sessions, auth and the URL resolver run:
+
+  * precompressed `.br` / `.gz` siblings are sent when the client accepts them
+  * every response carries an ETag; If-None-Match / If-Modified-Since give 304
+  * hashed static names and content-hashed media blobs are `immutable`
+  * single `Range: bytes=` requests get 206 for uncompressed responses
+  * whole files go out as FileResponse, so the WSGI server can use
+    wsgi.file_wrapper (sendfile); for media, X-Sendfile / X-Accel-Redirect
+    can hand the transfer to the front-end server entirely
+  * media is user-uploaded: only MEDIA_TYPES are served (anything else is a
+    404), always with nosniff and a CSP that forbids scripts and subresources
+
+Configured through settings.FILE_SERVING:
+    STATIC           serve STATIC_URL from STATIC_ROOT
+    MEDIA            serve MEDIA_URL from MEDIA_ROOT
+    MAX_AGE          Cache-Control max-age for files that are not content-hashed
+    SENDFILE         None, "x-sendfile" (Apache / lighttpd) or "x-accel-redirect" (nginx)
+    SENDFILE_PREFIX  internal nginx location MEDIA_ROOT is exposed under
+    MEDIA_TYPES      content types media may be served as
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from a_core.utils.storage import is_blob
+
+DEFAULTS = {
+    "STATIC": True,
+    "MEDIA": True,
+    "MAX_AGE": 60,
+    "SENDFILE": None,
+    "SENDFILE_PREFIX": "/protected-media/",
+    "MEDIA_TYPES": ("image/jpeg", "image/png", "image/gif", "image/webp"),
+}
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# name.<12 hex chars>.ext, as written by ManifestStaticFilesStorage
+HASHED_STATIC_RE = re.compile(r"\.[0-9a-f]{12}\.[^/.]+$")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# (Accept-Encoding token, file suffix), best first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+CHUNK_SIZE = 64 * 1024
+# sent with every media response, so an upload can never run as a page
+MEDIA_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "Content-Security-Policy": "default-src 'none'; sandbox",
+}
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, "FILE_SERVING", {})}
+
+
+def _accepts(request, token):
+    accepted = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    return any(part.split(";")[0].strip() == token for part in accepted.split(","))
+
+
+def _read_range(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+class FileServingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = _config()
+        self.config = config
+        self.mounts = []  # (url prefix, root, kind)
+        if config["STATIC"] and settings.STATIC_URL and settings.STATIC_ROOT:
+            self.mounts.append((self._prefix(settings.STATIC_URL), str(settings.STATIC_ROOT), "static"))
+        if config["MEDIA"] and settings.MEDIA_URL and settings.MEDIA_ROOT:
+            self.mounts.append((self._prefix(settings.MEDIA_URL), str(settings.MEDIA_ROOT), "media"))
+
+    @staticmethod
+    def _prefix(url):
+        # only site-relative URLs can be served from here
+        return url if url.startswith("/") else f"/{url}"
+
+    def __call__(self, request):
+        if request.method in ("GET", "HEAD"):
+            for prefix, root, kind in self.mounts:
+                if request.path_info.startswith(prefix):
+                    response = self.serve(request, root, request.path_info[len(prefix):], kind)
+                    if response is not None:
+                        return response
+        return self.get_response(request)
+
+    # -----------------------
+    # Serving
+    # -----------------------
+    def serve(self, request, root, name, kind):
+        try:
+            path = safe_join(root, name)
+        except (SuspiciousFileOperation, ValueError):
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+
+        content_type, _ = mimetypes.guess_type(path)
+        content_type = content_type or "application/octet-stream"
+        if kind == "media" and content_type not in self.config["MEDIA_TYPES"]:
+            return None
+        immutable = is_blob(name) if kind == "media" else bool(HASHED_STATIC_RE.search(name))
+
+        # Precompressed variant, if one exists and the client takes it
+        encoding = None
+        if kind == "static":
+            for token, suffix in ENCODINGS:
+                if _accepts(request, token):
+                    try:
+                        variant_st = os.stat(path + suffix)
+                    except OSError:
+                        continue
+                    path, st, encoding = path + suffix, variant_st, token
+                    break
+
+        etag = quote_etag(f"{st.st_mtime_ns:x}-{st.st_size:x}{'-' + encoding if encoding else ''}")
+        headers = {
+            "ETag": etag,
+            "Last-Modified": http_date(st.st_mtime),
+            "Cache-Control": IMMUTABLE if immutable else f"public, max-age={self.config['MAX_AGE']}",
+        }
+        if kind == "static":
+            headers["Vary"] = "Accept-Encoding"
+        else:
+            headers.update(MEDIA_HEADERS)
+
+        if self._not_modified(request, etag, st.st_mtime):
+            response = HttpResponseNotModified()
+            for key, value in headers.items():
+                response[key] = value
+            return response
+
+        if encoding is None:
+            headers["Accept-Ranges"] = "bytes"
+            byte_range = self._byte_range(request, etag, st.st_size)
+            if byte_range == "unsatisfiable":
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{st.st_size}"
+                return response
+            if byte_range is not None:
+                start, end = byte_range
+                length = end - start + 1
+                response = StreamingHttpResponse(
+                    _read_range(path, start, length) if request.method == "GET" else [],
+                    status=206,
+                    content_type=content_type,
+                )
+                response["Content-Range"] = f"bytes {start}-{end}/{st.st_size}"
+                response["Content-Length"] = str(length)
+                for key, value in headers.items():
+                    response[key] = value
+                return response
+
+        if kind == "media" and self.config["SENDFILE"]:
+            response = self._sendfile(path, name, content_type)
+        else:
+            if request.method == "HEAD":
+                response = HttpResponse(content_type=content_type)
+            else:
+                response = FileResponse(open(path, "rb"), content_type=content_type)
+                # FileResponse names the on-disk file (e.g. style.css.gz); the URL is enough
+                del response["Content-Disposition"]
+            response["Content-Length"] = str(st.st_size)
+        if encoding:
+            response["Content-Encoding"] = encoding
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    def _sendfile(self, path, name, content_type):
+        response = HttpResponse(content_type=content_type)
+        if self.config["SENDFILE"] == "x-accel-redirect":
+            response["X-Accel-Redirect"] = self.config["SENDFILE_PREFIX"].rstrip("/") + "/" + name
+        else:
+            response["X-Sendfile"] = path
+        return response
+
+    @staticmethod
+    def _not_modified(request, etag, mtime):
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match is not None:
+            tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+        return since is not None and int(mtime) <= since
+
+    @staticmethod
+    def _byte_range(request, etag, size):
+        """
+        (start, end) for a single satisfiable range, "unsatisfiable", or None
+        for a full response (no header, If-Range mismatch, multiple ranges).
+        """
+        header = request.META.get("HTTP_RANGE", "").strip()
+        if not header:
+            return None
+        if_range = request.META.get("HTTP_IF_RANGE")
+        if if_range is not None and if_range.strip() != etag:
+            return None
+        match = RANGE_RE.match(header)
+        if not match:
+            return None
+        first, last = match.groups()
+        if not first and not last:
+            return None
+        if not first:
+            # suffix range: the last N bytes
+            length = int(last)
+            if length == 0:
+                return "unsatisfiable"
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or start > end:
+            return "unsatisfiable"
+        return start, end
@@ -10,9 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import importlib.util
 import os
+import sys
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -26,6 +30,8 @@ SECRET_KEY = 'django-insecure-t=@j3za4^1@12i@h0il-uw+(zip6-)y3w@)98$vw8u0k5xtsn-
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 ALLOWED_HOSTS = ['*']
 CSRF_TRUSTED_ORIGINS = ['https://8000-firebase-trustmanagement-1767157773363.cluster-udxxdyopu5c7cwhhtg6mmadhvs.cloudworkstations.dev']
 CORS_ORIGIN_WHITELIST = ['https://8000-firebase-trustmanagement-1767157773363.cluster-udxxdyopu5c7cwhhtg6mmadhvs.cloudworkstations.dev']
@@ -43,15 +49,19 @@ INSTALLED_APPS = [
     'account',
     'campaign',
     'request_app',
-    'donation_app'
+    'donation_app',
+    'audit',
+    'outbox',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'a_core.middleware.FileServingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'account.principal.PrincipalMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -75,6 +85,9 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'a_core.wsgi.application'
+# Serve with an ASGI server (e.g. `uvicorn a_core.asgi:application`) to get the
+# live request thread; under WSGI its event stream is switched off (204).
+ASGI_APPLICATION = 'a_core.asgi.application'
 
 
 # Database
@@ -84,10 +97,78 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN so concurrent writers queue on the
+            # busy timeout instead of failing with "database is locked".
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # A file, not shared-cache memory: shared cache has table-level locks
+        # that fail immediately, which breaks the concurrent transition tests.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Rendered public pages live in their own alias: local memory by default,
+# PAGE_CACHE_BACKEND=file shares them between worker processes on one host.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pages',
+    },
+    # session data for the cache and cached_db engines; with more than one
+    # worker process this must be a shared backend (memcached, redis)
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    },
+}
+if os.environ.get('PAGE_CACHE_BACKEND') == 'file':
+    CACHES['pages'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'pages',
+    }
+
+# The list version lives in ALIAS too: with locmem each process invalidates only
+# its own pages (others catch up within TTL); PAGE_CACHE_BACKEND=file shares them.
+PUBLIC_PAGE_CACHE = {
+    'ALIAS': 'pages',
+    'TTL': 60,          # seconds a rendered page is fresh
+    'STALE_TTL': 600,   # seconds a stale page may be served while one worker re-renders
+    'LOCK_TTL': 30,
+    'MISS_WAIT': 2,     # seconds a cold miss waits for the worker already rendering it
+}
+
+# Sessions. SESSION_BACKEND picks the engine:
+#   db              a django_session read on every request, a write on every login
+#   cached_db       reads from the 'sessions' cache, writes through to the table
+#   cache           the 'sessions' cache only; logouts everyone if it is flushed
+#   signed_cookies  no server-side state; sessions can't be revoked individually
+# Expired rows of the db engines are removed by `manage.py purge_expired_sessions`
+# (run it from cron), never during requests.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('SESSION_BACKEND', 'cached_db')]
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Cached permission flags of the logged-in user (request.principal, see account/principal.py)
+AUTH_PRINCIPAL = {
+    'CACHE': 'default',
+    'TTL': 300,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 AUTH_USER_MODEL = "account.CustomUser"
@@ -108,6 +189,29 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing policy (see account/hashers.py). The preferred hasher comes
+# first; the rest only verify existing hashes, which are upgraded on login.
+PASSWORD_HASHING = {
+    'POLICY': os.environ.get('PASSWORD_HASHING_POLICY', 'scrypt'),
+    'SCRYPT': {'WORK_FACTOR': 2 ** 14, 'BLOCK_SIZE': 10, 'PARALLELISM': 4,  # 20 MiB per hash
+               'MAX_MEMORY': 32 * 1024 * 1024},
+}
+PASSWORD_HASHER_POLICIES = {
+    'scrypt': 'account.hashers.TunedScryptPasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'fast': 'django.contrib.auth.hashers.MD5PasswordHasher',   # test runs only
+}
+if importlib.util.find_spec('argon2') is None:  # optional argon2-cffi
+    if PASSWORD_HASHING['POLICY'] == 'argon2':
+        raise ImproperlyConfigured("PASSWORD_HASHING policy 'argon2' needs the argon2-cffi package.")
+    del PASSWORD_HASHER_POLICIES['argon2']
+_hasher_policy = 'fast' if TESTING else PASSWORD_HASHING['POLICY']
+PASSWORD_HASHERS = [PASSWORD_HASHER_POLICIES[_hasher_policy]] + [
+    hasher for policy, hasher in PASSWORD_HASHER_POLICIES.items()
+    if policy not in (_hasher_policy, 'fast')
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -128,6 +232,29 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR,  'staticfiles')
 STATICFILES_DIRS =[os.path.join(BASE_DIR, 'static')]
 
+# collectstatic writes hashed names plus .gz/.br siblings (brotli is optional);
+# development and tests keep the plain finders-backed storage.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG or TESTING
+            else 'a_core.utils.staticfiles.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+
+# Served by a_core.middleware.FileServingMiddleware
+FILE_SERVING = {
+    'STATIC': True,
+    'MEDIA': True,
+    'MAX_AGE': 60,              # seconds, for files whose name is not content-hashed
+    'SENDFILE': None,           # 'x-sendfile' or 'x-accel-redirect' to hand media to the front-end server
+    'SENDFILE_PREFIX': '/protected-media/',
+}
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -137,5 +264,75 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Throttles for the account endpoints (see account/ratelimit.py); rates are
+# "<requests>/<period>" with the period in s, m, h or d, e.g. "20/5m"
+RATELIMIT = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'PROXY_COUNT': 0,       # reverse proxies setting X-Forwarded-For in front of the app
+}
+RATELIMITS = {
+    'login': {'ip': '30/5m', 'email': '5/5m'},
+    'register': {'ip': '10/h'},
+    'resend_verification': {'ip': '10/h', 'email': '3/h'},
+    'password_reset': {'ip': '10/h', 'email': '3/h'},
+}
+
+# Account mail is queued in the outbox and delivered by `manage.py send_outbox`
+OUTBOX = {
+    'BATCH_SIZE': 50,       # messages sent per SMTP connection
+    'MAX_ATTEMPTS': 6,
+    'BACKOFF': 30,          # seconds before the first retry, doubling each time
+    'MAX_BACKOFF': 3600,
+    'LEASE': 300,           # seconds before a crashed worker's batch is retried
+    'DEDUPE_WINDOW': 300,   # seconds a repeat verification/reset mail is suppressed
+    # send on commit, in the request, without a worker; opt in for local runs with OUTBOX_EAGER=1
+    'EAGER': os.environ.get('OUTBOX_EAGER') == '1' and not TESTING,
+}
+
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+FX_RATES = {
+    'PIVOT': 'INR',         # FxRate.rate is the value of one unit in this currency
+    'CACHE_TTL': 300,       # seconds each process keeps the current rates
+    'MAX_AGE': 7,           # days before the latest rate counts as stale (system check campaign.W002)
+}
+if TESTING:
+    # test databases start without rates; FX tests load their own
+    SILENCED_SYSTEM_CHECKS = ['campaign.W001', 'campaign.W002']
+
+DONATION_INGEST = {
+    'SNAPSHOT_TTL': 30,     # seconds a campaign's donation rules are cached
+    'BATCH_SIZE': 500,      # rows per INSERT when importing donations in bulk
+}
+
+# Live request thread (request_app.events)
+REQUEST_EVENTS = {
+    'POLL_INTERVAL': 5,     # seconds; database fallback for multi-process deploys (None to disable)
+    'HEARTBEAT': 15,        # seconds between keep-alives when polling is disabled
+    'MAX_DURATION': 300,    # seconds before a stream closes and the browser reconnects
+    'RETRY': 3000,          # milliseconds the browser waits before reconnecting
+}
+
+# Uploads
+# Anything over 256 KiB is spooled to disk in chunks. The campaign form also puts
+# campaign.uploads.UploadBudgetHandler in front, so an over-budget gallery upload
+# never reaches the memory / temp-file handlers.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+GALLERY_UPLOAD_BUDGET = {
+    'MAX_FILES': 20,
+    'MAX_BYTES': 50 * 1024 * 1024,
+}
+IMAGE_RENDITIONS = {
+    'BACKGROUND': not TESTING,  # render after commit on a background thread (campaign.images)
+}
+
+# Campaign metrics
+# Raise instead of silently querying per row when amount_raised / donations_count /
+# donor_count are read without Campaign.objects.with_donation_stats().
+CAMPAIGN_METRICS_STRICT = TESTING
@@ -0,0 +1,266 @@
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+
+from account.models import CustomUser
+from campaign.models import Campaign
+from request_app.models import Request
+
+from .middleware import IMMUTABLE, FileServingMiddleware
+from .utils.pagination import KeysetPaginator
+from .utils.storage import ContentHashedStorage, is_blob
+
+
+class ContentHashedStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.storage = ContentHashedStorage(location=self.location)
+
+    def test_names_follow_content(self):
+        first = self.storage.save("uploads/photo.JPG", ContentFile(b"same bytes"))
+        second = self.storage.save("elsewhere/other.jpg", ContentFile(b"same bytes"))
+        third = self.storage.save("uploads/photo.jpg", ContentFile(b"new bytes"))
+        self.assertTrue(is_blob(first))
+        self.assertTrue(first.endswith(".jpg"))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+
+    def test_dedupe_hit_refreshes_the_blob_age(self):
+        name = self.storage.save("a.txt", ContentFile(b"content"))
+        old = time.time() - 7 * 24 * 3600
+        os.utime(self.storage.path(name), (old, old))
+        self.storage.save("b.txt", ContentFile(b"content"))
+        self.assertGreater(os.path.getmtime(self.storage.path(name)), old + 3600)
+
+    def test_blob_names_and_derived_files_are_stored_verbatim(self):
+        blob = self.storage.save("blobs/ab/abc_w320.webp", ContentFile(b"one"))
+        self.assertEqual(blob, "blobs/ab/abc_w320.webp")
+        self.storage.save(blob, ContentFile(b"two"))
+        with self.storage.open(blob) as f:
+            self.assertEqual(f.read(), b"two")
+
+        legacy = self.storage.save_derived("campaign/cover_image/x_w320.webp", ContentFile(b"three"))
+        self.assertEqual(legacy, "campaign/cover_image/x_w320.webp")
+        self.storage.save_derived(legacy, ContentFile(b"four"))
+        with self.storage.open(legacy) as f:
+            self.assertEqual(f.read(), b"four")
+
+    def test_delete_keeps_blobs(self):
+        name = self.storage.save("a.txt", ContentFile(b"shared"))
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.storage.purge(name)
+        self.assertFalse(self.storage.exists(name))
+
+
+class FileServingMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.write(self.static_root, "app.js", b"0123456789")
+        self.write(self.static_root, "app.js.gz", b"gzipped")
+        self.write(self.static_root, "app.js.br", b"brotli")
+        self.write(self.static_root, "app.0123456789ab.css", b"body{}")
+        self.write(self.media_root, "photo.png", b"media file")
+        self.write(os.path.dirname(self.static_root), os.path.basename(self.static_root) + "-secret.txt", b"secret")
+        self.addCleanup(os.remove, self.static_root + "-secret.txt")
+        override = override_settings(
+            STATIC_URL="/static/", STATIC_ROOT=self.static_root, MEDIA_URL="/media/", MEDIA_ROOT=self.media_root,
+            FILE_SERVING={"MAX_AGE": 60},
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.middleware = FileServingMiddleware(lambda request: HttpResponse("from the view", status=404))
+        self.factory = RequestFactory()
+
+    def write(self, root, name, content):
+        with open(os.path.join(root, name), "wb") as f:
+            f.write(content)
+
+    def get(self, path, method="get", **headers):
+        response = self.middleware(getattr(self.factory, method)(path, **headers))
+        self.addCleanup(response.close)
+        return response
+
+    def body(self, response):
+        return b"".join(response.streaming_content) if response.streaming else response.content
+
+    def test_serves_files_with_validators(self):
+        response = self.get("/static/app.js")
+        self.assertEqual((response.status_code, self.body(response)), (200, b"0123456789"))
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertTrue(response["ETag"])
+        self.assertEqual(self.get("/static/app.0123456789ab.css")["Cache-Control"], IMMUTABLE)
+        head = self.get("/media/photo.png", method="head")
+        self.assertEqual((head.status_code, head.content, head["Content-Length"]), (200, b"", "10"))
+        self.assertNotIn("Vary", head)
+
+    def test_conditional_requests(self):
+        etag = self.get("/static/app.js")["ETag"]
+        self.assertEqual(self.get("/static/app.js", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.get("/static/app.js", HTTP_IF_NONE_MATCH=f'"other", W/{etag}').status_code, 304)
+        self.assertEqual(self.get("/static/app.js", HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        mtime = os.path.getmtime(os.path.join(self.static_root, "app.js"))
+        self.assertEqual(self.get("/static/app.js", HTTP_IF_MODIFIED_SINCE=http_date(mtime + 60)).status_code, 304)
+        self.assertEqual(self.get("/static/app.js", HTTP_IF_MODIFIED_SINCE=http_date(mtime - 60)).status_code, 200)
+        # If-None-Match wins over If-Modified-Since
+        response = self.get("/static/app.js", HTTP_IF_NONE_MATCH='"other"', HTTP_IF_MODIFIED_SINCE=http_date(mtime + 60))
+        self.assertEqual(response.status_code, 200)
+
+    def test_byte_ranges(self):
+        for header, content_range, body in (
+            ("bytes=2-5", "bytes 2-5/10", b"2345"),
+            ("bytes=7-", "bytes 7-9/10", b"789"),
+            ("bytes=-3", "bytes 7-9/10", b"789"),
+            ("bytes=8-100", "bytes 8-9/10", b"89"),
+        ):
+            with self.subTest(header=header):
+                response = self.get("/static/app.js", HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response["Content-Range"], content_range)
+                self.assertEqual(response["Content-Length"], str(len(body)))
+                self.assertEqual(self.body(response), body)
+        for header in ("bytes=10-", "bytes=5-2", "bytes=-0"):
+            with self.subTest(header=header):
+                response = self.get("/static/app.js", HTTP_RANGE=header)
+                self.assertEqual((response.status_code, response["Content-Range"]), (416, "bytes */10"))
+        # multiple ranges and a stale If-Range get the whole file
+        self.assertEqual(self.get("/static/app.js", HTTP_RANGE="bytes=0-1,4-5").status_code, 200)
+        self.assertEqual(self.get("/static/app.js", HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"old"').status_code, 200)
+
+    def test_precompressed_variants(self):
+        response = self.get("/static/app.js", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual((response["Content-Encoding"], self.body(response)), ("br", b"brotli"))
+        self.assertEqual(response["Content-Type"], "text/javascript")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertNotIn("Accept-Ranges", response)
+        response = self.get("/static/app.js", HTTP_ACCEPT_ENCODING="gzip;q=1.0")
+        self.assertEqual((response["Content-Encoding"], self.body(response)), ("gzip", b"gzipped"))
+        plain = self.get("/static/app.js", HTTP_ACCEPT_ENCODING="identity")
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertNotEqual(response["ETag"], plain["ETag"])
+        # ranges apply to the plain file only
+        ranged = self.get("/static/app.js", HTTP_ACCEPT_ENCODING="gzip", HTTP_RANGE="bytes=0-1")
+        self.assertEqual((ranged.status_code, ranged["Content-Encoding"]), (200, "gzip"))
+        # media is never swapped for a compressed sibling
+        self.write(self.media_root, "photo.png.gz", b"gz")
+        self.assertNotIn("Content-Encoding", self.get("/media/photo.png", HTTP_ACCEPT_ENCODING="gzip"))
+
+    def test_paths_outside_the_root_fall_through(self):
+        name = os.path.basename(self.static_root) + "-secret.txt"
+        for path in (f"/static/../{name}", f"/static/%2e%2e/{name}", "/static/", "/static/missing.js", "/media/"):
+            with self.subTest(path=path):
+                response = self.get(path)
+                self.assertEqual((response.status_code, response.content), (404, b"from the view"))
+        self.assertEqual(self.get("/static/app.js", method="post").status_code, 404)
+
+    @override_settings(FILE_SERVING={"SENDFILE": "x-accel-redirect"})
+    def test_media_can_be_handed_to_the_front_end(self):
+        self.middleware = FileServingMiddleware(lambda request: HttpResponse(status=404))
+        response = self.get("/media/photo.png")
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/photo.png")
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["X-Content-Type-Options"], "nosniff")
+
+    def test_media_is_served_only_as_an_image(self):
+        response = self.get("/media/photo.png")
+        self.assertEqual((response.status_code, response["Content-Type"]), (200, "image/png"))
+        self.assertEqual(response["X-Content-Type-Options"], "nosniff")
+        self.assertEqual(response["Content-Security-Policy"], "default-src 'none'; sandbox")
+        self.write(self.media_root, "evil.html", b"<script>alert(1)</script>")
+        self.write(self.media_root, "evil.svg", b"<svg onload='alert(1)'/>")
+        for name in ("evil.html", "evil.svg"):
+            with self.subTest(name=name):
+                response = self.get(f"/media/{name}")
+                self.assertEqual((response.status_code, response.content), (404, b"from the view"))
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = CustomUser.objects.create_user("owner@example.com", "pw")
+        now = timezone.now().replace(microsecond=0)
+        # titles repeat and some end dates are NULL, so ties and NULLs both need the pk
+        ends = [None, now + timedelta(days=2), now + timedelta(days=1), None, now + timedelta(days=2),
+                now + timedelta(days=3), None, now + timedelta(days=1), now + timedelta(days=2), now]
+        for i, end in enumerate(ends):
+            Campaign.objects.create(
+                title=f"Title {i % 3}", slug=f"c{i}", request=Request.objects.create(proposed_by=user),
+                start_date=now, end_date=end,
+            )
+
+    def paginator(self, keys, per_page=3, signature="sort"):
+        return KeysetPaginator(Campaign.objects.all(), keys, per_page, signature=signature)
+
+    def expected(self, field, descending):
+        rows = list(Campaign.objects.values_list("pk", field))
+        present = sorted((r for r in rows if r[1] is not None), key=lambda r: (r[1], r[0]), reverse=descending)
+        missing = sorted((r for r in rows if r[1] is None), key=lambda r: r[0], reverse=descending)
+        return [pk for pk, _ in present + missing]
+
+    def walk_forward(self, paginator):
+        pages, page = [], paginator.page()
+        while True:
+            pages.append([c.pk for c in page])
+            if not page.has_next():
+                return pages, page
+            page = paginator.page(page.next_cursor)
+
+    def test_cursors_walk_every_row_once_in_order(self):
+        for keys in ([("end_date", False)], [("end_date", True)], [("title", False)], [("title", True), ("end_date", False)]):
+            with self.subTest(keys=keys):
+                pages, _ = self.walk_forward(self.paginator(keys))
+                flat = [pk for page in pages for pk in page]
+                if len(keys) == 1:
+                    self.assertEqual(flat, self.expected(*keys[0]))
+                self.assertEqual(sorted(flat), sorted(Campaign.objects.values_list("pk", flat=True)))
+                self.assertEqual([len(page) for page in pages], [3, 3, 3, 1])
+
+    def test_previous_cursors_walk_back_through_the_same_pages(self):
+        for keys in ([("end_date", False)], [("end_date", True)], [("title", False)]):
+            with self.subTest(keys=keys):
+                paginator = self.paginator(keys)
+                pages, page = self.walk_forward(paginator)
+                back = [[c.pk for c in page]]
+                while page.has_previous():
+                    page = paginator.page(page.previous_cursor)
+                    back.append([c.pk for c in page])
+                self.assertEqual(back[::-1], pages)
+                # the first page reached backwards offers the way forward again
+                self.assertTrue(page.has_next())
+                self.assertEqual([c.pk for c in paginator.page(page.next_cursor)], pages[1])
+
+    def test_first_and_only_pages(self):
+        page = self.paginator([("title", False)]).page()
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+        only = self.paginator([("title", False)], per_page=20).page()
+        self.assertEqual(len(only), 10)
+        self.assertFalse(only.has_other_pages())
+
+    def test_bad_cursors_serve_the_first_page(self):
+        paginator = self.paginator([("end_date", False)])
+        first = [c.pk for c in paginator.page()]
+        token = paginator.page().next_cursor
+        forged = signing.dumps({"s": "sort", "d": "next", "v": ["2000-01-01"], "pk": 0}, salt="other")
+        wrong_shape = signing.dumps({"s": "sort", "d": "next", "v": [], "pk": 0}, salt=KeysetPaginator.salt)
+        for bad in (token[:-2] + "xx", "garbage", forged, wrong_shape):
+            with self.subTest(token=bad):
+                self.assertEqual([c.pk for c in paginator.page(bad)], first)
+        # a token minted for another sort is ignored too
+        other = self.paginator([("end_date", False)], signature="other")
+        self.assertEqual([c.pk for c in other.page(token)], first)
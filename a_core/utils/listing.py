@@ -0,0 +1,100 @@
+from dataclasses import dataclass, field, replace
+from urllib.parse import urlencode
+
+PAGING_MODES = ("offset", "cursor")
+
+
+@dataclass(frozen=True)
+class ListState:
+    """
+    Validated filter / sort / paging parameters of a list page, parsed once
+    per request and shared by the queryset, the paginator, the template
+    context and the links the page renders.
+    """
+    q: str = ""
+    status: str = ""
+    category: str = ""
+    sort: str = ""
+    direction: str = "asc"
+    page_size: int = 10
+    paging: str = "offset"
+    cursor: str = ""
+    page: str = ""
+    # Values omitted from generated links because they are what the view assumes anyway
+    defaults: dict = field(default_factory=dict, compare=False, repr=False)
+
+    @property
+    def descending(self):
+        return self.direction == "desc"
+
+    @classmethod
+    def from_query(cls, params, *, sort_choices, default_sort, page_size,
+                   status_choices=(), paging="offset", max_page_size=100, max_query_length=200):
+        """
+        Build a state from request.GET, replacing anything invalid with the default.
+        """
+        def get(key):
+            return (params.get(key) or "").strip()
+
+        sort = get("sort")
+        if sort not in sort_choices:
+            sort = default_sort
+
+        direction = get("dir").lower()
+        if direction not in ("asc", "desc"):
+            direction = "asc"
+
+        try:
+            size = min(max(int(get("page_size")), 1), max_page_size)
+        except ValueError:
+            size = page_size
+
+        status = get("status")
+        if status not in status_choices:
+            status = ""
+
+        category = get("category")
+        if not category.isdigit():
+            category = ""
+
+        cursor = get("cursor")
+        mode = get("paging")
+        if mode not in PAGING_MODES:
+            mode = "cursor" if cursor else paging
+
+        return cls(
+            q=get("q")[:max_query_length],
+            status=status,
+            category=category,
+            sort=sort,
+            direction=direction,
+            page_size=size,
+            paging=mode,
+            cursor=cursor,
+            page=get("page"),
+            defaults={"sort": default_sort, "dir": "asc", "page_size": page_size, "paging": paging},
+        )
+
+    def params(self, **changes):
+        """
+        The state as query parameters, with `changes` applied and empty values dropped.
+        """
+        state = replace(self, **changes) if changes else self
+        items = {
+            "q": state.q,
+            "status": state.status,
+            "category": state.category,
+            "sort": state.sort,
+            "dir": state.direction,
+            "page_size": state.page_size,
+            "paging": state.paging,
+            "cursor": state.cursor,
+            "page": state.page,
+        }
+        return {
+            k: v for k, v in items.items()
+            if v not in ("", None) and self.defaults.get(k) != v
+        }
+
+    def querystring(self, **changes):
+        return urlencode(self.params(**changes))
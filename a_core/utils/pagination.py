@@ -0,0 +1,208 @@
+"""
+Keyset (cursor) pagination.
+
+OFFSET paging makes the database walk and discard every skipped row, so
+deep pages get slower and slower. A keyset page instead seeks past the
+last row it showed:
+
+    WHERE (sort_field, id) > (last_value, last_id) ORDER BY sort_field, id LIMIT n
+
+The position is handed to the client as an opaque, signed cursor token,
+so it cannot be forged into arbitrary SQL values. NULL sort values always
+sort last, and the primary key breaks ties so every row has a unique
+position.
+"""
+import json
+from collections.abc import Sequence
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.expressions import OrderBy
+
+
+def keyset_ordering(keys, reverse=False):
+    """
+    ORDER BY clauses for ``keys`` ([(field, descending), ...]) plus the pk tiebreaker.
+    """
+    ordering = []
+    for field, descending in keys:
+        if reverse:
+            ordering.append(OrderBy(F(field), descending=not descending, nulls_first=True))
+        else:
+            ordering.append(OrderBy(F(field), descending=descending, nulls_last=True))
+    last_descending = keys[-1][1] if keys else False
+    ordering.append(OrderBy(F("pk"), descending=last_descending != reverse))
+    return ordering
+
+
+def estimate_count(queryset, limit=1000):
+    """
+    Cheap row count for a filtered queryset. Returns (count, is_exact).
+
+    PostgreSQL answers from the planner's estimate; other databases count
+    at most ``limit + 1`` rows, so the cost is bounded however large the
+    result set is.
+    """
+    queryset = queryset.order_by()
+    if connection.vendor == "postgresql":
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"]), False
+    count = queryset[: limit + 1].count()
+    return min(count, limit), count <= limit
+
+
+def _to_json(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class CursorPage(Sequence):
+    """
+    One page of a KeysetPaginator. Quacks enough like django.core.paginator.Page
+    for ListView and the list templates.
+    """
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f"<CursorPage of {len(self)} items>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by ``keys`` ([(field, descending), ...]) using cursor tokens.
+
+    ``signature`` identifies the sort (e.g. "title:asc"); a token minted for a
+    different sort is ignored and the first page is served instead.
+    """
+    salt = "a_core.pagination.cursor"
+
+    def __init__(self, queryset, keys, per_page, signature="", count_limit=1000):
+        self.queryset = queryset
+        self.keys = list(keys)
+        self.per_page = per_page
+        self.signature = signature
+        self.count_limit = count_limit
+        self._count = None
+
+    # -----------------------
+    # Counting
+    # -----------------------
+    def _estimate(self):
+        if self._count is None:
+            self._count = estimate_count(self.queryset, self.count_limit)
+        return self._count
+
+    @property
+    def count(self):
+        return self._estimate()[0]
+
+    @property
+    def count_is_exact(self):
+        return self._estimate()[1]
+
+    # -----------------------
+    # Tokens
+    # -----------------------
+    def encode(self, row, direction):
+        values = [_to_json(getattr(row, f"_cursor_{i}")) for i in range(len(self.keys))]
+        return signing.dumps(
+            {"s": self.signature, "d": direction, "v": values, "pk": _to_json(row.pk)},
+            salt=self.salt,
+            compress=True,
+        )
+
+    def decode(self, token):
+        if not token:
+            return None
+        try:
+            data = signing.loads(token, salt=self.salt)
+        except signing.BadSignature:
+            return None
+        if (
+            not isinstance(data, dict)
+            or data.get("s") != self.signature
+            or data.get("d") not in ("next", "prev")
+            or len(data.get("v") or []) != len(self.keys)
+        ):
+            return None
+        return data
+
+    # -----------------------
+    # Seeking
+    # -----------------------
+    def _seek(self, values, pk, forward):
+        """
+        Rows strictly after (forward) or before the position (values..., pk).
+        """
+        condition = Q()
+        prefix = Q()
+        for i, ((field, descending), value) in enumerate(zip(self.keys, values)):
+            alias = f"_cursor_{i}"
+            op = "lt" if descending == forward else "gt"
+            if value is None:
+                # NULLs sort last: nothing follows them on this key, everything non-null precedes them
+                step = Q() if forward else Q(**{f"{alias}__isnull": False})
+                equal = Q(**{f"{alias}__isnull": True})
+            else:
+                step = Q(**{f"{alias}__{op}": value})
+                if forward:
+                    step |= Q(**{f"{alias}__isnull": True})
+                equal = Q(**{alias: value})
+            if step:
+                condition |= prefix & step
+            prefix &= equal
+        last_descending = self.keys[-1][1] if self.keys else False
+        op = "lt" if last_descending == forward else "gt"
+        return condition | (prefix & Q(**{f"pk__{op}": pk}))
+
+    def page(self, token=None):
+        position = self.decode(token)
+        qs = self.queryset.annotate(**{f"_cursor_{i}": F(field) for i, (field, _) in enumerate(self.keys)})
+        forward = position is None or position["d"] == "next"
+        if position is not None:
+            qs = qs.filter(self._seek(position["v"], position["pk"], forward))
+        qs = qs.order_by(*keyset_ordering(self.keys, reverse=not forward))
+
+        rows = list(qs[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if not forward:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or not forward:
+                next_cursor = self.encode(rows[-1], "next")
+            if (has_more and not forward) or (forward and position is not None):
+                previous_cursor = self.encode(rows[0], "prev")
+        return CursorPage(rows, self, next_cursor, previous_cursor)
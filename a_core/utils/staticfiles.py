@@ -0,0 +1,50 @@
+"""
+Hashed static manifest with build-time precompression.
+
+`collectstatic` writes every file under a content-hashed name (see
+ManifestStaticFilesStorage) and, for text assets, a `.gz` sibling and a
+`.br` sibling when the optional `brotli` package is installed. The file
+serving middleware picks the best variant per request, so nothing is
+compressed at request time.
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".map", ".svg", ".json", ".txt", ".xml", ".html", ".ico"}
+MIN_SIZE = 256
+
+
+def compressed_variants(data):
+    """
+    {suffix: bytes} for every encoding that actually makes `data` smaller.
+    """
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, quality=11)
+    return {suffix: out for suffix, out in variants.items() if len(out) < len(data)}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in set(self.hashed_files.values()):
+            if os.path.splitext(hashed_name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            path = self.path(hashed_name)
+            if os.path.getsize(path) < MIN_SIZE:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            for suffix, out in compressed_variants(data).items():
+                with open(path + suffix, "wb") as f:
+                    f.write(out)
@@ -1,4 +1,7 @@
+import hashlib
 import os
+import uuid
+
 from django.core.files.storage import FileSystemStorage
 
 class OverwriteStorage(FileSystemStorage):
@@ -9,4 +12,98 @@ class OverwriteStorage(FileSystemStorage):
         # If the filename already exists, remove it so the new file can reuse the same name.
         if self.exists(name):
             self.delete(name)
-        return name
\ No newline at end of file
+        return name
+
+
+BLOB_PREFIX = "blobs"
+
+
+def is_blob(name):
+    return name.replace("\\", "/").startswith(f"{BLOB_PREFIX}/")
+
+
+def blob_digest(name):
+    """
+    Digest a blob (or a file derived from one, e.g. `<digest>_w320.webp`) belongs to.
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return stem.split("_", 1)[0]
+
+
+class ContentHashedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that names every upload after the SHA-256 of its content:
+
+        <anything>/photo.JPG  ->  blobs/3f/3fa1...e9.jpg
+
+    Identical uploads share one file and a changed upload always gets a new
+    URL, so blob URLs can be cached forever. The name passed in only
+    contributes its extension.
+
+    Names already under BLOB_PREFIX are derived files (image renditions) and
+    are stored as given, replacing any previous copy atomically. Derived
+    files of legacy, non-blob originals go through save_derived(), which
+    keeps their name verbatim too.
+
+    Storing content that already exists touches the blob, so the garbage
+    collector's --min-age grace period restarts for the new reference.
+
+    delete() leaves blobs alone because other rows may reference the same
+    content; unreferenced blobs are removed by `manage.py collect_media_garbage`.
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(self, **kwargs):
+        # Two uploads racing to store the same content write identical bytes.
+        kwargs.setdefault("allow_overwrite", True)
+        super().__init__(**kwargs)
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is chosen in _save(); no exists() round-trip needed.
+        return name
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(self.chunk_size):
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        ext = os.path.splitext(name)[1].lower()
+        return f"{BLOB_PREFIX}/{hexdigest[:2]}/{hexdigest}{ext}"
+
+    def _save(self, name, content):
+        if is_blob(name):
+            return self._replace(name, content)
+
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # same content already stored; refresh its age for the garbage collector
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
+
+    def _replace(self, name, content):
+        if not self.exists(name):
+            return super()._save(name, content)
+        tmp_name = super()._save(f"{name}.{uuid.uuid4().hex}.tmp", content)
+        os.replace(self.path(tmp_name), self.path(name))
+        return name
+
+    def save_derived(self, name, content):
+        """
+        Store a file derived from another one (a rendition) under exactly
+        `name`, replacing any previous copy.
+        """
+        name = self.generate_filename(name)
+        return self._replace(name, content)
+
+    def delete(self, name):
+        if name and not is_blob(name):
+            super().delete(name)
+
+    def purge(self, name):
+        """
+        Really remove a blob; only the garbage collector should call this.
+        """
+        super().delete(name)
@@ -3,6 +3,10 @@ from django.urls import reverse_lazy, reverse
 from django.views.generic.edit import FormView
 from django.views.generic.detail import SingleObjectMixin
 from django.http import Http404
+from django.utils.functional import cached_property
+
+from a_core.utils.listing import ListState
+from a_core.utils.pagination import KeysetPaginator, keyset_ordering
 
 class CreateOrUpdateView(SingleObjectMixin, FormView):
     """
@@ -48,4 +52,75 @@ class CreateOrUpdateView(SingleObjectMixin, FormView):
         return super().form_valid(form)
 
     def get_success_url(self):
-        return self.request.META.get('HTTP_REFERER') or self.request.path
\ No newline at end of file
+        return self.request.META.get('HTTP_REFERER') or self.request.path
+
+
+class ListStateMixin:
+    """
+    ListView mixin that parses and validates the list's GET parameters once
+    per request into `self.list_state` (see a_core.utils.listing.ListState).
+    """
+    SORT_MAP = {}
+    default_sort = ""
+    status_choices = ()
+
+    @cached_property
+    def list_state(self):
+        return ListState.from_query(
+            self.request.GET,
+            sort_choices=self.SORT_MAP,
+            default_sort=self.default_sort,
+            page_size=self.paginate_by,
+            status_choices=self.status_choices,
+            paging=getattr(self, "pagination_mode", "offset"),
+        )
+
+    def get_paginate_by(self, queryset):
+        return self.list_state.page_size
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["list_state"] = self.list_state
+        return context
+
+
+class CursorPaginationMixin(ListStateMixin):
+    """
+    ListView mixin adding a keyset (cursor) pagination mode next to the
+    default page-number mode.
+
+    Sorting comes from SORT_MAP[list_state.sort] (override get_sort_keys()
+    for anything fancier). Cursor mode is used when `pagination_mode = "cursor"`,
+    or per request with ?paging=cursor / when a ?cursor= token is present;
+    ?paging=offset forces page numbers. Cursor pages report an estimated
+    count instead of COUNT(*).
+    """
+    pagination_mode = "offset"
+    count_limit = 1000
+
+    def get_sort_keys(self):
+        """
+        ([(field, descending), ...], signature) for the current sort.
+        """
+        state = self.list_state
+        return [(self.SORT_MAP[state.sort], state.descending)], f"{state.sort}:{state.direction}"
+
+    def order_queryset(self, queryset):
+        keys, _ = self.get_sort_keys()
+        return queryset.order_by(*keyset_ordering(keys))
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.list_state.paging != "cursor":
+            return super().paginate_queryset(queryset, page_size)
+        keys, signature = self.get_sort_keys()
+        paginator = KeysetPaginator(
+            queryset, keys, page_size, signature=signature, count_limit=self.count_limit
+        )
+        page = paginator.page(self.list_state.cursor)
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["cursor_mode"] = self.list_state.paging == "cursor"
+        return context
+
@@ -1,9 +1,18 @@
-from django.contrib.auth.decorators import login_required
+from functools import wraps
+
+from django.contrib.auth.views import redirect_to_login
 from django.shortcuts import redirect
 
 def email_verification_required(fun):
+    """
+    Logged in and verified, read from request.principal: no user query.
+    """
+    @wraps(fun)
     def wrapper(request, *args, **kwargs):
-        if not request.user.is_email_verified:
+        principal = request.principal
+        if not principal.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        if not principal.is_email_verified:
             return redirect('verify_email_send')
         return fun(request, *args, **kwargs)
-    return login_required(wrapper)
\ No newline at end of file
+    return wrapper
@@ -0,0 +1,20 @@
+from django.contrib.auth.forms import PasswordResetForm
+from django.template import loader
+
+from outbox.mail import enqueue
+
+
+class OutboxPasswordResetForm(PasswordResetForm):
+    """
+    Password reset that queues its mail in the outbox instead of sending it
+    during the request; repeat requests for one address within the dedupe
+    window send one mail.
+    """
+
+    def send_mail(self, subject_template_name, email_template_name, context, from_email, to_email,
+                  html_email_template_name=None):
+        subject = "".join(loader.render_to_string(subject_template_name, context).splitlines())
+        body = loader.render_to_string(email_template_name, context)
+        html_body = loader.render_to_string(html_email_template_name, context) if html_email_template_name else ""
+        enqueue(subject, body, [to_email], from_email=from_email, html_body=html_body,
+                dedupe_key=f"password-reset:{to_email.lower()}")
@@ -0,0 +1,65 @@
+"""
+Password hashing policy.
+
+settings.PASSWORD_HASHING["POLICY"] picks the hasher new passwords get
+(see PASSWORD_HASHER_POLICIES in settings):
+
+    scrypt   hashlib.scrypt from the standard library, tuned by SCRYPT (default)
+    argon2   Argon2id; needs the optional argon2-cffi package
+    pbkdf2   Django's PBKDF2-SHA256
+    fast     salted MD5; forced for test runs, never used otherwise
+
+The preferred hasher is followed by the others in PASSWORD_HASHERS, so
+existing hashes keep verifying. Django rehashes a password with the
+preferred hasher (and its current parameters) the next time its owner
+logs in, so changing the policy or the scrypt tuning migrates accounts
+as they are used.
+
+The scrypt defaults are N=2**14, r=10, p=4: the same CPU work per guess
+as Django's stock N=2**14, r=8, p=5 (N * r * p) with 20 MiB of memory per
+lane instead of 16 MiB, so no weaker than stock scrypt and still cheaper
+per login than PBKDF2 at Django's iteration count. Lanes are computed one
+after another, so memory use is about 128 * WORK_FACTOR * BLOCK_SIZE
+bytes per login whatever PARALLELISM is; MAX_MEMORY caps it, and hashing
+with parameters that need more fails rather than using it. Never tune
+below the cost of the hashes in the database (PBKDF2 at Django's
+iteration count, stock scrypt): the rehash on login would quietly weaken
+them.
+
+    manage.py benchmark_password_hashers
+
+measures logins per second per core under each policy.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import ScryptPasswordHasher
+
+DEFAULTS = {"WORK_FACTOR": 2**14, "BLOCK_SIZE": 10, "PARALLELISM": 4, "MAX_MEMORY": 32 * 1024 * 1024}
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, "PASSWORD_HASHING", {}).get("SCRYPT", {})}
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    ScryptPasswordHasher with its cost taken from PASSWORD_HASHING["SCRYPT"].
+    Keeps the "scrypt" algorithm name: hashes from the stock hasher verify
+    and are upgraded on login when their parameters differ.
+    """
+
+    @property
+    def work_factor(self):
+        return _config()["WORK_FACTOR"]
+
+    @property
+    def block_size(self):
+        return _config()["BLOCK_SIZE"]
+
+    @property
+    def parallelism(self):
+        return _config()["PARALLELISM"]
+
+    @property
+    def maxmem(self):
+        # passed to hashlib.scrypt, which refuses parameters needing more
+        return _config()["MAX_MEMORY"]
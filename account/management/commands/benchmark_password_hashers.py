@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import ScryptPasswordHasher
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+PASSWORD = "correct horse battery staple"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure password checks (the CPU cost of a login) per second on one core "
+        "under each PASSWORD_HASHER_POLICIES policy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--policy", action="append", dest="policies",
+            help="Policy to measure; repeat for several (default: all installed).",
+        )
+        parser.add_argument("--seconds", type=float, default=3, help="Time spent on each policy.")
+        parser.add_argument("--min-rounds", type=int, default=3, help="Checks per policy however long they take.")
+
+    def handle(self, *args, policies=None, seconds=3, min_rounds=3, **options):
+        hashers = {
+            policy: import_string(path)()
+            for policy, path in settings.PASSWORD_HASHER_POLICIES.items()
+            if not policies or policy in policies
+        }
+        if not policies or "scrypt" in policies:
+            # what the scrypt policy replaces
+            hashers["scrypt (django default)"] = ScryptPasswordHasher()
+
+        self.stdout.write(f"{'policy':<24} {'logins/s/core':>14} {'ms/login':>10}")
+        for policy, hasher in hashers.items():
+            encoded = hasher.encode(PASSWORD, hasher.salt())
+            rounds = 0
+            started = time.perf_counter()
+            deadline = started + seconds
+            while rounds < min_rounds or time.perf_counter() < deadline:
+                if not hasher.verify(PASSWORD, encoded):
+                    raise AssertionError(f"{policy} failed to verify its own hash")
+                rounds += 1
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{policy:<24} {rounds / elapsed:>14.1f} {1000 * elapsed / rounds:>10.1f}")
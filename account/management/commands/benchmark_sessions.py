@@ -0,0 +1,73 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model, login
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+
+def _view(request):
+    return HttpResponse("ok" if request.user.is_authenticated else "anonymous")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure authenticated requests per second through the session and auth "
+        "middleware under each SESSION_ENGINES engine. Works on a throwaway user "
+        "inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--engine", action="append", dest="engines",
+            help="Engine to measure; repeat for several (default: all).",
+        )
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per engine.")
+
+    def handle(self, *args, engines=None, requests=2000, **options):
+        engines = {
+            name: path for name, path in settings.SESSION_ENGINES.items() if not engines or name in engines
+        }
+        self.stdout.write(f"{'engine':<16} {'requests/s':>12} {'queries/req':>12}")
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(f"session-benchmark-{uuid.uuid4().hex}@example.invalid")
+            for name, path in engines.items():
+                with override_settings(SESSION_ENGINE=path):
+                    rate, queries = self.measure(user, requests)
+                self.stdout.write(f"{name:<16} {rate:>12.1f} {queries:>12.2f}")
+            transaction.set_rollback(True)
+
+    def measure(self, user, requests):
+        factory = RequestFactory()
+        sessions = SessionMiddleware(_view)
+        request = factory.get("/")
+        sessions.process_request(request)
+        login(request, user, backend="django.contrib.auth.backends.ModelBackend")
+        response = sessions.process_response(request, HttpResponse())
+        factory.cookies[settings.SESSION_COOKIE_NAME] = response.cookies[settings.SESSION_COOKIE_NAME].value
+
+        handler = SessionMiddleware(AuthenticationMiddleware(_view))
+        if handler(factory.get("/")).content != b"ok":
+            raise AssertionError("benchmark session is not authenticated")
+        queries = 0
+
+        def count(execute, *args):
+            nonlocal queries
+            queries += 1
+            return execute(*args)
+
+        try:
+            with connection.execute_wrapper(count):
+                started = time.perf_counter()
+                for _ in range(requests):
+                    handler(factory.get("/"))
+                elapsed = time.perf_counter() - started
+        finally:
+            # the rollback only covers the db engine; drop our session from the cache ones too
+            request.session.delete()
+        return requests / elapsed, queries / requests
@@ -1,8 +1,10 @@
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import PermissionsMixin
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from a_core.utils.storage import OverwriteStorage
+from a_core.utils.storage import ContentHashedStorage
+from .principal import forget_principal
 import os
 
 
@@ -20,6 +22,20 @@ class CustomUserManager(BaseUserManager):
         extra_fields.setdefault("is_superuser", False)
         return self._create_user(email, password, **extra_fields)
 
+    def bulk_create_users(self, rows, password=None, batch_size=500):
+        """
+        Create many users (dicts of field values, each with an email) that
+        share `password`. The password is hashed once, not once per user;
+        meant for seed and fixture accounts, not real signups.
+        """
+        encoded = make_password(password)
+        users = []
+        for row in rows:
+            row = dict(row)
+            email = self.normalize_email(row.pop("email"))
+            users.append(self.model(email=email, password=encoded, **row))
+        return self.bulk_create(users, batch_size=batch_size)
+
     def create_superuser(self, email, password, **extra_fields):
         extra_fields.setdefault("is_staff", True)
         extra_fields.setdefault("is_superuser", True)
@@ -65,7 +81,7 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     date_joined = models.DateTimeField(auto_now_add=True)
     profile_image = models.ImageField(
         upload_to=_get_image_url,
-        storage=OverwriteStorage(),
+        storage=ContentHashedStorage(),
         null=True,
         blank=True
     )    
@@ -74,6 +90,16 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     REQUIRED_FIELDS = []  # EMAIL_ONLY signup–no other “required” fields
 
     objects = CustomUserManager()
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        forget_principal(self.pk)
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        forget_principal(user_id)
+        return result
+
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
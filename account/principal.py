@@ -0,0 +1,137 @@
+"""
+A compact, cached view of the logged-in user for permission checks.
+
+PrincipalMiddleware sets request.principal, a frozen Principal holding
+the few fields the decorators, list filters, permission checks and the
+navbar read: id, email, verified, approver and staff, plus the name and
+avatar the navbar shows. It is built from the session's user id and a
+cached row, so a page that only needs these flags runs no auth queries.
+request.user, the full ORM user, is still there for the views that write
+through it (profile, messages, transitions).
+
+Principals are cached per user id for AUTH_PRINCIPAL["TTL"] seconds;
+CustomUser.save drops the cached copy. Like django.contrib.auth, a
+session only authenticates if its password hash still matches, so
+changing a password logs out other sessions.
+
+Configured through settings.AUTH_PRINCIPAL:
+    CACHE  cache alias holding principals
+    TTL    seconds a principal is cached
+"""
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+DEFAULTS = {"CACHE": "default", "TTL": 300}
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, "AUTH_PRINCIPAL", {})}
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: Optional[int] = None
+    email: str = ""
+    is_email_verified: bool = False
+    is_approval_user: bool = False
+    is_staff: bool = False
+    first_name: str = ""
+    profile_image_url: str = ""
+    session_auth_hash: str = field(default="", repr=False)
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(
+            id=user.pk,
+            email=user.email,
+            is_email_verified=user.is_email_verified,
+            is_approval_user=user.is_approval_user,
+            is_staff=user.is_staff,
+            first_name=user.first_name,
+            profile_image_url=user.profile_image.url if user.profile_image else "",
+            session_auth_hash=user.get_session_auth_hash(),
+        )
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def is_authenticated(self):
+        return self.id is not None
+
+    @property
+    def is_anonymous(self):
+        return self.id is None
+
+
+ANONYMOUS = Principal()
+
+
+def _key(user_id):
+    return f"account:principal:{user_id}"
+
+
+def principal_for(user_id):
+    """
+    The cached Principal of the active user `user_id`, or None.
+    """
+    cache = caches[_config()["CACHE"]]
+    principal = cache.get(_key(user_id))
+    if principal is None:
+        user = get_user_model()._default_manager.filter(pk=user_id, is_active=True).first()
+        if user is None:
+            return None
+        principal = Principal.from_user(user)
+        cache.set(_key(user_id), principal, _config()["TTL"])
+    return principal
+
+
+def forget_principal(user_id):
+    """
+    Drop the cached Principal of `user_id`, now and again once the
+    transaction commits (a read in between may have cached the old row).
+    """
+    cache = caches[_config()["CACHE"]]
+    cache.delete(_key(user_id))
+    transaction.on_commit(lambda: cache.delete(_key(user_id)))
+
+
+def get_principal(request):
+    user = getattr(request, "_cached_user", None)
+    if user is not None:
+        # request.user is already loaded (and verified): no need for the cache
+        return Principal.from_user(user) if user.is_authenticated else ANONYMOUS
+    session = request.session
+    try:
+        user_id = get_user_model()._meta.pk.to_python(session[SESSION_KEY])
+    except (KeyError, ValueError):
+        return ANONYMOUS
+    if session.get(BACKEND_SESSION_KEY) not in settings.AUTHENTICATION_BACKENDS:
+        return ANONYMOUS
+    principal = principal_for(user_id)
+    session_hash = session.get(HASH_SESSION_KEY)
+    if principal is None or not session_hash or not constant_time_compare(
+        session_hash, principal.session_auth_hash
+    ):
+        return ANONYMOUS
+    return principal
+
+
+class PrincipalMiddleware:
+    """
+    Sets request.principal. Goes after SessionMiddleware and AuthenticationMiddleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.principal = SimpleLazyObject(lambda: get_principal(request))
+        return self.get_response(request)
@@ -0,0 +1,144 @@
+"""
+Throttling for the account endpoints.
+
+    @method_decorator(ratelimit("login"), name="post")
+    class LoginView(View): ...
+
+Each scope in settings.RATELIMITS maps a key kind to a rate:
+
+    RATELIMITS = {"login": {"ip": "20/5m", "email": "5/5m"}}
+
+"ip" keys on the client address, "email" on the normalized email field
+of the POST. A request over any of its limits gets a 429 with Retry-After
+before the view runs, so a flood never reaches authenticate() (a full
+password hash) or the mail queue.
+
+Counters live in the Django cache and are only ever changed with
+cache.add/cache.incr, which are atomic on every backend we use. Each key
+is a sliding-window counter: the current window's count plus the previous
+window's, weighted by how much of it still overlaps. That allows `limit`
+requests per `period` with the steady refill of a token bucket, without a
+read-modify-write of shared state.
+
+Configured through settings.RATELIMIT:
+    ENABLED      switch every limit off (e.g. for load tests)
+    CACHE        cache alias holding the counters
+    PROXY_COUNT  trusted reverse proxies in front of the app; when > 0 the
+                 client address is read from X-Forwarded-For
+"""
+import hashlib
+import math
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+DEFAULTS = {"ENABLED": True, "CACHE": "default", "PROXY_COUNT": 0}
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+RATE_RE = re.compile(r"^(\d+)/(\d*)([smhd])$")
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, "RATELIMIT", {})}
+
+
+def parse_rate(rate):
+    """
+    "5/m" -> (5, 60); "20/5m" -> (20, 300).
+    """
+    match = RATE_RE.match(rate.replace(" ", ""))
+    if not match:
+        raise ValueError(f"Invalid rate {rate!r}; expected e.g. '5/m' or '20/5m'.")
+    limit, count, unit = match.groups()
+    return int(limit), int(count or 1) * UNITS[unit]
+
+
+def client_ip(request):
+    proxies = _config()["PROXY_COUNT"]
+    if proxies:
+        forwarded = [ip.strip() for ip in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if ip.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def request_keys(request):
+    """
+    {key kind: identifier} available for `request`.
+    """
+    keys = {"ip": client_ip(request)}
+    email = (request.POST.get("email") or "").strip().lower()
+    if email:
+        keys["email"] = email
+    return keys
+
+
+def hit(scope, kind, ident, limit, period, now=None):
+    """
+    Count one request against `scope`/`kind`/`ident`. Returns the seconds to
+    wait if that puts it over `limit` per `period`, else 0.
+    """
+    cache = caches[_config()["CACHE"]]
+    now = time.time() if now is None else now
+    window, offset = divmod(now, period)
+    digest = hashlib.sha256(ident.encode()).hexdigest()[:32]
+    base = f"ratelimit:{scope}:{kind}:{digest}"
+    current_key = f"{base}:{int(window)}"
+
+    cache.add(current_key, 0, timeout=period * 2)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        # evicted between add and incr
+        cache.add(current_key, 1, timeout=period * 2)
+        current = 1
+    previous = cache.get(f"{base}:{int(window) - 1}", 0)
+    overlap = 1 - offset / period
+    if previous * overlap + current <= limit:
+        return 0
+    if current > limit:
+        # over on this window alone: wait for the next one
+        return math.ceil(period - offset)
+    # wait until enough of the previous window has slid out
+    needed = (previous * overlap + current - limit) / previous
+    return max(1, math.ceil(needed * period))
+
+
+def check(scope, request):
+    """
+    Count `request` against every limit of `scope`; returns the longest wait (0: allowed).
+    """
+    limits = getattr(settings, "RATELIMITS", {}).get(scope, {})
+    keys = request_keys(request)
+    wait = 0
+    for kind, rate in limits.items():
+        if kind not in keys:
+            continue
+        limit, period = parse_rate(rate)
+        wait = max(wait, hit(scope, kind, keys[kind], limit, period))
+    return wait
+
+
+def ratelimit(scope, methods=("POST",)):
+    """
+    View decorator applying the RATELIMITS[scope] limits to `methods`.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method in methods and _config()["ENABLED"]:
+                wait = check(scope, request)
+                if wait:
+                    response = HttpResponse(
+                        "Too many attempts. Please wait a moment and try again.",
+                        status=429,
+                        content_type="text/plain; charset=utf-8",
+                    )
+                    response["Retry-After"] = str(wait)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
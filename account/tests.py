@@ -1,3 +1,243 @@
-from django.test import TestCase
+import timeit
+from dataclasses import FrozenInstanceError
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, ScryptPasswordHasher, make_password
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .hashers import TunedScryptPasswordHasher
+from .models import CustomUser
+from .principal import principal_for
+from .ratelimit import hit, parse_rate
 
 # Create your tests here.
+LIMITS = {
+    "login": {"ip": "5/m", "email": "2/m"},
+    "register": {"ip": "2/h"},
+}
+
+
+@override_settings(RATELIMITS=LIMITS)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def login(self, email, ip="10.0.0.1"):
+        return self.client.post(
+            reverse("login"), {"email": email, "password": "wrong"}, REMOTE_ADDR=ip
+        )
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate("5/m"), (5, 60))
+        self.assertEqual(parse_rate("20/5m"), (20, 300))
+        self.assertEqual(parse_rate("100/d"), (100, 86400))
+        with self.assertRaises(ValueError):
+            parse_rate("5 per minute")
+
+    def test_email_limit_rejects_before_authenticate(self):
+        with mock.patch("account.views.authenticate", return_value=None) as authenticate:
+            for _ in range(2):
+                self.assertEqual(self.login("a@example.com").status_code, 302)
+            response = self.login("a@example.com")
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response["Retry-After"]) > 0)
+        self.assertEqual(authenticate.call_count, 2)
+        # email keys are normalized, other accounts are unaffected
+        self.assertEqual(self.login(" A@Example.com ").status_code, 429)
+        self.assertEqual(self.login("b@example.com").status_code, 302)
+
+    def test_ip_limit_spans_emails(self):
+        for i in range(5):
+            self.assertEqual(self.login(f"user{i}@example.com").status_code, 302)
+        self.assertEqual(self.login("other@example.com").status_code, 429)
+        self.assertEqual(self.login("other@example.com", ip="10.0.0.2").status_code, 302)
+
+    def test_get_is_not_limited(self):
+        for _ in range(3):
+            self.client.post(reverse("register"), {})
+        self.assertEqual(self.client.post(reverse("register"), {}).status_code, 429)
+        self.assertEqual(self.client.get(reverse("register")).status_code, 200)
+
+    @override_settings(RATELIMIT={"ENABLED": False})
+    def test_disabled(self):
+        for _ in range(3):
+            self.assertEqual(self.login("a@example.com").status_code, 302)
+
+    @override_settings(RATELIMIT={"PROXY_COUNT": 1})
+    def test_forwarded_for_behind_proxy(self):
+        for _ in range(5):
+            self.client.post(
+                reverse("login"), {"password": "x"}, REMOTE_ADDR="10.9.9.9",
+                HTTP_X_FORWARDED_FOR="1.2.3.4, 5.6.7.8",
+            )
+        blocked = self.client.post(reverse("login"), {"password": "x"}, HTTP_X_FORWARDED_FOR="6.6.6.6, 5.6.7.8")
+        allowed = self.client.post(reverse("login"), {"password": "x"}, HTTP_X_FORWARDED_FOR="5.6.7.9")
+        self.assertEqual(blocked.status_code, 429)
+        self.assertEqual(allowed.status_code, 302)
+
+    def test_window_slides(self):
+        # 4 per minute: a full previous window still counts at the start of the next
+        for _ in range(4):
+            self.assertEqual(hit("t", "ip", "x", 4, 60, now=60 * 10 + 59), 0)
+        self.assertGreater(hit("t", "ip", "x", 4, 60, now=60 * 11 + 1), 0)
+        # ...and has slid out (mostly) by the end of it
+        self.assertEqual(hit("t", "ip", "x", 4, 60, now=60 * 11 + 50), 0)
+
+
+SCRYPT_FIRST = ["account.hashers.TunedScryptPasswordHasher", "django.contrib.auth.hashers.PBKDF2PasswordHasher"]
+
+
+@override_settings(
+    PASSWORD_HASHERS=SCRYPT_FIRST,
+    PASSWORD_HASHING={"SCRYPT": {"WORK_FACTOR": 2**10, "BLOCK_SIZE": 8, "PARALLELISM": 1}},
+)
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("user@example.com", is_email_verified=True)
+
+    def login(self):
+        return self.client.post(reverse("login"), {"email": "user@example.com", "password": "s3cret-pw"})
+
+    def test_new_passwords_use_tuned_scrypt(self):
+        algorithm, work_factor, _, block_size, parallelism, _ = make_password("s3cret-pw").split("$")
+        self.assertEqual((algorithm, work_factor, block_size, parallelism), ("scrypt", "1024", "8", "1"))
+
+    def test_default_cost_is_between_stock_scrypt_and_pbkdf2(self):
+        stock, pbkdf2 = ScryptPasswordHasher(), PBKDF2PasswordHasher()
+        with self.settings(PASSWORD_HASHING={}):
+            tuned = TunedScryptPasswordHasher()
+            # no weaker than stock scrypt: as much work per guess and as much memory
+            self.assertGreaterEqual(
+                tuned.work_factor * tuned.block_size * tuned.parallelism,
+                stock.work_factor * stock.block_size * stock.parallelism,
+            )
+            self.assertGreaterEqual(tuned.work_factor * tuned.block_size, stock.work_factor * stock.block_size)
+            # within the memory cap, and cheaper per login than PBKDF2
+            self.assertLessEqual(128 * tuned.work_factor * tuned.block_size, tuned.maxmem)
+            self.assertLessEqual(tuned.maxmem, 32 * 1024 * 1024)
+
+            def cost(hasher):
+                salt = hasher.salt()
+                return min(timeit.repeat(lambda: hasher.encode("s3cret-pw", salt), number=1, repeat=3))
+
+            self.assertLess(cost(tuned), cost(pbkdf2))
+
+    def test_memory_cap_is_enforced(self):
+        with self.settings(PASSWORD_HASHING={"SCRYPT": {"WORK_FACTOR": 2**16, "MAX_MEMORY": 32 * 1024 * 1024}}):
+            with self.assertRaises(ValueError):
+                TunedScryptPasswordHasher().encode("s3cret-pw", "salt")
+
+    def test_old_hashes_are_upgraded_on_login(self):
+        hasher = PBKDF2PasswordHasher()
+        self.user.password = hasher.encode("s3cret-pw", hasher.salt(), iterations=1000)
+        self.user.save()
+        self.assertRedirects(self.login(), reverse("home"), fetch_redirect_response=False)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("scrypt$1024$"))
+        self.assertTrue(self.user.check_password("s3cret-pw"))
+
+    def test_retuning_scrypt_upgrades_on_login(self):
+        self.user.set_password("s3cret-pw")
+        self.user.save()
+        with self.settings(PASSWORD_HASHING={"SCRYPT": {"WORK_FACTOR": 2**11}}):
+            self.login()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("scrypt$2048$"))
+
+    def test_bulk_created_users_hash_once(self):
+        with mock.patch("account.models.make_password", wraps=make_password) as hashed:
+            users = CustomUser.objects.bulk_create_users(
+                [{"email": f"seed{i}@EXAMPLE.com"} for i in range(5)], password="s3cret-pw"
+            )
+        self.assertEqual(hashed.call_count, 1)
+        self.assertEqual(users[0].email, "seed0@example.com")
+        self.assertTrue(CustomUser.objects.get(email="seed4@example.com").check_password("s3cret-pw"))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("benchmark_password_hashers", policies=["fast"], seconds=0, min_rounds=1, stdout=out)
+        self.assertIn("fast", out.getvalue())
+
+
+class SessionTests(TestCase):
+    def test_purge_deletes_only_expired_sessions_in_batches(self):
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(session_key=f"expired{i}", session_data="", expire_date=now - timedelta(days=1))
+        Session.objects.create(session_key="live", session_data="", expire_date=now + timedelta(days=1))
+        out = StringIO()
+        with mock.patch("time.sleep") as sleep:
+            call_command("purge_expired_sessions", batch_size=2, stdout=out)
+        self.assertEqual(sleep.call_count, 2)  # batches of 2, 2, 1
+        self.assertIn("Purged 5", out.getvalue())
+        self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["live"])
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_purge_without_session_table(self):
+        out = StringIO()
+        call_command("purge_expired_sessions", stdout=out)
+        self.assertIn("nothing to purge", out.getvalue())
+
+    def test_benchmark_rolls_back(self):
+        out = StringIO()
+        call_command("benchmark_sessions", engines=["db", "signed_cookies"], requests=3, stdout=out)
+        self.assertIn("signed_cookies", out.getvalue())
+        self.assertFalse(CustomUser.objects.exists())
+        self.assertFalse(Session.objects.exists())
+
+    def test_benchmark_leaves_other_sessions_alone(self):
+        sessions = caches[settings.SESSION_CACHE_ALIAS]
+        sessions.set("someone-elses-session", {"_auth_user_id": "1"})
+        self.addCleanup(sessions.clear)
+        call_command("benchmark_sessions", engines=["cache", "cached_db"], requests=3, stdout=StringIO())
+        self.assertEqual(sessions.get("someone-elses-session"), {"_auth_user_id": "1"})
+
+
+class PrincipalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("user@example.com", "pw", is_email_verified=True)
+        self.url = reverse("request_app:list")
+
+    def test_cached_and_immutable(self):
+        principal = principal_for(self.user.pk)
+        self.assertEqual((principal.id, principal.email, principal.is_approval_user), (self.user.pk, "user@example.com", False))
+        with self.assertNumQueries(0):
+            self.assertEqual(principal_for(self.user.pk), principal)
+        with self.assertRaises(FrozenInstanceError):
+            principal.is_approval_user = True
+
+    def test_saving_the_user_drops_the_cached_principal(self):
+        principal_for(self.user.pk)
+        self.user.is_approval_user = True
+        self.user.save()
+        self.assertTrue(principal_for(self.user.pk).is_approval_user)
+
+    def test_decorator_redirects_anonymous_and_unverified(self):
+        response = self.client.get(self.url)
+        self.assertRedirects(response, f"{reverse('login')}?next={self.url}", fetch_redirect_response=False)
+        unverified = CustomUser.objects.create_user("new@example.com", "pw")
+        self.client.force_login(unverified)
+        self.assertRedirects(self.client.get(self.url), reverse("verify_email_send"), fetch_redirect_response=False)
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.user.set_password("new-pw")
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_inactive_user_is_anonymous(self):
+        self.client.force_login(self.user)
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        cache.clear()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
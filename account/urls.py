@@ -1,5 +1,7 @@
 from django.urls import path
 from .views import LoginView,RegisterView,logoutView, ResendVerificationView, VerifyEmailView, ProfileUpdateView
+from .forms import OutboxPasswordResetForm
+from .ratelimit import ratelimit
 from django.contrib.auth.views import (
     PasswordResetView, 
     PasswordResetDoneView, 
@@ -16,7 +18,7 @@ urlpatterns = [
     path('logout/', logoutView,name='logout'),
     
     # reset password
-    path('password-reset/', PasswordResetView.as_view(template_name='account/password_reset.html', html_email_template_name='account/password_reset_email.html'),name='password_reset'),
+    path('password-reset/', ratelimit('password_reset')(PasswordResetView.as_view(template_name='account/password_reset.html', html_email_template_name='account/password_reset_email.html', form_class=OutboxPasswordResetForm)),name='password_reset'),
     path('password-reset/done/', PasswordResetDoneView.as_view(template_name='account/password_reset_done.html'),name='password_reset_done'),
     path('password-reset-confirm/<uidb64>/<token>/', PasswordResetConfirmView.as_view(template_name='account/password_reset_confirm.html'),name='password_reset_confirm'),
     path('password-reset-complete/',PasswordResetCompleteView.as_view(template_name='account/password_reset_complete.html'),name='password_reset_complete'),
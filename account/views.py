@@ -6,14 +6,17 @@ from .models import CustomUser as User
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
-from django.core.mail import send_mail
-from django.conf import settings
+from django.db import transaction
 from django.urls import reverse
 from django.utils.decorators import method_decorator
 
+from outbox.mail import enqueue
+
 from .decorators import email_verification_required
+from .ratelimit import ratelimit
 
 # Create your views here.
+@method_decorator(ratelimit("register"), name="post")
 class RegisterView(View):
     template_name = "account/register.html"
     def get(self, request):
@@ -54,13 +57,17 @@ class RegisterView(View):
             messages.error(request, "Email already exists")
             return redirect('register')
         
-        user = User.objects.create_user(**request_data)
-        user.save()
-        _send_verification_email(request, user)
+        with transaction.atomic():
+            user = User.objects.create_user(**request_data)
+            _send_verification_email(request, user)
 
         return redirect('email_sent')
 
 def _send_verification_email(request, user):
+    """
+    Queue the verification mail (see outbox.mail); repeats for the same user
+    within the outbox dedupe window are dropped.
+    """
     uid = urlsafe_base64_encode(force_bytes(user.pk))
     token = default_token_generator.make_token(user)
 
@@ -68,11 +75,11 @@ def _send_verification_email(request, user):
         reverse('verify_email', kwargs={'uidb64': uid, 'token': token})
     )
 
-    send_mail(
+    enqueue(
         subject="Verify your email",
-        message=f"Click the link to verify your email:\n{verification_link}",
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email],
+        body=f"Click the link to verify your email:\n{verification_link}",
+        to=[user.email],
+        dedupe_key=f"verify-email:{user.pk}",
     )
 
 
@@ -92,6 +99,7 @@ class VerifyEmailView(View):
         else:
             return redirect('email_verification_failed')
 
+@method_decorator(ratelimit("resend_verification"), name="post")
 class ResendVerificationView(View):
     def post(self, request):
         email = request.POST.get("email")
@@ -102,6 +110,7 @@ class ResendVerificationView(View):
 
         return redirect('email_sent')
             
+@method_decorator(ratelimit("login"), name="post")
 class LoginView(View):
     template_name = "account/login.html"
     def get(self, request):
@@ -120,7 +129,6 @@ class LoginView(View):
             return redirect('home')
         else:
             messages.error(request, "Invalid login credentials")
-            print("Invalid login credentials", email, password)
             return redirect('login')
 
 def logoutView(request):
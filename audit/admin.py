@@ -0,0 +1,33 @@
+from django.contrib import admin
+from .models import AuditCheckpoint, AuditEvent
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "created_at", "kind", "object_type", "object_id", "actor_id")
+    list_filter = ("kind",)
+
+    # append-only: viewable, never editable
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AuditCheckpoint)
+class AuditCheckpointAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "hash", "verified_at")
+
+    # a forged checkpoint would let verification skip tampered entries
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,122 @@
+"""
+Writing to the hash-chained audit log.
+
+    record("request.transition", request_obj, actor=user, payload={...})
+
+Each entry's hash is
+
+    sha256(prev_hash + canonical JSON of (created_at, kind, object_type, object_id, actor_id, payload))
+
+Inside `with batch():` entries are buffered and written with one
+bulk_create (and one lock of the chain head) when the block exits, still
+inside its transaction. Outside a batch, record() writes immediately in its
+own (possibly nested) transaction. Either way the entry commits or rolls
+back together with the change it describes.
+"""
+import hashlib
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import GENESIS_HASH, AuditEvent, AuditHead
+
+_batch = ContextVar("audit_batch", default=None)
+
+
+def canonical(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, sort_keys=True, separators=(",", ":"))
+
+
+def entry_hash(prev_hash, created_at, kind, object_type, object_id, actor_id, payload):
+    body = canonical([created_at.isoformat(), kind, object_type, str(object_id), actor_id, payload])
+    return hashlib.sha256((prev_hash + body).encode()).hexdigest()
+
+
+def object_label(obj):
+    if isinstance(obj, tuple):
+        return obj
+    return obj._meta.label, str(obj.pk)
+
+
+def _entry(kind, obj, actor=None, payload=None):
+    object_type, object_id = object_label(obj)
+    return {
+        "created_at": timezone.now(),
+        "kind": kind,
+        "object_type": object_type,
+        "object_id": str(object_id),
+        "actor_id": getattr(actor, "pk", actor),
+        # normalise through JSON so what is hashed is exactly what is stored
+        "payload": json.loads(canonical(payload or {})),
+    }
+
+
+def _write(entries):
+    if not entries:
+        return []
+    with transaction.atomic():
+        head, _ = AuditHead.objects.select_for_update().get_or_create(pk=1)
+        prev_hash = head.last_hash
+        events = []
+        for entry in entries:
+            digest = entry_hash(prev_hash, **entry)
+            events.append(AuditEvent(prev_hash=prev_hash, hash=digest, **entry))
+            prev_hash = digest
+        events = AuditEvent.objects.bulk_create(events)
+        last_id = events[-1].pk or AuditEvent.objects.filter(hash=prev_hash).values_list("pk", flat=True).get()
+        AuditHead.objects.filter(pk=1).update(last_event_id=last_id, last_hash=prev_hash)
+    return events
+
+
+def record(kind, obj, actor=None, payload=None):
+    """
+    Append one entry about `obj` (a model instance or an (object_type, object_id) pair).
+    """
+    entry = _entry(kind, obj, actor, payload)
+    pending = _batch.get()
+    if pending is not None:
+        pending.append(entry)
+        return None
+    return _write([entry])[0]
+
+
+@contextmanager
+def batch():
+    """
+    Group every record() in the block into one insert, in one transaction.
+    Nested batches join the outermost one.
+    """
+    if _batch.get() is not None:
+        yield
+        return
+    pending = []
+    token = _batch.set(pending)
+    try:
+        with transaction.atomic():
+            yield
+            _batch.reset(token)
+            token = None
+            _write(pending)
+    finally:
+        if token is not None:
+            _batch.reset(token)
+
+
+def verify(events, prev_hash=GENESIS_HASH):
+    """
+    Walk `events` ((id, created_at, kind, object_type, object_id, actor_id,
+    payload, prev_hash, hash) rows in id order) and yield (id, hash, error)
+    for each; `error` is None while the chain holds.
+    """
+    for event_id, created_at, kind, object_type, object_id, actor_id, payload, stored_prev, stored_hash in events:
+        if stored_prev != prev_hash:
+            yield event_id, stored_hash, "previous-hash link is broken"
+        elif entry_hash(prev_hash, created_at, kind, object_type, object_id, actor_id, payload) != stored_hash:
+            yield event_id, stored_hash, "content does not match its hash"
+        else:
+            yield event_id, stored_hash, None
+        prev_hash = stored_hash
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from audit.log import verify
+from audit.models import GENESIS_HASH, AuditCheckpoint, AuditEvent, AuditHead
+
+FIELDS = ("id", "created_at", "kind", "object_type", "object_id", "actor_id", "payload", "prev_hash", "hash")
+
+
+class Command(BaseCommand):
+    help = "Verify the audit log hash chain, resuming from the last checkpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Ignore checkpoints and verify from genesis.")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument(
+            "--checkpoint-every",
+            type=int,
+            default=100_000,
+            help="Record a checkpoint after this many verified entries (0: only at the end).",
+        )
+        parser.add_argument("--no-checkpoint", action="store_true", help="Don't record new checkpoints.")
+
+    def handle(self, *args, full=False, chunk_size=2000, checkpoint_every=100_000, no_checkpoint=False, **options):
+        start_id, prev_hash = 0, GENESIS_HASH
+        checkpoint = None if full else AuditCheckpoint.objects.first()
+        if checkpoint is not None:
+            start_id, prev_hash = checkpoint.event_id, checkpoint.hash
+            self.stdout.write(f"Resuming from checkpoint at entry #{start_id}.")
+
+        # Entries appended while we verify are past this head and left for the next run.
+        head = AuditHead.objects.filter(pk=1).first()
+        rows = AuditEvent.objects.filter(id__gt=start_id)
+        if head is not None:
+            rows = rows.filter(id__lte=head.last_event_id)
+        rows = (
+            rows.order_by("id")
+            .values_list(*FIELDS)
+            .iterator(chunk_size=chunk_size)
+        )
+        checked = 0
+        last_id, last_hash = start_id, prev_hash
+        for event_id, event_hash, error in verify(rows, prev_hash):
+            if error:
+                raise CommandError(f"Audit log broken at entry #{event_id}: {error}.")
+            checked += 1
+            last_id, last_hash = event_id, event_hash
+            if not no_checkpoint and checkpoint_every and checked % checkpoint_every == 0:
+                self.checkpoint(last_id, last_hash)
+
+        if head is not None and (head.last_event_id, head.last_hash) != (last_id, last_hash):
+            raise CommandError(
+                f"Audit log ends at entry #{last_id} but its head says #{head.last_event_id}; "
+                f"entries were removed from the end."
+            )
+
+        if not no_checkpoint and checked:
+            self.checkpoint(last_id, last_hash)
+        self.stdout.write(self.style.SUCCESS(f"Verified {checked} entr{'y' if checked == 1 else 'ies'}; chain intact."))
+
+    def checkpoint(self, event_id, event_hash):
+        AuditCheckpoint.objects.update_or_create(event_id=event_id, defaults={"hash": event_hash})
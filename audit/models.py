@@ -0,0 +1,77 @@
+from django.db import models
+from django.utils import timezone
+
+GENESIS_HASH = "0" * 64
+
+
+class AppendOnlyError(Exception):
+    pass
+
+
+class AuditEventQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise AppendOnlyError("Audit events can't be changed.")
+
+    def delete(self):
+        raise AppendOnlyError("Audit events can't be deleted.")
+
+
+class AuditEvent(models.Model):
+    """
+    One entry of the append-only, hash-chained event log. Write through
+    audit.log.record(); `hash` covers this entry's content and the previous
+    entry's hash, so changing or removing any row breaks every later link.
+    """
+    created_at = models.DateTimeField(default=timezone.now)
+    kind = models.CharField(max_length=50, db_index=True)
+    object_type = models.CharField(max_length=100)
+    object_id = models.CharField(max_length=64)
+    # plain ids, not foreign keys: deleting a user must never touch the log
+    actor_id = models.BigIntegerField(null=True, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    prev_hash = models.CharField(max_length=64)
+    hash = models.CharField(max_length=64, unique=True)
+
+    objects = AuditEventQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["object_type", "object_id"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise AppendOnlyError("Audit events can't be changed.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise AppendOnlyError("Audit events can't be deleted.")
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind} {self.object_type}:{self.object_id}"
+
+
+class AuditHead(models.Model):
+    """
+    Single row holding the tip of the chain. Writers lock it, so appends are
+    serialized and the chain never forks.
+    """
+    last_event_id = models.BigIntegerField(default=0)
+    last_hash = models.CharField(max_length=64, default=GENESIS_HASH)
+
+
+class AuditCheckpoint(models.Model):
+    """
+    A point up to which the chain was verified; verification resumes from
+    the latest one instead of walking from genesis.
+    """
+    event_id = models.BigIntegerField(unique=True)
+    hash = models.CharField(max_length=64)
+    verified_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-event_id"]
+
+    def __str__(self):
+        return f"checkpoint @{self.event_id}"
@@ -0,0 +1,108 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib import admin
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from account.models import CustomUser
+from request_app.models import Request, RequestStatus
+
+from . import log
+from .models import AppendOnlyError, AuditCheckpoint, AuditEvent
+
+
+def verify_log(*args):
+    out = StringIO()
+    call_command("verify_audit_log", *args, stdout=out)
+    return out.getvalue()
+
+
+class AuditLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("owner@example.com", "pw")
+        cls.request_obj = Request.objects.create(proposed_by=cls.user)
+
+    def test_entries_are_chained(self):
+        first = log.record("test.event", self.request_obj, actor=self.user, payload={"n": 1})
+        second = log.record("test.event", self.request_obj, actor=self.user, payload={"n": 2})
+        self.assertEqual(second.prev_hash, first.hash)
+        self.assertIn("chain intact", verify_log())
+
+    def test_batch_writes_in_one_insert(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with log.batch():
+                for i in range(50):
+                    log.record("test.event", self.request_obj, payload={"n": i})
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith(f'INSERT INTO "{AuditEvent._meta.db_table}"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(AuditEvent.objects.count(), 50)
+        self.assertIn("Verified 50 entries", verify_log())
+
+    def test_transitions_are_logged(self):
+        self.request_obj.send_for_review(self.user)
+        event = AuditEvent.objects.get(kind="request.transition")
+        self.assertEqual(event.payload, {"action": "send_for_review", "from": "DRAFT", "to": RequestStatus.PENDING_REVIEW})
+        self.assertEqual(event.actor_id, self.user.pk)
+
+    def test_log_is_append_only(self):
+        event = log.record("test.event", self.request_obj)
+        with self.assertRaises(AppendOnlyError):
+            event.save()
+        with self.assertRaises(AppendOnlyError):
+            AuditEvent.objects.all().delete()
+        with self.assertRaises(AppendOnlyError):
+            AuditEvent.objects.update(kind="x")
+
+    def test_tampering_is_detected(self):
+        for i in range(3):
+            log.record("test.event", self.request_obj, payload={"n": i})
+        target = AuditEvent.objects.order_by("id")[1]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {AuditEvent._meta.db_table} SET payload = %s WHERE id = %s", ['{"n": 99}', target.pk]
+            )
+        with self.assertRaisesMessage(CommandError, f"entry #{target.pk}"):
+            verify_log("--no-checkpoint")
+
+    def test_truncating_the_tail_is_detected(self):
+        for i in range(3):
+            log.record("test.event", self.request_obj, payload={"n": i})
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {AuditEvent._meta.db_table} WHERE id = %s", [AuditEvent.objects.last().pk])
+        with self.assertRaisesMessage(CommandError, "removed from the end"):
+            verify_log()
+
+    def test_verification_resumes_from_checkpoint(self):
+        for i in range(5):
+            log.record("test.event", self.request_obj, payload={"n": i})
+        verify_log()
+        self.assertEqual(AuditCheckpoint.objects.first().event_id, AuditEvent.objects.last().pk)
+        log.record("test.event", self.request_obj, payload={"n": 5})
+        self.assertIn("Verified 1 entry", verify_log())
+        self.assertIn("Verified 6 entries", verify_log("--full"))
+
+    def test_entries_appended_during_verification_are_left_for_the_next_run(self):
+        for i in range(3):
+            log.record("test.event", self.request_obj, payload={"n": i})
+
+        def verify_while_appending(rows, prev_hash):
+            for n, result in enumerate(log.verify(rows, prev_hash)):
+                if n == 0:
+                    log.record("test.event", self.request_obj, payload={"n": "late"})
+                yield result
+
+        with mock.patch("audit.management.commands.verify_audit_log.verify", verify_while_appending):
+            self.assertIn("Verified 3 entries", verify_log())
+        self.assertIn("Verified 1 entry", verify_log())
+
+    def test_checkpoints_are_read_only_in_the_admin(self):
+        model_admin = admin.site._registry[AuditCheckpoint]
+        request = RequestFactory().get("/")
+        request.user = CustomUser.objects.create_superuser("admin@example.com", "pw")
+        self.assertFalse(model_admin.has_add_permission(request))
+        self.assertFalse(model_admin.has_change_permission(request))
+        self.assertFalse(model_admin.has_delete_permission(request))
@@ -1,7 +1,8 @@
 from django.contrib import admin
-from .models import CampaignCategory,CampaignImages,Campaign
+from .models import CampaignCategory,CampaignImages,Campaign,CampaignTotals
 
 # Register your models here.
 admin.site.register(CampaignCategory)
 admin.site.register(CampaignImages)
-admin.site.register(Campaign)
\ No newline at end of file
+admin.site.register(Campaign)
+admin.site.register(CampaignTotals)
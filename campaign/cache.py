@@ -0,0 +1,116 @@
+"""
+Fragment cache for the public campaign catalogue.
+
+The rendered list is the same for every visitor with the same (normalized)
+filter parameters, so it is cached per parameter set. Writes that change
+what the list shows bump a version number instead of hunting down keys;
+an entry rendered under an older version, or past its TTL, is stale.
+
+Only one worker at a time (whoever wins the regeneration lock) renders a
+key. On a stale entry the others serve the stale copy meanwhile; on a
+cold miss, with nothing to serve, they wait up to MISS_WAIT seconds for
+the winner's copy and only then render it themselves. So a popular key
+expiring, or a cold start under load, does not turn into a stampede of
+identical renders.
+
+The version number lives in the same cache as the entries. The default
+local-memory ALIAS is per process: with several worker processes, a write
+only marks the pages of the process that made it stale, and the others
+serve theirs for up to TTL seconds. Use a shared backend (the file-based
+'pages' cache, memcached, redis) where that matters.
+
+Configured through settings.PUBLIC_PAGE_CACHE:
+    ALIAS      cache alias to use (local-memory by default, file-based optional)
+    TTL        seconds an entry is fresh
+    STALE_TTL  extra seconds a stale entry may still be served
+    LOCK_TTL   seconds a regeneration lock is held at most
+    MISS_WAIT  seconds a cold miss waits for another worker's render
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+VERSION_KEY = "campaign:public_list:version"
+
+DEFAULTS = {"ALIAS": "default", "TTL": 60, "STALE_TTL": 600, "LOCK_TTL": 30, "MISS_WAIT": 2}
+# seconds between looks for another worker's render on a cold miss
+MISS_POLL = 0.05
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, "PUBLIC_PAGE_CACHE", {})}
+
+
+def _cache():
+    return caches[_config()["ALIAS"]]
+
+
+def current_version():
+    return _cache().get_or_set(VERSION_KEY, 1, timeout=None)
+
+
+def bump_version():
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # key evicted or never set; any value differs from what entries carry
+        cache.set(VERSION_KEY, int(time.time()), timeout=None)
+
+
+def invalidate_public_pages():
+    """
+    Mark every cached public list page stale once the current transaction commits.
+    """
+    transaction.on_commit(bump_version)
+
+
+def fragment_key(params):
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f"campaign:public_list:{digest}"
+
+
+def cached_fragment(params, render):
+    """
+    Return the HTML for `params`, calling `render()` only when this worker
+    wins the right to fill or refresh the entry (or a cold miss has waited
+    MISS_WAIT seconds in vain).
+    """
+    config = _config()
+    cache = _cache()
+    key = fragment_key(params)
+    lock = f"{key}:lock"
+    version = current_version()
+
+    entry = cache.get(key)  # (version, fresh_until, html)
+    if entry is not None:
+        entry_version, fresh_until, html = entry
+        if entry_version == version and fresh_until > time.time():
+            return html
+        if not cache.add(lock, 1, timeout=config["LOCK_TTL"]):
+            # someone else is regenerating; serve the stale copy meanwhile
+            return html
+    elif not cache.add(lock, 1, timeout=config["LOCK_TTL"]):
+        # cold miss while someone else renders: nothing stale to serve, so wait for theirs
+        deadline = time.monotonic() + config["MISS_WAIT"]
+        while time.monotonic() < deadline:
+            time.sleep(MISS_POLL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[2]
+        return _render(cache, key, version, render, config)
+
+    try:
+        return _render(cache, key, version, render, config)
+    finally:
+        cache.delete(lock)
+
+
+def _render(cache, key, version, render, config):
+    html = render()
+    cache.set(key, (version, time.time() + config["TTL"], html), timeout=config["TTL"] + config["STALE_TTL"])
+    return html
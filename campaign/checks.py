@@ -0,0 +1,55 @@
+"""
+System checks for campaign.
+
+FX rates are data, not code: a fresh database has none, and without them
+donations in any currency but the pivot are rejected and left out of
+converted totals (see campaign.fx). These checks make that visible on
+`manage.py migrate` and `manage.py check --database default`.
+"""
+from datetime import timedelta
+
+from django.core.checks import Tags, Warning, register
+from django.db import DatabaseError
+from django.utils import timezone
+
+from . import fx
+
+
+@register(Tags.database)
+def check_fx_rates(app_configs=None, databases=None, **kwargs):
+    if not databases or "default" not in databases:
+        return []
+    from .models import FxRate
+
+    config = fx._config()
+    today = timezone.localdate()
+    try:
+        latest = {}
+        for currency, date in (
+            FxRate.objects.filter(date__lte=today).order_by("currency", "-date").values_list("currency", "date")
+        ):
+            latest.setdefault(currency, date)
+    except DatabaseError:
+        # not migrated yet
+        return []
+
+    hint = "Load current rates with `manage.py load_fx_rates <file>`."
+    errors = []
+    missing = [c for c in fx.Currency.values if c != config["PIVOT"] and c not in latest]
+    if missing:
+        errors.append(Warning(
+            f"No FX rate for {', '.join(missing)}: donations in them are rejected "
+            "and left out of converted totals.",
+            hint=hint, obj="FX_RATES", id="campaign.W001",
+        ))
+    max_age = config["MAX_AGE"]
+    stale = [
+        f"{currency} ({date})" for currency, date in sorted(latest.items())
+        if max_age is not None and date < today - timedelta(days=max_age)
+    ]
+    if stale:
+        errors.append(Warning(
+            f"FX rates older than {max_age} days: {', '.join(stale)}.",
+            hint=hint, obj="FX_RATES", id="campaign.W002",
+        ))
+    return errors
@@ -0,0 +1,153 @@
+"""
+Whether a campaign accepts a donation, and why not.
+
+Every donation path (DonationForm, DonationCreateView, Donation.clean,
+donation_app.ingest and the bulk importer) runs the same check:
+
+    snapshot = campaign_snapshot(slug=...)   # or pk=...
+    snapshot.check(amount)                   # raises DonationRejected
+
+A CampaignSnapshot holds the handful of fields the check needs (visibility,
+request status, currency, dates, amount limits). It is loaded with one
+select_related query and cached for DONATION_INGEST["SNAPSHOT_TTL"]
+seconds; saving or approving a campaign drops its cached snapshot once
+the transaction commits, so the TTL only bounds staleness from writes
+that bypass both (raw UPDATEs, other processes' local caches).
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from . import fx
+from .models import DONATION_STATUSES, Campaign, Visibility
+
+SNAPSHOT_TTL = 30
+
+
+def _ttl():
+    return getattr(settings, "DONATION_INGEST", {}).get("SNAPSHOT_TTL", SNAPSHOT_TTL)
+
+
+class DonationRejected(Exception):
+    """
+    The donation can't be accepted. `code` says why; `field` names the
+    offending input, if any.
+    """
+    def __init__(self, message, code=None, field=None):
+        super().__init__(message)
+        self.code = code
+        self.field = field
+
+    def as_validation_error(self):
+        return ValidationError({self.field or NON_FIELD_ERRORS: ValidationError(str(self), code=self.code)})
+
+
+@dataclass(frozen=True)
+class CampaignSnapshot:
+    id: int
+    slug: str
+    visibility: str
+    status: str
+    currency: str
+    start_date: datetime
+    end_date: Optional[datetime]
+    minimum_donation_amount: Decimal
+    maximum_donation_amount: Optional[Decimal]
+
+    @classmethod
+    def from_campaign(cls, campaign):
+        """
+        Build from a Campaign loaded with select_related("request").
+        """
+        return cls(
+            id=campaign.pk,
+            slug=campaign.slug,
+            visibility=campaign.visibility,
+            status=campaign.status,
+            currency=campaign.currency,
+            start_date=campaign.start_date,
+            end_date=campaign.end_date,
+            minimum_donation_amount=campaign.minimum_donation_amount,
+            maximum_donation_amount=campaign.maximum_donation_amount,
+        )
+
+    def get_absolute_url(self):
+        return reverse("campaign:detail", kwargs={"slug": self.slug})
+
+    def check(self, amount, currency=None, now=None):
+        """
+        Raise DonationRejected unless a donation of `amount` (in `currency`,
+        default the campaign's) may be accepted now. Limits are in the
+        campaign's currency; other currencies are converted at today's rate.
+        """
+        now = now or timezone.now()
+        if self.visibility != Visibility.PUBLIC:
+            raise DonationRejected("This campaign is not accepting donations.", code="not_public")
+        if self.status not in DONATION_STATUSES:
+            raise DonationRejected("This campaign is not open for donations.", code="not_open")
+        if self.start_date > now:
+            raise DonationRejected("This campaign has not started yet.", code="not_started")
+        if self.end_date is not None and self.end_date < now:
+            raise DonationRejected("This campaign has ended.", code="ended")
+        if currency is not None and currency != self.currency:
+            multiplier = fx.factor(currency, self.currency)
+            if multiplier is None:
+                raise DonationRejected(
+                    f"Donations in {currency} are not accepted right now.", code="currency", field="currency"
+                )
+            amount = amount * multiplier
+        min_amt = self.minimum_donation_amount or Decimal("0.00")
+        if amount < min_amt:
+            raise DonationRejected(f"Minimum allowed is {min_amt}.", code="below_minimum", field="amount")
+        max_amt = self.maximum_donation_amount
+        if max_amt is not None and amount > max_amt:
+            raise DonationRejected(f"Maximum allowed is {max_amt}.", code="above_maximum", field="amount")
+
+
+def snapshot_keys(pk, slug):
+    return [f"campaign:snapshot:pk:{pk}", f"campaign:snapshot:slug:{slug}"]
+
+
+def campaign_snapshot(slug=None, pk=None):
+    """
+    The CampaignSnapshot for the campaign with `slug` (or `pk`), or None if
+    there is no such campaign.
+    """
+    key = f"campaign:snapshot:slug:{slug}" if slug is not None else f"campaign:snapshot:pk:{pk}"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        lookup = {"slug": slug} if slug is not None else {"pk": pk}
+        campaign = Campaign.objects.select_related("request").filter(**lookup).first()
+        if campaign is None:
+            return None
+        snapshot = CampaignSnapshot.from_campaign(campaign)
+        cache.set_many(dict.fromkeys(snapshot_keys(snapshot.id, snapshot.slug), snapshot), _ttl())
+    return snapshot
+
+
+def snapshot_for(campaign):
+    """
+    A snapshot for a Campaign instance, without touching the database if
+    its request is already loaded.
+    """
+    if isinstance(campaign, CampaignSnapshot):
+        return campaign
+    if Campaign.request.is_cached(campaign):
+        return CampaignSnapshot.from_campaign(campaign)
+    return campaign_snapshot(pk=campaign.pk)
+
+
+def forget_snapshots(campaigns):
+    """
+    Drop cached snapshots of `campaigns` ((pk, slug) pairs) once the transaction commits.
+    """
+    keys = [key for pk, slug in campaigns for key in snapshot_keys(pk, slug)]
+    transaction.on_commit(lambda: cache.delete_many(keys))
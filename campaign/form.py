@@ -3,10 +3,13 @@ from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.text import slugify
 from django.forms import inlineformset_factory
+from django.utils.datastructures import MultiValueDict
 
 from .models import Campaign, CampaignCategory, CampaignImages, Visibility
+from .uploads import image_name, save_gallery_images, verify_images
 from request_app.models import Request,RequestStatus
 from account.models import CustomUser
+from audit import log as audit_log
 
 
 
@@ -26,6 +29,21 @@ class CommaSeparatedTagsField(forms.CharField):
 class MultiFileInput(forms.ClearableFileInput):
         allow_multiple_selected = True
 
+class MultipleImageField(forms.ImageField):
+    """
+    ImageField for <input type="file" multiple>; cleans to a list of uploads,
+    each checked like a single ImageField (extension and image content).
+    """
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("widget", MultiFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single(d, initial) for d in data if d]
+        return [single(data, initial)] if data else []
+
 class CampaignForm(forms.ModelForm):
     # Field customizations for UX
     title = forms.CharField(max_length=200,)
@@ -35,6 +53,7 @@ class CampaignForm(forms.ModelForm):
     category = forms.ModelChoiceField(queryset=CampaignCategory.objects.all(),)
     tags = CommaSeparatedTagsField()
     cover_image = forms.ImageField(required=False)
+    gallery_bulk = MultipleImageField(required=False)
     start_date = forms.DateTimeField()   
     end_date = forms.DateTimeField()
 
@@ -66,6 +85,14 @@ class CampaignForm(forms.ModelForm):
 
 
 
+    def __init__(self, *args, upload_errors=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        # set by campaign.uploads.UploadBudgetHandler when the request was over budget
+        self.upload_errors = list(upload_errors)
+        if self.upload_errors:
+            # the parser closes every upload once a file is skipped; none is readable
+            self.files = MultiValueDict()
+
     class Meta:
         model = Campaign
         # Excluding ForeignKey 'request' so you can set it in the view (e.g., from current request/context)
@@ -89,6 +116,21 @@ class CampaignForm(forms.ModelForm):
             raise ValidationError("This slug is already in use. Please choose a different slug.")
         return slug
 
+    def clean_cover_image(self):
+        cover = self.cleaned_data.get("cover_image")
+        if cover and hasattr(cover, "image"):
+            # a new upload: store it under its real format, not the client's name
+            verify_images([cover])
+            cover.name = image_name(cover)
+        return cover
+
+    def clean_gallery_bulk(self):
+        if self.upload_errors:
+            raise ValidationError(self.upload_errors)
+        files = self.cleaned_data.get("gallery_bulk") or []
+        verify_images(files)
+        return files
+
     def clean(self):
         cleaned = super().clean()
         start_date = cleaned.get("start_date")
@@ -113,7 +155,8 @@ class CampaignForm(forms.ModelForm):
         Two-phase save to ensure cover_image and gallery images use instance.id in upload_to:
         1) Save instance without the cover image to get a primary key (id).
         2) Assign the cover image and save again.
-        3) Create CampaignImages from gallery_bulk (multiple) after instance exists.
+        3) Create CampaignImages from gallery_bulk (multiple) after instance exists,
+           in one batch (see campaign.uploads).
         Also ensures tags are stored as a unique list preserving order.
         """
         instance = super().save(commit=False)
@@ -128,12 +171,19 @@ class CampaignForm(forms.ModelForm):
         if commit:
             if instance.request.status==RequestStatus.DRAFT:
                 # print("instance.id",instance.id)
-                instance.save()
+                adding = instance._state.adding
+                with audit_log.batch():
+                    instance.save()
+                    audit_log.record(
+                        "campaign.create" if adding else "campaign.update", instance, actor=user,
+                        payload={"changed": sorted(self.changed_data)},
+                    )
             else:
                 raise Exception("Campaign request is not in draft status")
 
-            for f in self.files.getlist('gallery_bulk'):
-                instance.gallery.create(image=f)
+            gallery = self.cleaned_data.get("gallery_bulk")
+            if gallery:
+                save_gallery_images(instance, gallery)
 
             self.save_m2m()
 
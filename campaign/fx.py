@@ -0,0 +1,140 @@
+"""
+Currencies and the local FX rate table.
+
+Donations keep the currency they were made in; CampaignTotals keeps one
+running sum per currency. Totals are converted into the campaign's base
+currency when read: with_donation_stats() folds the per-currency columns
+into one SQL expression using the current rates as constants, so list
+pages get converted totals with no extra queries and no per-row Python.
+
+Rates are FxRate rows, each the value of one unit of a currency in the
+PIVOT currency from its date on (the pivot itself is always 1). The
+latest rate on or before today is used. A new database has none; load
+them from your rate source with
+
+    manage.py load_fx_rates rates.csv
+
+(campaign/fixtures/sample_fx_rates.csv shows the format; its rates are
+made-up samples for development and tests). Rates are held in a
+per-process cache for CACHE_TTL seconds (saving an FxRate clears this
+process's copy). A currency with no rate is left out of
+converted totals rather than counted at a made-up rate; the
+campaign.W001/W002 system checks warn about missing and stale rates on
+`manage.py migrate`.
+
+Configured through settings.FX_RATES:
+    PIVOT      currency the stored rates are quoted in
+    CACHE_TTL  seconds a process keeps the rates it loaded
+    MAX_AGE    days before a currency's latest rate is reported as stale (None to disable)
+"""
+import threading
+import time
+from decimal import ROUND_HALF_UP, Decimal
+from functools import reduce
+from operator import add
+
+from django.conf import settings
+from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+DEFAULTS = {"PIVOT": "INR", "CACHE_TTL": 300, "MAX_AGE": 7}
+FACTOR_PLACES = Decimal("0.0000000001")
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, "FX_RATES", {})}
+
+
+class Currency(models.TextChoices):
+    INR = "INR", "INR"
+    USD = "USD", "USD"
+    EUR = "EUR", "EUR"
+
+
+# CampaignTotals column holding the running sum of each currency
+TOTAL_FIELDS = {currency: f"raised_{currency.lower()}" for currency in Currency.values}
+
+
+# -----------------------
+# Rate cache
+# -----------------------
+_lock = threading.Lock()
+_cached = {"expires": 0.0, "rates": {}}
+
+
+def current_rates():
+    """
+    {currency: value of one unit in the pivot currency} as of today.
+    """
+    now = time.monotonic()
+    if _cached["expires"] > now:
+        return _cached["rates"]
+    from .models import FxRate
+
+    config = _config()
+    rates = {config["PIVOT"]: Decimal(1)}
+    rows = (
+        FxRate.objects.filter(date__lte=timezone.localdate())
+        .exclude(currency=config["PIVOT"])
+        .order_by("currency", "-date")
+        .values_list("currency", "rate")
+    )
+    for currency, rate in rows:
+        # newest first within each currency
+        rates.setdefault(currency, rate)
+    with _lock:
+        _cached.update(expires=now + config["CACHE_TTL"], rates=rates)
+    return rates
+
+
+def clear_cache():
+    with _lock:
+        _cached.update(expires=0.0, rates={})
+
+
+def factor(source, target, rates=None):
+    """
+    Multiplier converting `source` amounts into `target`, or None without rates for both.
+    """
+    if source == target:
+        return Decimal(1)
+    rates = current_rates() if rates is None else rates
+    if source not in rates or target not in rates:
+        return None
+    return (rates[source] / rates[target]).quantize(FACTOR_PLACES)
+
+
+def convert(amounts, target):
+    """
+    Sum {currency: amount} in `target`, skipping currencies without a rate.
+    """
+    rates = current_rates()
+    total = Decimal("0.00")
+    for currency, amount in amounts.items():
+        multiplier = factor(currency, target, rates)
+        if amount and multiplier is not None:
+            total += amount * multiplier
+    # half away from zero, like SQL ROUND in converted_total()
+    return total.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def converted_total(prefix="totals__"):
+    """
+    SQL expression for a campaign's raised amount in its own currency,
+    from the per-currency total columns reached through `prefix`.
+    """
+    rates = current_rates()
+    whens = []
+    for base in Currency.values:
+        terms = []
+        for currency, field in TOTAL_FIELDS.items():
+            multiplier = factor(currency, base, rates)
+            if multiplier is None:
+                continue
+            column = Coalesce(F(prefix + field), Decimal("0.00"))
+            terms.append(column if multiplier == 1 else column * Value(multiplier))
+        whens.append(When(currency=base, then=reduce(add, terms)))
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    return Round(Case(*whens, default=Value(Decimal("0.00")), output_field=amount), 2, output_field=amount)
@@ -0,0 +1,168 @@
+"""
+Fixed-width renditions of campaign cover and gallery images.
+
+Every uploaded image gets a WebP and a JPEG copy at each width in
+RENDITION_WIDTHS, stored next to the original:
+
+    blobs/3f/<digest>.png  ->  blobs/3f/<digest>_w320.webp, ..._w320.jpg, ...
+
+Images narrower than a target width are not upscaled; the rendition simply
+keeps the original size, so every name in a srcset exists once the image
+is processed.
+
+Uploads call schedule_renditions(): the renditions are written after the
+transaction commits, on a background thread, so the request doesn't wait
+on Pillow. `manage.py generate_image_renditions` fills in any a process
+didn't get to before it stopped. Either way the model records it in a
+`<field>_renditions_ready` flag next to the image field once they are all
+written, and srcset() stays empty until then, so the templates never have
+to stat the filesystem and never point at renditions that don't exist yet.
+
+Configured through settings.IMAGE_RENDITIONS:
+    BACKGROUND  render on a background thread; off, render right after commit, in the request
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+RENDITION_WIDTHS = (320, 640, 1280)
+# file extension -> Pillow format
+RENDITION_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+QUALITY = 80
+
+DEFAULTS = {"BACKGROUND": True}
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, "IMAGE_RENDITIONS", {})}
+
+
+def rendition_name(name, width, ext):
+    base, _ = os.path.splitext(name)
+    return f"{base}_w{width}.{ext}"
+
+
+def rendition_names(name):
+    return [
+        rendition_name(name, width, ext)
+        for width in RENDITION_WIDTHS
+        for ext in RENDITION_FORMATS
+    ]
+
+
+def generate_renditions(storage, name, overwrite=False):
+    """
+    Write every rendition of the image `name` in `storage`. Returns the names written.
+
+    Stored names are content-hashed, so existing renditions are up to date
+    and are only re-rendered with `overwrite`.
+    """
+    if not overwrite and all(storage.exists(target) for target in rendition_names(name)):
+        return []
+
+    with storage.open(name, "rb") as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    written = []
+    for width in RENDITION_WIDTHS:
+        resized = image.copy()
+        resized.thumbnail((width, width * 10), Image.Resampling.LANCZOS)
+        for ext, fmt in RENDITION_FORMATS.items():
+            target = rendition_name(name, width, ext)
+            if storage.exists(target):
+                if not overwrite:
+                    continue
+                if not hasattr(storage, "save_derived"):
+                    storage.delete(target)
+            frame = resized.convert("RGB") if fmt == "JPEG" else resized
+            buffer = BytesIO()
+            frame.save(buffer, format=fmt, quality=QUALITY, optimize=True)
+            written.append(_save_derived(storage, target, ContentFile(buffer.getvalue())))
+    return written
+
+
+def _save_derived(storage, name, content):
+    # ContentHashedStorage would otherwise hash a legacy (non-blob) name into a new blob
+    if hasattr(storage, "save_derived"):
+        return storage.save_derived(name, content)
+    return storage.save(name, content)
+
+
+def delete_renditions(storage, name):
+    for target in rendition_names(name):
+        storage.delete(target)
+
+
+def renditions_ready(fieldfile):
+    """
+    Whether every rendition of `fieldfile` has been written, per its model's flag.
+    """
+    return bool(fieldfile) and getattr(fieldfile.instance, f"{fieldfile.field.name}_renditions_ready", False)
+
+
+def srcset(fieldfile, ext):
+    """
+    `srcset` attribute value for the renditions of `fieldfile` in one format;
+    empty until they have been written.
+    """
+    if not renditions_ready(fieldfile):
+        return ""
+    storage = fieldfile.storage
+    return ", ".join(
+        f"{storage.url(rendition_name(fieldfile.name, width, ext))} {width}w"
+        for width in RENDITION_WIDTHS
+    )
+
+
+# -----------------------
+# Scheduling
+# -----------------------
+_pool_lock = threading.Lock()
+_pool = None
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # one thread: uploads queue up instead of competing for the CPU with requests
+            _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="renditions")
+        return _pool
+
+
+def schedule_renditions(storage, names, on_rendered=None):
+    """
+    Generate the renditions of `names` once the current transaction commits,
+    then call `on_rendered` with the names whose renditions are all written.
+    """
+    names = list(names)
+
+    def render():
+        done = []
+        try:
+            for name in names:
+                generate_renditions(storage, name)
+                done.append(name)
+        finally:
+            if done and on_rendered is not None:
+                on_rendered(done)
+
+    def start():
+        if _config()["BACKGROUND"]:
+            _executor().submit(render)
+        else:
+            render()
+
+    if names:
+        transaction.on_commit(start)
@@ -0,0 +1,73 @@
+import os
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import FileField
+
+from a_core.utils.storage import BLOB_PREFIX, ContentHashedStorage, blob_digest, is_blob
+
+
+def hashed_file_fields():
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, FileField) and isinstance(field.storage, ContentHashedStorage):
+                yield model, field
+
+
+def walk(storage, path):
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield f"{path}/{name}"
+    for directory in directories:
+        yield from walk(storage, f"{path}/{directory}")
+
+
+class Command(BaseCommand):
+    help = "Delete content-hashed media blobs (and their renditions) that no row references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=24 * 60 * 60,
+            help="Only delete blobs older than this many seconds, so uploads whose row "
+                 "is not committed yet survive (default: one day).",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="List what would be deleted.")
+
+    def handle(self, *args, min_age=0, dry_run=False, **options):
+        # digest -> referenced; renditions share their original's digest
+        referenced = set()
+        storages = {}
+        for model, field in hashed_file_fields():
+            storages[field.storage.location] = field.storage
+            names = (
+                model._default_manager.exclude(**{field.name: ""})
+                .exclude(**{f"{field.name}__isnull": True})
+                .values_list(field.name, flat=True)
+            )
+            referenced.update(blob_digest(name) for name in names.iterator() if is_blob(name))
+
+        cutoff = time.time() - min_age
+        deleted = freed = 0
+        for storage in storages.values():
+            if not storage.exists(BLOB_PREFIX):
+                continue
+            for name in walk(storage, BLOB_PREFIX):
+                if blob_digest(name) in referenced:
+                    continue
+                if os.path.getmtime(storage.path(name)) > cutoff:
+                    continue
+                size = storage.size(name)
+                if dry_run:
+                    self.stdout.write(name)
+                else:
+                    storage.purge(name)
+                deleted += 1
+                freed += size
+
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {deleted} unreferenced file(s), {freed} bytes; {len(referenced)} blob(s) in use."
+        ))
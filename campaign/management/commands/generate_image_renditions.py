@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from campaign.images import generate_renditions
+from campaign.models import mark_renditions_ready
+
+# (model label, field name) of every image field that gets renditions
+IMAGE_FIELDS = (
+    ("campaign.Campaign", "cover_image"),
+    ("campaign.CampaignImages", "image"),
+)
+
+
+def _init_worker():
+    # Needed when the pool spawns instead of forking (macOS / Windows).
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "a_core.settings")
+    django.setup()
+
+
+def _render(label, field_name, name, overwrite):
+    field = apps.get_model(label)._meta.get_field(field_name)
+    return len(generate_renditions(field.storage, name, overwrite=overwrite))
+
+
+class Command(BaseCommand):
+    help = "Backfill WebP/JPEG renditions for existing campaign cover and gallery images."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            help="Re-render renditions that already exist.",
+        )
+
+    def handle(self, *args, workers=1, overwrite=False, **options):
+        jobs = []
+        for label, field_name in IMAGE_FIELDS:
+            model = apps.get_model(label)
+            names = (
+                model.objects.exclude(**{field_name: ""})
+                .exclude(**{f"{field_name}__isnull": True})
+                .values_list(field_name, flat=True)
+            )
+            jobs.extend((label, field_name, name) for name in names.iterator())
+
+        # Workers only touch storage; don't let them inherit open DB connections.
+        connections.close_all()
+
+        written = failed = 0
+        done = []
+        with ProcessPoolExecutor(max_workers=max(workers, 1), initializer=_init_worker) as pool:
+            futures = {
+                pool.submit(_render, label, field_name, name, overwrite): name
+                for label, field_name, name in jobs
+            }
+            for future in as_completed(futures):
+                try:
+                    written += future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"{futures[future]}: {exc}")
+                else:
+                    done.append(futures[future])
+        mark_renditions_ready(done)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {len(jobs)} image(s): {written} rendition(s) written, {failed} failed."
+        ))
@@ -0,0 +1,52 @@
+import csv
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from campaign import fx
+from campaign.cache import invalidate_public_pages
+from campaign.models import FxRate
+
+
+class Command(BaseCommand):
+    help = (
+        "Load FX rates from a CSV (date,currency,rate) or JSON file (a list of "
+        "{date, currency, rate}). Rates are the value of one unit in FX_RATES['PIVOT']; "
+        "existing (currency, date) rows are updated."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+
+    def handle(self, path, **options):
+        pivot = fx._config()["PIVOT"]
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = json.load(f) if Path(path).suffix.lower() == ".json" else list(csv.DictReader(f))
+
+        rates = []
+        for line, row in enumerate(rows, start=1):
+            try:
+                currency = row["currency"].strip().upper()
+                rate = FxRate(currency=currency, date=date.fromisoformat(row["date"].strip()),
+                              rate=Decimal(str(row["rate"]).strip()))
+            except (KeyError, ValueError, InvalidOperation, AttributeError) as e:
+                raise CommandError(f"Row {line}: expected date, currency and rate ({e}).")
+            if currency not in fx.Currency.values:
+                raise CommandError(f"Row {line}: unknown currency {currency!r}.")
+            if rate.rate <= 0:
+                raise CommandError(f"Row {line}: rate must be positive.")
+            if currency != pivot:
+                rates.append(rate)
+
+        with transaction.atomic():
+            FxRate.objects.bulk_create(
+                rates, update_conflicts=True, unique_fields=["currency", "date"], update_fields=["rate"]
+            )
+            # raised totals shown on cached pages change with the rates
+            invalidate_public_pages()
+            transaction.on_commit(fx.clear_cache)
+        self.stdout.write(self.style.SUCCESS(f"Loaded {len(rates)} rate(s)."))
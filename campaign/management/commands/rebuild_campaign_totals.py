@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from campaign.models import CampaignTotals
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized per-campaign donation totals from the donation ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only verify the stored totals; exit with an error if any campaign drifted.",
+        )
+        parser.add_argument(
+            "--campaign",
+            type=int,
+            action="append",
+            dest="campaign_ids",
+            help="Limit to a campaign id (repeatable).",
+        )
+
+    def handle(self, *args, check=False, campaign_ids=None, **options):
+        mismatches = CampaignTotals.objects.rebuild(campaign_ids=campaign_ids, dry_run=check)
+
+        for campaign_id, stored, actual in mismatches:
+            self.stdout.write(f"campaign {campaign_id}: stored={stored} ledger={actual}")
+
+        if check and mismatches:
+            raise CommandError(f"{len(mismatches)} campaign(s) out of sync with the donation ledger.")
+        if check:
+            self.stdout.write(self.style.SUCCESS("All campaign totals match the donation ledger."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt totals for {len(mismatches)} campaign(s)."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from campaign.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the campaign full-text search index from the Campaign table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, batch_size=1000, **options):
+        backend = get_search_backend()
+        total = backend.rebuild(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {total} campaign(s) with {backend.__class__.__name__}."
+        ))
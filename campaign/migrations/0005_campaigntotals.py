@@ -0,0 +1,25 @@
+# Generated by Django 5.1.3 on 2026-10-17 20:10
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaign', '0004_remove_campaign_campaign_ca_status_dc625a_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignTotals',
+            fields=[
+                ('campaign', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='totals', serialize=False, to='campaign.campaign')),
+                ('amount_raised', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('donations_count', models.PositiveIntegerField(default=0)),
+                ('donor_count', models.PositiveIntegerField(default=0)),
+                ('last_donation_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from campaign.search import backend_for_vendor
+
+
+def install_search_index(apps, schema_editor):
+    backend = backend_for_vendor(schema_editor.connection.vendor)
+    backend.install(schema_editor)
+    Campaign = apps.get_model('campaign', 'Campaign')
+    backend.index(Campaign.objects.select_related('category').iterator(chunk_size=1000))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaign', '0005_campaigntotals'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, migrations.RunPython.noop),
+    ]
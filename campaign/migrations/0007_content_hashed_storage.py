@@ -0,0 +1,25 @@
+# Generated by Django 5.1.3 on 2026-10-17 20:20
+
+import a_core.utils.storage
+import campaign.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaign', '0006_campaign_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='campaign',
+            name='cover_image',
+            field=models.ImageField(blank=True, null=True, storage=a_core.utils.storage.ContentHashedStorage(), upload_to=campaign.models.Campaign._get_image_url),
+        ),
+        migrations.AlterField(
+            model_name='campaignimages',
+            name='image',
+            field=models.ImageField(storage=a_core.utils.storage.ContentHashedStorage(), upload_to=campaign.models.CampaignImages._get_image_url),
+        ),
+    ]
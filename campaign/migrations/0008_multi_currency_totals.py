@@ -0,0 +1,68 @@
+# Generated by Django 5.1.3 on 2026-10-17 20:38
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def split_totals_by_currency(apps, schema_editor):
+    # amount_raised summed every currency together; recount each from the ledger
+    CampaignTotals = apps.get_model('campaign', 'CampaignTotals')
+    Campaign = apps.get_model('campaign', 'Campaign')
+    fields = {'INR': 'raised_inr', 'USD': 'raised_usd', 'EUR': 'raised_eur'}
+    rows = Campaign.objects.order_by().values('pk').annotate(**{
+        field: Coalesce(Sum('donations__amount', filter=Q(donations__currency=currency)), Decimal('0.00'))
+        for currency, field in fields.items()
+    })
+    for row in rows.iterator():
+        CampaignTotals.objects.filter(campaign_id=row.pop('pk')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaign', '0007_content_hashed_storage'),
+        ('donation_app', '0003_donation_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='currency',
+            field=models.CharField(choices=[('INR', 'INR'), ('USD', 'USD'), ('EUR', 'EUR')], default='INR', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='campaigntotals',
+            name='raised_eur',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='campaigntotals',
+            name='raised_inr',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='campaigntotals',
+            name='raised_usd',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14),
+        ),
+        migrations.CreateModel(
+            name='FxRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('INR', 'INR'), ('USD', 'USD'), ('EUR', 'EUR')], max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+            ],
+            options={
+                'ordering': ['currency', '-date'],
+                'constraints': [models.UniqueConstraint(fields=('currency', 'date'), name='fx_rate_currency_date'), models.CheckConstraint(condition=models.Q(('rate__gt', 0)), name='fx_rate_positive')],
+            },
+        ),
+        migrations.RunPython(split_totals_by_currency, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='campaigntotals',
+            name='amount_raised',
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.3 on 2026-10-17 20:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaign', '0008_multi_currency_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostgresSearchEntry',
+            fields=[
+                ('campaign', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='ts_entry', serialize=False, to='campaign.campaign')),
+            ],
+            options={
+                'db_table': 'campaign_search_document',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='SQLiteSearchEntry',
+            fields=[
+                ('campaign', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fts_entry', serialize=False, to='campaign.campaign')),
+            ],
+            options={
+                'db_table': 'campaign_search_fts',
+                'managed': False,
+            },
+        ),
+    ]
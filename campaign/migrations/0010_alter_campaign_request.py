@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-17 21:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaign', '0009_search_entry_tables'),
+        ('request_app', '0005_alter_requestmessage_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='campaign',
+            name='request',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, related_name='request_obj', to='request_app.request'),
+        ),
+    ]
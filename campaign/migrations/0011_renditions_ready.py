@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-17 21:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaign', '0010_alter_campaign_request'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='cover_image_renditions_ready',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='campaignimages',
+            name='image_renditions_ready',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
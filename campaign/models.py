@@ -7,14 +7,21 @@ from django.urls import reverse
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.db import models, transaction
-from django.db.models import Sum, Count
+from django.db.models import Sum, Count, Max, F
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 from django.utils.text import slugify
 import os
 
-from request_app.models import Request
+from request_app.models import Request, RequestStatus
 
-from a_core.utils.storage import OverwriteStorage
+from a_core.utils.storage import ContentHashedStorage
+
+from . import fx
+from .cache import invalidate_public_pages
+from .fx import TOTAL_FIELDS, Currency
+from .images import delete_renditions, schedule_renditions
+from .search import get_search_backend
 
 
 # -----------------------
@@ -30,21 +37,46 @@ class CampaignCategory(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # the category name is part of every member campaign's search document
+            get_search_backend().index(self.campaigns.select_related("category"))
+            invalidate_public_pages()
+
+    def delete(self, *args, **kwargs):
+        campaign_ids = list(self.campaigns.values_list("pk", flat=True))
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            get_search_backend().index(Campaign.objects.filter(pk__in=campaign_ids).select_related("category"))
+            invalidate_public_pages()
+        return result
+
 
 class Visibility(models.TextChoices):
     PRIVATE = "PRIVATE", "Private"
     PUBLIC = "PUBLIC", "Public"
 
-class CampaignManager(models.Manager):
+# Request statuses in which a public campaign takes donations (see campaign.eligibility)
+DONATION_STATUSES = (RequestStatus.APPROVED, RequestStatus.ACTIVE)
+
+
+class MetricQueryFallback(RuntimeError):
+    """
+    Raised in strict mode when a campaign metric property has to query per row.
+    """
+
+
+class CampaignQuerySet(models.QuerySet):
     def active_public(self):
         """
         Campaigns currently visible to donors.
         """
         now = timezone.now()
         return (
-            self.get_queryset()
+            self
             .filter(
-                status=CampaignStatus.ACTIVE,
+                request__status__in=DONATION_STATUSES,
                 visibility=Visibility.PUBLIC,
             )
             .filter(
@@ -53,6 +85,111 @@ class CampaignManager(models.Manager):
             )
         )
 
+    def with_donation_stats(self):
+        """
+        Annotate amount raised (converted into each campaign's currency, see
+        campaign.fx), donation count and donor count from the materialized
+        totals in the same query (a join, no GROUP BY), so the metric
+        properties never fall back to a per-row query.
+        """
+        return self.annotate(
+            _amount_raised=fx.converted_total(),
+            _donations_count=Coalesce(F("totals__donations_count"), 0),
+            _donor_count=Coalesce(F("totals__donor_count"), 0),
+        )
+
+
+class CampaignManager(models.Manager.from_queryset(CampaignQuerySet)):
+    pass
+
+class CampaignTotalsManager(models.Manager):
+    def record_donation(self, donation):
+        """
+        Fold a freshly inserted donation into its campaign's totals.
+        Must run inside the same transaction as the donation INSERT.
+        """
+        self.record_donations(donation.campaign_id, [donation])
+
+    def record_donations(self, campaign_id, donations):
+        """
+        Fold freshly inserted donations to one campaign into its totals with
+        one UPDATE (plus one donor check). Must run inside the same
+        transaction as the INSERT.
+        """
+        if not donations:
+            return
+        amounts = {}
+        for d in donations:
+            amounts[d.currency] = amounts.get(d.currency, Decimal("0.00")) + d.amount
+        latest = max(d.created_at for d in donations)
+        # The UPDATE takes the row lock first, so the donor check below is
+        # serialized against concurrent donations to the same campaign.
+        updated = self.filter(campaign_id=campaign_id).update(
+            **{TOTAL_FIELDS[c]: F(TOTAL_FIELDS[c]) + amount for c, amount in amounts.items()},
+            donations_count=F("donations_count") + len(donations),
+            last_donation_at=Greatest(Coalesce(F("last_donation_at"), latest), latest),
+        )
+        if not updated:
+            # Campaign predates the totals table and was never backfilled.
+            self.rebuild(campaign_ids=[campaign_id])
+            return
+
+        donor_ids = {d.donor_id for d in donations if d.donor_id is not None}
+        if not donor_ids:
+            return
+        seen_before = set(
+            donations[0].__class__.objects.filter(campaign_id=campaign_id, donor_id__in=donor_ids)
+            .exclude(pk__in=[d.pk for d in donations])
+            .values_list("donor_id", flat=True)
+            .distinct()
+        )
+        new_donors = len(donor_ids - seen_before)
+        if new_donors:
+            self.filter(campaign_id=campaign_id).update(donor_count=F("donor_count") + new_donors)
+
+    def compute(self, campaign_ids=None):
+        """
+        Totals recomputed from the donation ledger, as {campaign_id: dict}.
+        """
+        qs = Campaign.objects.all()
+        if campaign_ids is not None:
+            qs = qs.filter(pk__in=campaign_ids)
+        rows = qs.order_by().values("pk").annotate(
+            **{
+                field: Coalesce(Sum("donations__amount", filter=models.Q(donations__currency=c)), Decimal("0.00"))
+                for c, field in TOTAL_FIELDS.items()
+            },
+            donations_count=Count("donations"),
+            donor_count=Count("donations__donor", distinct=True),
+            last_donation_at=Max("donations__created_at"),
+        )
+        return {row.pop("pk"): row for row in rows.iterator()}
+
+    def rebuild(self, campaign_ids=None, dry_run=False):
+        """
+        Compare stored totals with the ledger and repair any that drifted.
+        Returns a list of (campaign_id, stored, actual) for every mismatch.
+        """
+        actual = self.compute(campaign_ids)
+        stored = {
+            row.pop("campaign_id"): row
+            for row in self.filter(campaign_id__in=list(actual)).values(
+                "campaign_id", *TOTAL_FIELDS.values(), "donations_count", "donor_count", "last_donation_at"
+            )
+        }
+        mismatches = []
+        for campaign_id, values in actual.items():
+            current = stored.get(campaign_id)
+            if current == values:
+                continue
+            mismatches.append((campaign_id, current, values))
+            if not dry_run:
+                self.update_or_create(campaign_id=campaign_id, defaults=values)
+        if mismatches and not dry_run:
+            invalidate_public_pages()
+        return mismatches
+
+
 class CampaignImages(models.Model):
 
     def _get_image_url(instance, filename):
@@ -62,11 +199,28 @@ class CampaignImages(models.Model):
         return f"campaign/gallery/{instance.campaign.id}/{safe_filename}"
 
     campaign = models.ForeignKey('Campaign', on_delete=models.CASCADE, related_name='gallery')
-    image = models.ImageField(upload_to=_get_image_url)
+    image = models.ImageField(upload_to=_get_image_url, storage=ContentHashedStorage())
+    # set by mark_renditions_ready once campaign.images has written them all
+    image_renditions_ready = models.BooleanField(default=False, editable=False)
+
+    def save(self, *args, **kwargs):
+        new_upload = bool(self.image) and not self.image._committed
+        if new_upload:
+            self.image_renditions_ready = False
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            invalidate_public_pages()
+            # also re-checks rows saved from an instance loaded before the flag was set
+            if self.image and not self.image_renditions_ready:
+                schedule_renditions(self.image.storage, [self.image.name], mark_renditions_ready)
 
     def delete(self, *args, **kwargs):
+        if self.image:
+            delete_renditions(self.image.storage, self.image.name)
         self.image.delete()
-        super().delete(*args, **kwargs)
+        with transaction.atomic():
+            super().delete(*args, **kwargs)
+            invalidate_public_pages()
 
     def __str__(self):
         return f'{self.campaign.title} - {self.image}'
@@ -86,14 +240,17 @@ class Campaign(models.Model):
     tags = models.JSONField(default=list, blank=True)
     cover_image = models.ImageField(
         upload_to=_get_image_url,
-        storage=OverwriteStorage(),
+        storage=ContentHashedStorage(),
         null=True,
         blank=True
     )
+    cover_image_renditions_ready = models.BooleanField(default=False, editable=False)
     # gallery = models.ForeignKey(CampaignImages, on_delete=models.CASCADE, null=True, blank=True)
 
     # Governance & workflow
     visibility = models.CharField(max_length=10, choices=Visibility.choices, default=Visibility.PRIVATE)
+    # goal, donation limits and the raised total are in this currency
+    currency = models.CharField(max_length=3, choices=Currency.choices, default=Currency.INR)
     
     request=models.OneToOneField(Request, on_delete=models.DO_NOTHING,related_name="request_obj")
     
@@ -128,12 +285,34 @@ class Campaign(models.Model):
         ]
 
     def delete(self, *args, **kwargs):
+        if self.cover_image:
+            delete_renditions(self.cover_image.storage, self.cover_image.name)
         self.cover_image.delete()
-        super().delete(*args, **kwargs)
+        campaign_id = self.pk
+        with transaction.atomic():
+            super().delete(*args, **kwargs)
+            get_search_backend().remove([campaign_id])
+            invalidate_public_pages()
 
     def __str__(self):
         return self.title
 
+    @property
+    def _totals(self) -> "CampaignTotals":
+        if (
+            getattr(settings, "CAMPAIGN_METRICS_STRICT", False)
+            and self.pk is not None
+            and not Campaign.totals.is_cached(self)
+        ):
+            raise MetricQueryFallback(
+                f"Campaign {self.pk} metrics were not preloaded; "
+                "use Campaign.objects.with_donation_stats() or select_related('totals')."
+            )
+        try:
+            return self.totals
+        except CampaignTotals.DoesNotExist:
+            return CampaignTotals(campaign=self)
+
     # -----------------------
     # Derived metrics
     # -----------------------
@@ -161,21 +340,27 @@ class Campaign(models.Model):
         cached = getattr(self, "_amount_raised", None)
         if cached is not None:
             return cached
-        # Fallback compute
-        return self.donations.aggregate(total=Sum("amount"))["total"] or Decimal("0.00")
+        # Fallback to the materialized totals row
+        return fx.convert(self._totals.raised_by_currency(), self.currency)
     
     @property
     def donations_count(self) -> int:
         cached = getattr(self, "_donations_count", None)
         if cached is not None:
             return cached
-        return self.donations.count()
+        return self._totals.donations_count
 
 
     @property
     def donor_count(self) -> int:
-        count = self.donations.values("donor_id").distinct().aggregate(c=Count("donor_id")).get("c")
-        return count or 0
+        cached = getattr(self, "_donor_count", None)
+        if cached is not None:
+            return cached
+        return self._totals.donor_count
+
+    @property
+    def last_donation_at(self):
+        return self._totals.last_donation_at
 
     @property
     def is_in_active_window(self) -> bool:
@@ -201,8 +386,122 @@ class Campaign(models.Model):
 
     def save(self, *args, **kwargs):
         self.clean()
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        new_cover = bool(self.cover_image) and not self.cover_image._committed
+        if new_cover:
+            self.cover_image_renditions_ready = False
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                CampaignTotals.objects.create(campaign=self)
+            get_search_backend().index([self])
+            invalidate_public_pages()
+            if not adding:
+                from .eligibility import forget_snapshots
+                forget_snapshots([(self.pk, self.slug)])
+            if self.cover_image and not self.cover_image_renditions_ready:
+                schedule_renditions(self.cover_image.storage, [self.cover_image.name], mark_renditions_ready)
+
+    @classmethod
+    def on_requests_approve(cls, request_ids):
+        """
+        Publish the campaigns of freshly approved requests (called by request_app.transitions).
+        """
+        from .eligibility import forget_snapshots
+
+        campaigns = cls.objects.filter(request_id__in=request_ids)
+        forget_snapshots(campaigns.values_list("pk", "slug"))
+        if campaigns.update(visibility=Visibility.PUBLIC):
+            invalidate_public_pages()
+
+
+class CampaignTotals(models.Model):
+    """
+    Denormalized donation totals per campaign, kept in step by Donation.save
+    and delete (and the Donation queryset's update and delete).
+    Rebuild or verify against the ledger with `manage.py rebuild_campaign_totals`.
+    """
+    campaign = models.OneToOneField(Campaign, on_delete=models.CASCADE, primary_key=True, related_name="totals")
+    # one running sum per currency (fx.TOTAL_FIELDS); converted when read
+    raised_inr = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    raised_usd = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    raised_eur = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    donations_count = models.PositiveIntegerField(default=0)
+    donor_count = models.PositiveIntegerField(default=0)
+    last_donation_at = models.DateTimeField(null=True, blank=True)
+
+    objects = CampaignTotalsManager()
+
+    def raised_by_currency(self):
+        return {currency: getattr(self, field) for currency, field in TOTAL_FIELDS.items()}
+
+    def __str__(self):
+        return f"{self.campaign_id}: {self.donations_count} donations"
+
+
+def mark_renditions_ready(names):
+    """
+    Record that the renditions of the stored images `names` exist. Blobs are
+    shared by content, so every row pointing at one of them is done.
+    """
+    with transaction.atomic():
+        Campaign.objects.filter(cover_image__in=names).update(cover_image_renditions_ready=True)
+        CampaignImages.objects.filter(image__in=names).update(image_renditions_ready=True)
+        invalidate_public_pages()
 
-    def on_approve(self):
-        self.visibility=Visibility.PUBLIC
-        self.save()
\ No newline at end of file
+
+# -----------------------
+# FX rates
+# -----------------------
+class FxRate(models.Model):
+    """
+    Value of one unit of `currency` in settings.FX_RATES["PIVOT"], from
+    `date` until the next row for the currency. Load with
+    `manage.py load_fx_rates`; read through campaign.fx.
+    """
+    currency = models.CharField(max_length=3, choices=Currency.choices)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+
+    class Meta:
+        ordering = ["currency", "-date"]
+        constraints = [
+            models.UniqueConstraint(fields=["currency", "date"], name="fx_rate_currency_date"),
+            models.CheckConstraint(check=models.Q(rate__gt=0), name="fx_rate_positive"),
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            transaction.on_commit(fx.clear_cache)
+            invalidate_public_pages()
+
+    def __str__(self):
+        return f"{self.currency} {self.rate} @ {self.date}"
+
+
+# -----------------------
+# Search index tables
+# -----------------------
+# Created and filled by campaign.search, not by migrations. They are mapped
+# only so a search can join its index table once (see SQLiteFTS5Backend.search).
+class SQLiteSearchEntry(models.Model):
+    campaign = models.OneToOneField(
+        Campaign, on_delete=models.DO_NOTHING, primary_key=True, db_column="rowid",
+        db_constraint=False, related_name="fts_entry",
+    )
+
+    class Meta:
+        managed = False
+        db_table = "campaign_search_fts"
+
+
+class PostgresSearchEntry(models.Model):
+    campaign = models.OneToOneField(
+        Campaign, on_delete=models.DO_NOTHING, primary_key=True,
+        db_constraint=False, related_name="ts_entry",
+    )
+
+    class Meta:
+        managed = False
+        db_table = "campaign_search_document"
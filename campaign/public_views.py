@@ -1,23 +1,61 @@
 # views.py
-from decimal import Decimal
-from django.db.models import Q, Sum, Count, F
-from django.db.models.functions import Coalesce
-from django.db.models.expressions import OrderBy
+import csv
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.views import View
 from django.views.generic import ListView, DetailView, FormView
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
-from .models import Campaign, CampaignCategory
+from django.utils.safestring import mark_safe
+from .cache import cached_fragment
+from .models import Campaign, CampaignCategory, Visibility
+from .search import get_search_backend
+from a_core.views import CursorPaginationMixin
 from donation_app.form import DonationForm
+from donation_app.models import Donation
 
-class CampaignListView(ListView):
+class CampaignListView(CursorPaginationMixin, ListView):
     model = Campaign
     template_name = "campaign/public_list.html"
+    fragment_template_name = "campaign/public_list_content.html"
     context_object_name = "campaigns"
     paginate_by = 12
 
+    default_sort = ""
+    # Sort key -> [(field, descending)]; NULLs always sort last
+    SORT_MAP = {
+        "new":        [("start_date", True)],
+        "end_soon":   [("end_date", False)],
+        "goal_high":  [("goal_amount", True)],
+        "goal_low":   [("goal_amount", False)],
+        "raised_high":[("_amount_raised", True)],
+        "raised_low": [("_amount_raised", False)],
+        "popular":    [("_donations_count", True)],
+        "title_az":   [("title", False)],
+        "title_za":   [("title", True)],
+    }
+
+    def get(self, request, *args, **kwargs):
+        # The list body is identical for every visitor with the same normalized
+        # parameters, so it comes from the page cache; only the shell is per-user.
+        fragment = cached_fragment(self.list_state.params(), self.render_fragment)
+        return render(request, self.template_name, {"fragment": mark_safe(fragment)})
+
+    def render_fragment(self):
+        self.object_list = self.get_queryset()
+        return render_to_string(self.fragment_template_name, self.get_context_data())
+
     def get_queryset(self):
-        qs = Campaign.objects.all().select_related("category").prefetch_related("gallery")
+        state = self.list_state
+        qs = Campaign.objects.all().select_related("category")
 
         # Only public + currently active (adjust if your logic differs)
         now = timezone.now()
@@ -26,56 +64,42 @@ class CampaignListView(ListView):
             start_date__lte=now
         ).filter(Q(end_date__isnull=True) | Q(end_date__gte=now))
 
-        # Search
-        q = (self.request.GET.get("q") or "").strip()
-        if q:
-            terms = [t for t in q.split() if t]
-            for t in terms:
-                qs = qs.filter(
-                    Q(title__icontains=t) |
-                    Q(short_description__icontains=t) |
-                    Q(description__icontains=t) |
-                    Q(category__name__icontains=t) |
-                    Q(tags__icontains=t)  # JSONField contains text (works on Postgres & SQLite icontains)
-                )
+        # Search (full-text index, prefix match on every term)
+        if state.q:
+            qs = get_search_backend().search(qs, state.q)
 
         # Optional: category filter
-        cat_id = self.request.GET.get("category")
-        if cat_id:
-            qs = qs.filter(category_id=cat_id)
-
-        # Annotate for sorting and card stats
-        qs = qs.annotate(
-            _amount_raised=Coalesce(Sum("donations__amount"), Decimal("0.00")),
-            _donations_count=Coalesce(Count("donations", distinct=True), 0),
-        )
+        if state.category:
+            qs = qs.filter(category_id=state.category)
+
+        # Annotate for sorting and card stats (read from the materialized totals, no GROUP BY)
+        qs = qs.with_donation_stats()
 
-        # Sorting map
-        sort = (self.request.GET.get("sort") or "").lower()
-        order_map = {
-            "new":      [OrderBy(F("start_date"), descending=True)],
-            "end_soon": [OrderBy(F("end_date"), descending=False, nulls_last=True)],
-            "goal_high":[OrderBy(F("goal_amount"), descending=True,  nulls_last=True)],
-            "goal_low": [OrderBy(F("goal_amount"), descending=False, nulls_last=True)],
-            "raised_high":[OrderBy(F("_amount_raised"), descending=True)],
-            "raised_low": [OrderBy(F("_amount_raised"), descending=False)],
-            "popular":  [OrderBy(F("_donations_count"), descending=True)],
-            "title_az": [OrderBy(F("title"), descending=False)],
-            "title_za": [OrderBy(F("title"), descending=True)],
-        }
-        ordering = order_map.get(sort) or [OrderBy(F("start_date"), descending=True)]
-        return qs.order_by(*ordering)
+        # Sorting (id tiebreaker keeps the order stable for cursor paging)
+        return self.order_queryset(qs)
+
+    def get_sort_keys(self):
+        state = self.list_state
+        if state.sort:
+            return self.SORT_MAP[state.sort], state.sort
+        if state.q:
+            # Best matches first unless the visitor picked a sort
+            return [("_search_rank", True), ("start_date", True)], "rank"
+        return self.SORT_MAP["new"], "new"
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx["q"] = self.request.GET.get("q", "")
-        ctx["sort"] = self.request.GET.get("sort", "")
-        ctx["selected_category"] = self.request.GET.get("category", "")
+        state = self.list_state
+        ctx["q"] = state.q
+        ctx["sort"] = state.sort
+        ctx["selected_category"] = state.category
         ctx["categories"] = CampaignCategory.objects.all().order_by("name")
         # Keep existing filters in pagination links
-        params = self.request.GET.copy()
-        params.pop("page", None)
-        ctx["querystring"] = params.urlencode()
+        ctx["querystring"] = state.querystring(page="", cursor="")
+        page = ctx["page_obj"]
+        if ctx.get("cursor_mode") and page is not None:
+            ctx["next_querystring"] = state.querystring(page="", cursor=page.next_cursor or "")
+            ctx["previous_querystring"] = state.querystring(page="", cursor=page.previous_cursor or "")
         return ctx
 
 
@@ -89,12 +113,9 @@ class CampaignDetailView(DetailView):
     def get_queryset(self):
         now = timezone.now()
         return (
-            Campaign.objects.select_related("category")
+            Campaign.objects.select_related("category", "totals")
             .prefetch_related("gallery")
-            .annotate(
-                _amount_raised=Coalesce(Sum("donations__amount"), Decimal("0.00")),
-                _donations_count=Coalesce(Count("donations", distinct=True), 0),
-            )
+            .with_donation_stats()
             .filter(
                 visibility="PUBLIC",
                 start_date__lte=now
@@ -106,3 +127,98 @@ class CampaignDetailView(DetailView):
         ctx = super().get_context_data(**kwargs)
         ctx["donation_form"] = DonationForm(campaign=self.object)
         return ctx
+
+
+# -----------------------
+# Transparency ledger
+# -----------------------
+class _Echo:
+    """
+    File-like object for csv.writer that hands each row back instead of buffering it.
+    """
+    def write(self, value):
+        return value
+
+
+class CampaignLedgerView(View):
+    """
+    Every donation to a public campaign, oldest first, streamed as CSV or
+    JSON Lines straight from a server-side cursor, so memory stays flat
+    however many donations there are.
+
+    ?since=<donation id> (or an ISO datetime) returns only newer donations,
+    for incremental pulls. The ETag comes from the materialized campaign
+    totals, so an unchanged ledger costs one query and a 304.
+
+    Donors appear only under the public name they chose; nothing else about
+    them is exported.
+    """
+    FIELDS = ("id", "created_at", "amount", "currency", "donor")
+    CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+    ANONYMOUS = "Anonymous"
+    chunk_size = 2000
+
+    def get(self, request, slug, fmt):
+        if fmt not in self.CONTENT_TYPES:
+            raise Http404
+        campaign = (
+            Campaign.objects.filter(slug=slug, visibility=Visibility.PUBLIC)
+            .with_donation_stats()
+            .annotate(_last_donation_at=F("totals__last_donation_at"))
+            .only("pk", "slug")
+            .first()
+        )
+        if campaign is None:
+            raise Http404
+
+        since = request.GET.get("since", "").strip()
+        donations = Donation.objects.filter(campaign_id=campaign.pk)
+        if since:
+            if since.isdigit():
+                donations = donations.filter(pk__gt=int(since))
+            else:
+                since_at = parse_datetime(since)
+                if since_at is None:
+                    return HttpResponseBadRequest("since must be a donation id or an ISO 8601 datetime.")
+                if timezone.is_naive(since_at):
+                    since_at = timezone.make_aware(since_at)
+                donations = donations.filter(created_at__gt=since_at)
+
+        etag = self.etag(campaign, fmt, since)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        rows = (
+            donations.order_by("pk")
+            .values_list("pk", "created_at", "amount", "currency", "donor_display_name")
+            .iterator(chunk_size=self.chunk_size)
+        )
+        render = self.csv_lines if fmt == "csv" else self.jsonl_lines
+        response = StreamingHttpResponse(render(rows), content_type=self.CONTENT_TYPES[fmt])
+        response["ETag"] = etag
+        response["Content-Disposition"] = f'attachment; filename="{campaign.slug}-donations.{fmt}"'
+        # always revalidate; the ETag makes that cheap
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+    @staticmethod
+    def etag(campaign, fmt, since):
+        # the totals move on every new, edited or deleted donation
+        state = f"{campaign.pk}:{campaign._donations_count}:{campaign._amount_raised}:{campaign._last_donation_at}"
+        digest = hashlib.sha256(f"{state}:{fmt}:{since}".encode()).hexdigest()[:32]
+        return f'"{digest}"'
+
+    def public_rows(self, rows):
+        for pk, created_at, amount, currency, display_name in rows:
+            yield pk, created_at.isoformat(), amount, currency, display_name.strip() or self.ANONYMOUS
+
+    def csv_lines(self, rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.FIELDS)
+        for row in self.public_rows(rows):
+            yield writer.writerow(row)
+
+    def jsonl_lines(self, rows):
+        for row in self.public_rows(rows):
+            yield json.dumps(dict(zip(self.FIELDS, row)), cls=DjangoJSONEncoder) + "\n"
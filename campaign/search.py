@@ -0,0 +1,255 @@
+"""
+Full-text search for the public campaign catalogue.
+
+Each backend keeps a search document per campaign (title, descriptions,
+category name and tags) in sync from Campaign.save/delete and turns a
+free-text query into a ranked queryset filter:
+
+    qs = get_search_backend().search(Campaign.objects.all(), "clean wat")
+
+Matching is AND across terms with prefix matching on every term. The
+matched rows are annotated with ``_search_rank`` (higher is better). The
+index table is joined once (through the unmanaged SQLiteSearchEntry /
+PostgresSearchEntry models) and the rank is read from that join, so a
+search costs one index lookup however many rows match.
+
+The backend is picked from the database vendor, or forced with the
+``CAMPAIGN_SEARCH_BACKEND`` setting (a dotted path to a backend class).
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+# Only word characters survive into the engine's query syntax.
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(query):
+    return _TERM_RE.findall((query or "").lower())
+
+
+def unranked(queryset):
+    return queryset.annotate(_search_rank=Value(0.0, output_field=FloatField()))
+
+
+def campaign_document(campaign):
+    """
+    Flatten a campaign into the columns that get indexed.
+    """
+    category = getattr(campaign, "category", None)
+    tags = campaign.tags if isinstance(campaign.tags, list) else []
+    return {
+        "title": campaign.title or "",
+        "short_description": campaign.short_description or "",
+        "description": campaign.description or "",
+        "category": category.name if category else "",
+        "tags": " ".join(str(t) for t in tags),
+    }
+
+
+class BaseSearchBackend:
+    """
+    Interface every campaign search backend implements.
+    """
+    def install(self, schema_editor):
+        """Create the index structures (called from a migration)."""
+
+    def index(self, campaigns):
+        """Insert or refresh the search documents of the given campaigns."""
+
+    def remove(self, campaign_ids):
+        """Drop the search documents of the given campaign ids."""
+
+    def clear(self):
+        """Drop every search document."""
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def rebuild(self, batch_size=1000):
+        """
+        Re-index the whole catalogue from the Campaign table. Returns the row count.
+        """
+        from .models import Campaign
+
+        self.clear()
+        total = 0
+        batch = []
+        for campaign in Campaign.objects.select_related("category").iterator(chunk_size=batch_size):
+            batch.append(campaign)
+            if len(batch) >= batch_size:
+                self.index(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            self.index(batch)
+            total += len(batch)
+        return total
+
+
+class DatabaseLikeBackend(BaseSearchBackend):
+    """
+    Fallback for databases without a full-text engine: chained icontains,
+    no ranking. Cost grows with the table, so only use it for small catalogues.
+    """
+    def search(self, queryset, query):
+        for t in search_terms(query):
+            queryset = queryset.filter(
+                Q(title__icontains=t) |
+                Q(short_description__icontains=t) |
+                Q(description__icontains=t) |
+                Q(category__name__icontains=t) |
+                Q(tags__icontains=t)
+            )
+        return unranked(queryset)
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """
+    SQLite FTS5 virtual table keyed by the campaign id (rowid), ranked with
+    bm25 and with prefix indexes so short prefixes stay cheap.
+    """
+    table = "campaign_search_fts"
+    columns = ("title", "short_description", "description", "category", "tags")
+    # bm25 column weights, in `columns` order
+    weights = (10.0, 4.0, 1.0, 3.0, 3.0)
+
+    def install(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+            f"{', '.join(self.columns)}, "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+
+    def index(self, campaigns):
+        rows = []
+        for campaign in campaigns:
+            doc = campaign_document(campaign)
+            rows.append([campaign.pk] + [doc[c] for c in self.columns])
+        if not rows:
+            return
+        placeholders = ", ".join(["%s"] * (len(self.columns) + 1))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (rowid, {', '.join(self.columns)}) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+
+    def remove(self, campaign_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [[pk] for pk in campaign_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+    def match_expression(self, query):
+        # "term"* for every term, implicitly ANDed by FTS5
+        return " ".join(f'"{t}"*' for t in search_terms(query))
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return unranked(queryset)
+        weights = ", ".join(str(w) for w in self.weights)
+        # the isnull filter makes the INNER JOIN; MATCH and bm25 then refer to it
+        return queryset.filter(
+            Q(fts_entry__isnull=False),
+            RawSQL(f"{self.table} MATCH %s", [match], output_field=BooleanField()),
+        ).annotate(
+            _search_rank=RawSQL(f"-bm25({self.table}, {weights})", [], output_field=FloatField())
+        )
+
+
+class PostgresFullTextBackend(BaseSearchBackend):
+    """
+    PostgreSQL tsvector documents in a side table with a GIN index, ranked
+    with ts_rank. Title outweighs category/tags, which outweigh descriptions.
+    """
+    table = "campaign_search_document"
+    config = "simple"
+
+    def install(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "campaign_id bigint PRIMARY KEY REFERENCES campaign_campaign (id) "
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_document_gin ON {self.table} USING gin (document)"
+        )
+
+    def index(self, campaigns):
+        rows = []
+        for campaign in campaigns:
+            doc = campaign_document(campaign)
+            rows.append([
+                campaign.pk, doc["title"], doc["category"], doc["tags"],
+                doc["short_description"], doc["description"],
+            ])
+        if not rows:
+            return
+        cfg = self.config
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (campaign_id, document) VALUES (%s, "
+                f"setweight(to_tsvector('{cfg}', %s), 'A') || "
+                f"setweight(to_tsvector('{cfg}', %s || ' ' || %s), 'B') || "
+                f"setweight(to_tsvector('{cfg}', %s), 'C') || "
+                f"setweight(to_tsvector('{cfg}', %s), 'D')) "
+                "ON CONFLICT (campaign_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def remove(self, campaign_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE campaign_id = ANY(%s)", [list(campaign_ids)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.table}")
+
+    def tsquery(self, query):
+        return " & ".join(f"{t}:*" for t in search_terms(query))
+
+    def search(self, queryset, query):
+        tsquery = self.tsquery(query)
+        if not tsquery:
+            return unranked(queryset)
+        document = f"{self.table}.document"
+        return queryset.filter(
+            Q(ts_entry__isnull=False),
+            RawSQL(f"{document} @@ to_tsquery('{self.config}', %s)", [tsquery], output_field=BooleanField()),
+        ).annotate(
+            _search_rank=RawSQL(
+                f"ts_rank({document}, to_tsquery('{self.config}', %s))", [tsquery], output_field=FloatField()
+            )
+        )
+
+
+VENDOR_BACKENDS = {
+    "sqlite": SQLiteFTS5Backend,
+    "postgresql": PostgresFullTextBackend,
+}
+
+
+def backend_for_vendor(vendor):
+    """
+    The CAMPAIGN_SEARCH_BACKEND override if set, else the backend for `vendor`.
+    """
+    path = getattr(settings, "CAMPAIGN_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    return VENDOR_BACKENDS.get(vendor, DatabaseLikeBackend)()
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    return backend_for_vendor(connection.vendor)
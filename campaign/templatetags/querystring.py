@@ -9,9 +9,15 @@ def qs_replace(context, **kwargs):
     """
     Usage in templates: href="?{% qs_replace page=3 %}"
     Keeps existing GET params, replaces only specified keys.
+    A page number and a cursor token are two ways of saying "where am I",
+    so setting one drops the other.
     """
     request = context["request"]
     params = request.GET.copy()
+    if kwargs.get("cursor"):
+        params.pop("page", None)
+    if kwargs.get("page"):
+        params.pop("cursor", None)
     for k, v in kwargs.items():
         if v is None or v == "":
             params.pop(k, None)
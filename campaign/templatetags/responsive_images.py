@@ -0,0 +1,40 @@
+from django import template
+from django.utils.html import format_html
+
+from campaign import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_srcset(fieldfile, ext="webp"):
+    """
+    Usage in templates: srcset="{% image_srcset campaign.cover_image 'webp' %}"
+    """
+    return images.srcset(fieldfile, ext)
+
+
+@register.simple_tag
+def responsive_image(fieldfile, alt="", sizes="100vw", css_class="", loading="lazy"):
+    """
+    Usage in templates:
+        {% responsive_image c.cover_image alt=c.title sizes="(min-width: 1024px) 33vw, 100vw" css_class="w-full h-44" %}
+    Emits a <picture> offering the WebP renditions, with the JPEG renditions
+    (and the original as plain src) for browsers without WebP; just the
+    original while the renditions are still being written.
+    """
+    if not fieldfile:
+        return ""
+    if not images.renditions_ready(fieldfile):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}" decoding="async">',
+            fieldfile.url, alt, css_class, loading,
+        )
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}" decoding="async">'
+        '</picture>',
+        images.srcset(fieldfile, "webp"), sizes,
+        fieldfile.url, images.srcset(fieldfile, "jpg"), sizes, alt, css_class, loading,
+    )
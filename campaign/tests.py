@@ -1,3 +1,578 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from account.models import CustomUser
+from account.principal import principal_for
+from donation_app.models import Donation
+from request_app.models import Request
+
+from . import fx, images
+from .checks import check_fx_rates
+from .cache import cached_fragment, current_version, fragment_key
+from .images import RENDITION_WIDTHS, generate_renditions, rendition_name, rendition_names, schedule_renditions
+from .search import get_search_backend
+from .templatetags.responsive_images import responsive_image
+from .models import Campaign, CampaignCategory, CampaignImages, CampaignTotals, FxRate, MetricQueryFallback, Visibility
+from .uploads import save_gallery_images
+
+
+def make_campaign(user, slug, **extra):
+    return Campaign.objects.create(
+        title=slug.title(),
+        slug=slug,
+        request=Request.objects.create(proposed_by=user),
+        start_date=timezone.now(),
+        **extra,
+    )
+
+
+class DonationStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("owner@example.com", "pw")
+        cls.donor = CustomUser.objects.create_user("donor@example.com", "pw")
+        cls.campaigns = [make_campaign(cls.user, f"campaign-{i}") for i in range(3)]
+        Donation.objects.bulk_create([
+            Donation(campaign=cls.campaigns[0], donor=cls.user, amount=Decimal("10.00")),
+            Donation(campaign=cls.campaigns[0], donor=cls.user, amount=Decimal("5.00")),
+            Donation(campaign=cls.campaigns[0], donor=cls.donor, amount=Decimal("2.50")),
+            Donation(campaign=cls.campaigns[1], donor=None, amount=Decimal("1.00")),
+        ])
+        CampaignTotals.objects.rebuild()
+
+    def setUp(self):
+        fx.clear_cache()
+        fx.current_rates()
+
+    def test_with_donation_stats_fills_every_metric_in_one_query(self):
+        with self.assertNumQueries(1):
+            stats = {
+                c.slug: (c.amount_raised, c.donations_count, c.donor_count)
+                for c in Campaign.objects.with_donation_stats()
+            }
+        self.assertEqual(stats["campaign-0"], (Decimal("17.50"), 3, 2))
+        self.assertEqual(stats["campaign-1"], (Decimal("1.00"), 1, 0))
+        self.assertEqual(stats["campaign-2"], (Decimal("0.00"), 0, 0))
+
+    def test_select_related_totals_is_not_a_fallback(self):
+        campaign = Campaign.objects.select_related("totals").get(slug="campaign-0")
+        with self.assertNumQueries(0):
+            self.assertEqual(campaign.donor_count, 2)
+
+    @override_settings(CAMPAIGN_METRICS_STRICT=True)
+    def test_strict_mode_rejects_per_row_fallback(self):
+        campaign = Campaign.objects.get(slug="campaign-0")
+        for metric in ("amount_raised", "donations_count", "donor_count"):
+            with self.subTest(metric=metric), self.assertRaises(MetricQueryFallback):
+                getattr(campaign, metric)
+
+    @override_settings(CAMPAIGN_METRICS_STRICT=False)
+    def test_lenient_mode_falls_back_to_totals_row(self):
+        campaign = Campaign.objects.get(slug="campaign-0")
+        with self.assertNumQueries(1):
+            self.assertEqual(campaign.donor_count, 2)
+
+
+class ListPageQueryCountTests(TestCase):
+    """
+    Each list page costs a fixed number of queries whatever its page size.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            "approver@example.com", "pw", is_email_verified=True, is_approval_user=True
+        )
+        category = CampaignCategory.objects.create(name="Health")
+        for i in range(60):
+            make_campaign(cls.user, f"list-{i}", category=category, visibility=Visibility.PUBLIC)
+
+    def setUp(self):
+        caches["pages"].clear()
+        fx.clear_cache()
+        fx.current_rates()
+        self.client.force_login(self.user)
+        principal_for(self.user.pk)
+
+    def assertPageQueries(self, url, expected):
+        for page_size in (5, 50):
+            with self.subTest(url=url, page_size=page_size), self.assertNumQueries(expected):
+                response = self.client.get(url, {"page_size": page_size, "paging": "offset"})
+                self.assertEqual(response.status_code, 200)
+
+    def test_campaign_list(self):
+        # count, page (session and principal come from the cache)
+        self.assertPageQueries(reverse("campaign:list"), 2)
+
+    def test_campaign_list_cursor_mode(self):
+        # capped count, page
+        for page_size in (5, 50):
+            with self.subTest(page_size=page_size), self.assertNumQueries(2):
+                self.client.get(reverse("campaign:list"), {"page_size": page_size, "paging": "cursor"})
+
+    def test_public_campaign_list(self):
+        # count, page, categories
+        self.assertPageQueries(reverse("campaign:public_list"), 3)
+
+
+class PublicListCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("owner@example.com", "pw")
+        cls.campaign = make_campaign(cls.user, "cached", visibility=Visibility.PUBLIC)
+
+    def setUp(self):
+        caches["pages"].clear()
+
+    def test_repeat_visit_is_served_from_cache(self):
+        url = reverse("campaign:public_list")
+        self.client.get(url, {"sort": "new"})
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {"sort": "new", "utm_source": "ignored"})
+        self.assertContains(response, "Cached")
+
+    def test_campaign_change_invalidates_cached_pages(self):
+        url = reverse("campaign:public_list")
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.campaign.title = "Renamed"
+            self.campaign.save()
+        self.assertContains(self.client.get(url), "Renamed")
+
+    @override_settings(PUBLIC_PAGE_CACHE={"ALIAS": "pages", "TTL": 0})
+    def test_stale_page_is_served_while_another_worker_regenerates(self):
+        url = reverse("campaign:public_list")
+        self.client.get(url)
+        Campaign.objects.filter(pk=self.campaign.pk).update(title="Renamed")
+        caches["pages"].add(f"{fragment_key({})}:lock", 1)
+        self.assertContains(self.client.get(url), "Cached")
+
+    def test_cold_miss_waits_for_the_worker_rendering_it(self):
+        key = fragment_key({"p": 1})
+        caches["pages"].add(f"{key}:lock", 1)
+        renders = []
+
+        def winner_finishes(seconds):
+            caches["pages"].set(key, (current_version(), time.time() + 60, "theirs"))
+
+        with mock.patch("campaign.cache.time.sleep", side_effect=winner_finishes) as sleep:
+            html = cached_fragment({"p": 1}, lambda: renders.append(1) or "mine")
+        self.assertEqual((html, renders, sleep.call_count), ("theirs", [], 1))
+
+    @override_settings(PUBLIC_PAGE_CACHE={"ALIAS": "pages", "MISS_WAIT": 0.1})
+    def test_cold_miss_renders_itself_if_the_winner_never_finishes(self):
+        key = fragment_key({"p": 2})
+        caches["pages"].add(f"{key}:lock", 1)
+        self.assertEqual(cached_fragment({"p": 2}, lambda: "mine"), "mine")
+        # the other worker's lock is left alone
+        self.assertIsNotNone(caches["pages"].get(f"{key}:lock"))
+
+    def test_cold_miss_takes_the_lock(self):
+        key = fragment_key({"p": 3})
+
+        def render():
+            self.assertFalse(caches["pages"].add(f"{key}:lock", 1))
+            return "mine"
+
+        self.assertEqual(cached_fragment({"p": 3}, render), "mine")
+        self.assertIsNone(caches["pages"].get(f"{key}:lock"))
+        self.assertEqual(cached_fragment({"p": 3}, lambda: "again"), "mine")
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("owner@example.com", "pw")
+        cls.well = make_campaign(cls.user, "village-water-well", visibility=Visibility.PUBLIC)
+        cls.school = make_campaign(
+            cls.user, "school-books", description="Books and clean water for the school",
+            visibility=Visibility.PUBLIC,
+        )
+
+    def search(self, query):
+        return list(get_search_backend().search(Campaign.objects.all(), query).order_by("-_search_rank", "pk"))
+
+    def test_prefix_match_on_every_term(self):
+        self.assertEqual(set(self.search("wat")), {self.well, self.school})
+        self.assertEqual(self.search("wat sch"), [self.school])
+        self.assertEqual(self.search("boats"), [])
+
+    def test_title_matches_rank_first(self):
+        # "water" is in the well's title but only in the school's description
+        results = self.search("water")
+        self.assertEqual(results, [self.well, self.school])
+        self.assertGreater(results[0]._search_rank, results[1]._search_rank)
+
+    def test_index_follows_save_and_delete(self):
+        self.school.title = "Solar panels"
+        self.school.description = ""
+        self.school.save()
+        self.assertEqual(self.search("books"), [])
+        self.assertEqual(self.search("sol"), [self.school])
+        self.well.delete()
+        self.assertEqual(self.search("water"), [])
+
+    def test_rank_is_read_from_a_single_join(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.search("water")
+        sql = queries[0]["sql"]
+        self.assertEqual(sql.count("campaign_search_fts MATCH"), 1)
+        self.assertIn("INNER JOIN", sql)
+
+    def test_public_list_orders_by_rank(self):
+        caches["pages"].clear()
+        response = self.client.get(reverse("campaign:public_list"), {"q": "water"})
+        self.assertEqual([c.pk for c in response.context["campaigns"]][:2], [self.well.pk, self.school.pk])
+
+
+class LedgerExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("owner@example.com", "pw")
+        cls.campaign = make_campaign(cls.user, "ledger", visibility=Visibility.PUBLIC)
+        cls.donations = Donation.objects.bulk_create([
+            Donation(campaign=cls.campaign, donor=cls.user, amount=Decimal("10.00"), donor_display_name="Asha"),
+            Donation(campaign=cls.campaign, donor=cls.user, amount=Decimal("5.00"), description="private note"),
+            Donation(campaign=cls.campaign, donor=None, amount=Decimal("2.50"), currency="USD"),
+        ])
+        CampaignTotals.objects.rebuild()
+
+    def url(self, fmt="csv"):
+        return reverse("campaign:ledger", kwargs={"slug": "ledger", "fmt": fmt})
+
+    def test_csv_respects_donor_anonymity(self):
+        response = self.client.get(self.url())
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "id,created_at,amount,currency,donor")
+        self.assertEqual([line.split(",")[-1] for line in lines[1:]], ["Asha", "Anonymous", "Anonymous"])
+        self.assertNotIn("owner@example.com", "\n".join(lines))
+        self.assertNotIn("private note", "\n".join(lines))
+
+    def test_jsonl_since_returns_only_newer_donations(self):
+        response = self.client.get(self.url("jsonl"), {"since": self.donations[0].pk})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["id"] for row in rows], [d.pk for d in self.donations[1:]])
+        self.assertEqual(rows[-1]["amount"], "2.50")
+        self.assertEqual(rows[-1]["currency"], "USD")
+
+    def test_unchanged_ledger_is_not_modified(self):
+        etag = self.client.get(self.url())["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Donation.objects.bulk_create([Donation(campaign=self.campaign, amount=Decimal("1.00"))])
+        CampaignTotals.objects.rebuild()
+        self.assertEqual(self.client.get(self.url(), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_private_campaign_and_unknown_format_are_not_found(self):
+        make_campaign(self.user, "hidden")
+        self.assertEqual(self.client.get(reverse("campaign:ledger", args=["hidden", "csv"])).status_code, 404)
+        self.assertEqual(self.client.get(self.url("xml")).status_code, 404)
+
+
+class MultiCurrencyTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("owner@example.com", "pw")
+        cls.inr = make_campaign(cls.user, "inr-drive")
+        cls.usd = make_campaign(cls.user, "usd-drive", currency="USD")
+        today = timezone.localdate()
+        FxRate.objects.bulk_create([
+            FxRate(currency="USD", date=today - timezone.timedelta(days=30), rate=Decimal("75")),
+            FxRate(currency="USD", date=today, rate=Decimal("80")),
+            FxRate(currency="USD", date=today + timezone.timedelta(days=1), rate=Decimal("999")),
+            FxRate(currency="EUR", date=today, rate=Decimal("90")),
+        ])
+        for campaign in (cls.inr, cls.usd):
+            Donation.objects.bulk_create([
+                Donation(campaign=campaign, amount=Decimal("800.00"), currency="INR"),
+                Donation(campaign=campaign, amount=Decimal("10.00"), currency="USD"),
+                Donation(campaign=campaign, amount=Decimal("1.00"), currency="EUR"),
+            ])
+        CampaignTotals.objects.rebuild()
+
+    def setUp(self):
+        fx.clear_cache()
+
+    def tearDown(self):
+        fx.clear_cache()
+
+    def test_totals_are_converted_into_campaign_currency(self):
+        fx.current_rates()
+        with self.assertNumQueries(1):
+            raised = {c.slug: c.amount_raised for c in Campaign.objects.with_donation_stats()}
+        # latest rate on or before today: USD 80, EUR 90
+        self.assertEqual(raised["inr-drive"], Decimal("1690.00"))
+        self.assertEqual(raised["usd-drive"], Decimal("21.13"))
+
+    def test_fallback_converts_the_same_way(self):
+        for slug, raised in (("inr-drive", "1690.00"), ("usd-drive", "21.13")):
+            campaign = Campaign.objects.select_related("totals").get(slug=slug)
+            self.assertEqual(campaign.amount_raised, Decimal(raised))
+
+    def test_currency_without_rate_is_left_out(self):
+        FxRate.objects.filter(currency="EUR").delete()
+        campaign = Campaign.objects.with_donation_stats().get(slug="inr-drive")
+        self.assertEqual(campaign.amount_raised, Decimal("1600.00"))
+
+    def test_sort_by_raised_uses_converted_totals(self):
+        slugs = list(Campaign.objects.with_donation_stats().order_by("-_amount_raised").values_list("slug", flat=True))
+        self.assertEqual(slugs, ["inr-drive", "usd-drive"])
+
+    def test_load_fx_rates_command(self):
+        call_command("load_fx_rates", str(settings.BASE_DIR / "campaign" / "fixtures" / "sample_fx_rates.csv"), stdout=StringIO())
+        self.assertEqual(FxRate.objects.get(currency="EUR", date="2024-01-01").rate, Decimal("91.9"))
+
+    def test_checks_warn_about_missing_and_stale_rates(self):
+        self.assertEqual(check_fx_rates(databases=["default"]), [])
+        FxRate.objects.filter(currency="EUR").delete()
+        FxRate.objects.filter(currency="USD", date__gte=timezone.localdate()).delete()
+        warnings = check_fx_rates(databases=["default"])
+        self.assertEqual([w.id for w in warnings], ["campaign.W001", "campaign.W002"])
+        self.assertIn("EUR", warnings[0].msg)
+        self.assertIn("USD", warnings[1].msg)
+        # only run when the database checks are asked for
+        self.assertEqual(check_fx_rates(), [])
+
+
+def png_bytes(size=(800, 600), color="red"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def gif_polyglot():
+    # a valid GIF that is also an HTML document with a script
+    buffer = BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buffer, format="GIF")
+    return buffer.getvalue() + b"<script>alert(document.cookie)</script>"
+
+
+class TempMediaTestCase(TestCase):
+    """
+    MEDIA_ROOT is a fresh temporary directory for each test.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("owner@example.com", "pw")
+        cls.campaign = make_campaign(cls.user, "media")
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.storage = Campaign._meta.get_field("cover_image").storage
+
+    def age(self, name, seconds=7 * 24 * 3600):
+        old = time.time() - seconds
+        os.utime(self.storage.path(name), (old, old))
+
+
+class MediaStorageTests(TempMediaTestCase):
+    def test_legacy_image_renditions_keep_their_names(self):
+        legacy = "campaign/cover_image/old.png"
+        os.makedirs(os.path.dirname(self.storage.path(legacy)))
+        with open(self.storage.path(legacy), "wb") as f:
+            f.write(png_bytes())
+        written = generate_renditions(self.storage, legacy)
+        self.assertEqual(sorted(written), sorted(rendition_names(legacy)))
+        self.assertTrue(all(self.storage.exists(name) for name in rendition_names(legacy)))
+        # the backfill finds them next time
+        self.assertEqual(generate_renditions(self.storage, legacy), [])
+
+    def test_garbage_collection_keeps_referenced_and_young_blobs(self):
+        used = self.storage.save("cover.png", ContentFile(png_bytes(color="blue")))
+        generate_renditions(self.storage, used)
+        Campaign.objects.filter(pk=self.campaign.pk).update(cover_image=used)
+        orphan = self.storage.save("gone.png", ContentFile(png_bytes(color="green")))
+        young = self.storage.save("new.png", ContentFile(png_bytes(color="white")))
+        for name in [used, orphan] + rendition_names(used):
+            self.age(name)
+
+        call_command("collect_media_garbage", min_age=3600, stdout=StringIO())
+        self.assertFalse(self.storage.exists(orphan))
+        self.assertTrue(self.storage.exists(young))
+        self.assertTrue(self.storage.exists(used))
+        self.assertTrue(all(self.storage.exists(name) for name in rendition_names(used)))
+
+    def test_re_referenced_old_blob_survives_collection(self):
+        name = self.storage.save("cover.png", ContentFile(png_bytes()))
+        self.age(name)
+        # an upload whose row isn't committed yet dedupes onto the old blob
+        self.assertEqual(self.storage.save("again.png", ContentFile(png_bytes())), name)
+        call_command("collect_media_garbage", min_age=3600, stdout=StringIO())
+        self.assertTrue(self.storage.exists(name))
+
+
+class RenditionTests(TempMediaTestCase):
+    def test_renditions_keep_aspect_and_never_upscale(self):
+        name = self.storage.save("wide.png", ContentFile(png_bytes(size=(1000, 500))))
+        self.assertEqual(sorted(generate_renditions(self.storage, name)), sorted(rendition_names(name)))
+        widths = {}
+        for width in RENDITION_WIDTHS:
+            for ext in ("webp", "jpg"):
+                with self.storage.open(rendition_name(name, width, ext)) as f:
+                    widths[width, ext] = Image.open(f).size
+        self.assertEqual(widths[320, "webp"], (320, 160))
+        self.assertEqual(widths[640, "jpg"], (640, 320))
+        self.assertEqual(widths[1280, "webp"], (1000, 500))
+
+    def test_srcset_lists_every_width(self):
+        self.campaign.cover_image = self.storage.save("cover.png", ContentFile(png_bytes()))
+        self.campaign.cover_image_renditions_ready = True
+        srcset = images.srcset(self.campaign.cover_image, "webp")
+        self.assertEqual(srcset.count("webp"), len(RENDITION_WIDTHS))
+        self.assertIn("_w320.webp 320w", srcset)
+
+    def test_image_without_renditions_is_a_plain_img(self):
+        self.campaign.cover_image = self.storage.save("cover.png", ContentFile(png_bytes()))
+        self.assertEqual(images.srcset(self.campaign.cover_image, "webp"), "")
+        html = responsive_image(self.campaign.cover_image, alt="Cover")
+        self.assertNotIn("srcset", html)
+        self.assertNotIn("<picture>", html)
+        self.assertIn(f'<img src="{self.campaign.cover_image.url}" alt="Cover"', html)
+
+    def test_renditions_are_recorded_once_written(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.campaign.cover_image = SimpleUploadedFile("cover.png", png_bytes())
+            self.campaign.save()
+            self.assertFalse(self.campaign.cover_image_renditions_ready)
+        self.campaign.refresh_from_db()
+        self.assertTrue(self.campaign.cover_image_renditions_ready)
+        self.assertIn("<picture>", responsive_image(self.campaign.cover_image))
+        # a stale instance saved later doesn't lose them for good
+        Campaign.objects.filter(pk=self.campaign.pk).update(cover_image_renditions_ready=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.campaign.save()
+        self.campaign.refresh_from_db()
+        self.assertTrue(self.campaign.cover_image_renditions_ready)
+
+    def test_renditions_wait_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            rows = save_gallery_images(self.campaign, [
+                SimpleUploadedFile("a.png", png_bytes(color="blue")),
+                SimpleUploadedFile("b.png", png_bytes(color="green")),
+            ])
+        names = [row.image.name for row in rows]
+        self.assertEqual(CampaignImages.objects.filter(campaign=self.campaign).count(), 2)
+        self.assertFalse(any(self.storage.exists(n) for name in names for n in rendition_names(name)))
+        for callback in callbacks:
+            callback()
+        self.assertTrue(all(self.storage.exists(n) for name in names for n in rendition_names(name)))
+        self.assertTrue(all(row.image_renditions_ready for row in CampaignImages.objects.filter(campaign=self.campaign)))
+
+    @override_settings(IMAGE_RENDITIONS={"BACKGROUND": True})
+    def test_background_renditions(self):
+        name = self.storage.save("cover.png", ContentFile(png_bytes()))
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_renditions(self.storage, [name])
+        images._executor().submit(lambda: None).result(timeout=30)
+        self.assertTrue(all(self.storage.exists(n) for n in rendition_names(name)))
+
+
+@override_settings(GALLERY_UPLOAD_BUDGET={"MAX_FILES": 2, "MAX_BYTES": 200 * 1024})
+class GalleryUploadTests(TempMediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = CustomUser.objects.create_user("maker@example.com", "pw", is_email_verified=True)
+        self.category = CampaignCategory.objects.create(name="Health")
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.force_login(self.owner)
+        # a real CSRF cookie/token pair, since the view checks CSRF itself
+        self.client.get(reverse("campaign:create"))
+        self.token = self.client.cookies[settings.CSRF_COOKIE_NAME].value
+
+    def post(self, files, **extra):
+        now = timezone.now()
+        data = {
+            "csrfmiddlewaretoken": self.token,
+            "title": "Clinic", "short_description": "Short", "description": "Long",
+            "category": self.category.pk, "tags": "a, b", "currency": "INR",
+            "start_date": (now + timezone.timedelta(days=1)).strftime("%Y-%m-%d %H:%M"),
+            "end_date": (now + timezone.timedelta(days=30)).strftime("%Y-%m-%d %H:%M"),
+            "timezone_name": "UTC", "goal_amount": "1000", "minimum_donation_amount": "10",
+            "maximum_donation_amount": "100", "gallery_bulk": files, **extra,
+        }
+        return self.client.post(reverse("campaign:create"), data)
+
+    def image(self, name, **kwargs):
+        return SimpleUploadedFile(name, png_bytes(**kwargs), content_type="image/png")
+
+    def test_gallery_within_budget_is_saved(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post([self.image("a.png", size=(40, 40)), self.image("b.png", size=(40, 40), color="blue")])
+        self.assertEqual(response.status_code, 302)
+        campaign = Campaign.objects.get(title="Clinic")
+        names = [image.image.name for image in campaign.gallery.all()]
+        self.assertEqual(len(names), 2)
+        self.assertTrue(all(self.storage.exists(n) for name in names for n in rendition_names(name)))
+
+    def test_too_many_files_are_rejected_without_reaching_storage(self):
+        response = self.post([self.image(f"{i}.png", size=(40, 40), color=(i, 0, 0)) for i in range(3)])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("At most 2 files", str(response.context["form"].errors["gallery_bulk"]))
+        self.assertFalse(Campaign.objects.filter(title="Clinic").exists())
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, "blobs")))
+
+    def test_over_budget_body_is_rejected(self):
+        big = SimpleUploadedFile("big.bin", os.urandom(300 * 1024), content_type="image/png")
+        response = self.post([big])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Upload is too large", str(response.context["form"].errors["gallery_bulk"]))
+
+    def test_polyglot_with_an_html_name_is_rejected(self):
+        response = self.post([SimpleUploadedFile("evil.html", gif_polyglot(), content_type="text/html")])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("File extension", str(response.context["form"].errors["gallery_bulk"]))
+        self.assertFalse(Campaign.objects.filter(title="Clinic").exists())
+
+    def test_stored_extension_follows_the_image_format(self):
+        rows = save_gallery_images(self.campaign, [
+            SimpleUploadedFile("evil.html", gif_polyglot()),
+            SimpleUploadedFile("photo.gif", png_bytes(size=(20, 20))),
+        ])
+        self.assertEqual([os.path.splitext(row.image.name)[1] for row in rows], [".gif", ".png"])
+        with self.assertRaises(ValidationError):
+            save_gallery_images(self.campaign, [SimpleUploadedFile("notes.png", b"<html>not an image</html>")])
+
+    def test_cover_is_stored_under_its_format(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post([], cover_image=self.image("cover.jpeg.html"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("File extension", str(response.context["form"].errors["cover_image"]))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post([], cover_image=self.image("cover.jpg"))
+        self.assertTrue(Campaign.objects.get(title="Clinic").cover_image.name.endswith(".png"))
+
+    def test_csrf_is_still_checked(self):
+        response = self.post([], csrfmiddlewaretoken="wrong")
+        self.assertEqual(response.status_code, 403)
+
+    def test_profile_uploads_are_outside_the_gallery_budget(self):
+        self.assertNotIn("campaign.uploads.UploadBudgetHandler", settings.FILE_UPLOAD_HANDLERS)
+        picture = SimpleUploadedFile("me.png", png_bytes(size=(400, 400)) + os.urandom(300 * 1024), content_type="image/png")
+        self.client.post(reverse("profile"), {"csrfmiddlewaretoken": self.token, "profile_image": picture})
+        self.owner.refresh_from_db()
+        self.assertTrue(self.owner.profile_image)
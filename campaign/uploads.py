@@ -0,0 +1,174 @@
+"""
+Memory-bounded handling of multi-file gallery uploads.
+
+UploadBudgetHandler enforces a per-request byte and file-count budget
+while the multipart body is being parsed. It only applies where a view
+puts it in front of the request's handlers (the campaign form, which takes
+the gallery), so other uploads such as profile pictures are unaffected:
+
+    request.upload_handlers.insert(0, UploadBudgetHandler(request))
+
+This has to happen before anything reads request.POST, CSRF included. A request whose Content-Length is already over budget has every
+file skipped before a single byte is handed to the memory / temp-file
+handlers behind it; the other form fields are still parsed so the view
+can re-render the form with an error instead of failing CSRF.
+
+Files over FILE_UPLOAD_MAX_MEMORY_SIZE are spooled to a temporary file in
+fixed-size chunks, and FileSystemStorage moves such files into place rather
+than copying them, so memory use per file stays at one chunk.
+
+Configured through settings.GALLERY_UPLOAD_BUDGET:
+    MAX_FILES  files accepted per request
+    MAX_BYTES  total request body size in bytes
+"""
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.db import transaction
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, UnidentifiedImageError
+
+from .cache import invalidate_public_pages
+from .images import schedule_renditions
+
+DEFAULTS = {"MAX_FILES": 20, "MAX_BYTES": 50 * 1024 * 1024}
+
+
+def upload_budget():
+    return {**DEFAULTS, **getattr(settings, "GALLERY_UPLOAD_BUDGET", {})}
+
+
+class UploadBudgetHandler(FileUploadHandler):
+    """
+    Skips every file once the request exceeds its budget and records why on
+    `request.upload_budget_errors`.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        budget = upload_budget()
+        self.max_files = budget["MAX_FILES"]
+        self.max_bytes = budget["MAX_BYTES"]
+        self.files_seen = 0
+        self.bytes_seen = 0
+        self.errors = []
+        if request is not None:
+            request.upload_budget_errors = self.errors
+
+    def reject(self, message):
+        if message not in self.errors:
+            self.errors.append(message)
+        raise SkipFile()
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_bytes:
+            self.errors.append(
+                f"Upload is too large ({filesizeformat(content_length)}); "
+                f"the limit is {filesizeformat(self.max_bytes)} per request."
+            )
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.errors:
+            raise SkipFile()
+        self.files_seen += 1
+        if self.files_seen > self.max_files:
+            self.reject(f"At most {self.max_files} files can be uploaded at once.")
+
+    def receive_data_chunk(self, raw_data, start):
+        # Content-Length already bounds this; kept for bodies without one.
+        self.bytes_seen += len(raw_data)
+        if self.bytes_seen > self.max_bytes:
+            self.reject(f"Upload is too large; the limit is {filesizeformat(self.max_bytes)} per request.")
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+# -----------------------
+# Gallery batch
+# -----------------------
+# Pillow format -> the extension an upload is stored under. Only formats
+# browsers display are accepted; the client's file name is never trusted.
+IMAGE_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+
+
+def image_format(f):
+    """
+    Pillow format of an upload; forms.ImageField leaves the opened image on `f.image`.
+    """
+    image = getattr(f, "image", None)
+    if image is None:
+        try:
+            f.seek(0)
+            image = Image.open(f)
+            image.verify()
+        except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+            return None
+        finally:
+            f.seek(0)
+    return image.format
+
+
+def image_name(f):
+    """
+    File name for an upload, with the extension of its actual image format.
+    """
+    stem = os.path.splitext(os.path.basename(f.name or ""))[0] or "image"
+    return f"{stem}.{IMAGE_EXTENSIONS[image_format(f)]}"
+
+
+def verify_images(files):
+    """
+    Check that every upload is an image in one of IMAGE_EXTENSIONS' formats,
+    reporting all bad files at once.
+    """
+    errors = [
+        f"{f.name} is not a JPEG, PNG, GIF or WebP image."
+        for f in files if image_format(f) not in IMAGE_EXTENSIONS
+    ]
+    if errors:
+        raise ValidationError(errors)
+
+
+def save_gallery_images(campaign, files):
+    """
+    Store `files` as gallery images of `campaign` with a single INSERT.
+    Each is checked with verify_images and the model field validators and
+    stored under the extension of its image format.
+
+    Files are streamed to storage one at a time; if the INSERT fails, the
+    stored files are removed again. bulk_create bypasses
+    CampaignImages.save(), so cache invalidation happens here and the
+    renditions are scheduled for after commit.
+    """
+    from .models import CampaignImages, mark_renditions_ready
+
+    verify_images(files)
+    field = CampaignImages._meta.get_field("image")
+    stored = []
+    try:
+        rows = []
+        for f in files:
+            row = CampaignImages(campaign=campaign)
+            row.image = File(f, name=image_name(f))
+            # the field validators bulk_create would otherwise skip
+            row.clean_fields(exclude=["campaign"])
+            name = field.storage.save(field.generate_filename(row, row.image.name), f, max_length=field.max_length)
+            stored.append(name)
+            row.image.name = name
+            rows.append(row)
+        with transaction.atomic():
+            rows = CampaignImages.objects.bulk_create(rows)
+            invalidate_public_pages()
+            schedule_renditions(field.storage, stored, mark_renditions_ready)
+    except Exception:
+        for name in stored:
+            field.storage.delete(name)
+        raise
+    return rows
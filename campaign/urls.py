@@ -12,6 +12,7 @@ urlpatterns = [
     # public url
     path("public/", public_views.CampaignListView.as_view(), name="public_list"),
     path("<slug:slug>/", public_views.CampaignDetailView.as_view(), name="detail"),
+    path("<slug:slug>/donations.<str:fmt>", public_views.CampaignLedgerView.as_view(), name="ledger"),
    
 
 ]
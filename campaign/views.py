@@ -5,16 +5,20 @@ from django.contrib import messages
 from django.utils.decorators import method_decorator
 from django.db.models import Q
 from django.core.paginator import Paginator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 
 from request_app.models import RequestStatus
 from account.decorators import email_verification_required
-from a_core.views import CreateOrUpdateView
+from a_core.views import CreateOrUpdateView, CursorPaginationMixin
 
 from .models import Campaign,CampaignImages,CampaignCategory
 from .form import CampaignForm
+from .uploads import UploadBudgetHandler
 
 
 # Create your views here.
+# CSRF is checked in dispatch, once the upload budget handler is in place
+@method_decorator(csrf_exempt, name='dispatch')
 @method_decorator(email_verification_required, name='dispatch')
 class CreateUpdateCampaignView(CreateOrUpdateView):
     template_name = "campaign/create.html"
@@ -22,11 +26,21 @@ class CreateUpdateCampaignView(CreateOrUpdateView):
     form_class = CampaignForm
     fields = "__all__"
 
+    def dispatch(self, request, *args, **kwargs):
+        # must come before anything parses the body
+        request.upload_handlers.insert(0, UploadBudgetHandler(request))
+        return csrf_protect(super().dispatch)(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['is_edit']=self.request.GET.get('edit','true')=='true'
         return context
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["upload_errors"] = getattr(self.request, "upload_budget_errors", ())
+        return kwargs
+
     def form_valid(self, form):
         if form.instance.id:
             messages.success(self.request, "Campaign updated successfully")
@@ -35,18 +49,19 @@ class CreateUpdateCampaignView(CreateOrUpdateView):
         return super().form_valid(form)
 
 @method_decorator(email_verification_required, name='dispatch')
-class CampaignListView(ListView):
+class CampaignListView(CursorPaginationMixin, ListView):
     model = Campaign
     template_name = "campaign/list.html"
     context_object_name = "object_list"  # keeps the same name you used
     paginate_by = 10  # default; we'll override dynamically
-    ordering = "title"  # default sort
+    default_sort = "title"
+    status_choices = RequestStatus.values
 
     # Map friendly sort keys to model fields
     SORT_MAP = {
         "title": "title",
         "category": "category__name",
-        "status": "status",
+        "status": "request__status",
         "start_date": "start_date",
         "end_date": "end_date",
         "goal_amount": "goal_amount",
@@ -54,24 +69,22 @@ class CampaignListView(ListView):
 
     def get_queryset(self):
         request = self.request
-        q = request.GET.get("q", "").strip()
-        status = request.GET.get("status", "").strip()
-        sort = request.GET.get("sort", "title").strip()
-        direction = request.GET.get("dir", "asc").strip().lower()  # 'asc' or 'desc'
+        state = self.list_state
 
         # Base queryset with select_related/only for efficiency
         qs = (
-            Campaign.objects.select_related("category")
+            Campaign.objects.select_related("category", "request")
             .only(
                 "id", "title", "slug", "request__status", "start_date", "end_date",
                 "goal_amount", "cover_image", "category__name"
             )
         )
-        if not request.user.is_approval_user:
-            qs = qs.filter(Q(request__proposed_by=request.user))
+        if not request.principal.is_approval_user:
+            qs = qs.filter(Q(request__proposed_by_id=request.principal.id))
 
         # Search (title, short_description, description, category name, status)
-        if q:
+        if state.q:
+            q = state.q
             qs = qs.filter(
                 Q(slug__icontains=q)
                 | Q(title__icontains=q)
@@ -83,52 +96,26 @@ class CampaignListView(ListView):
             # If you want to include tags (JSONField) and you're on PostgreSQL:
             # qs = qs.filter(Q(tags__icontains=q) | Q(...existing...))
 
-        # Filter by status (ensure values match your CampaignStatus choices)
-        if status:
-            qs = qs.filter(request__status=status)
-
-        # Sorting
-        sort_field = self.SORT_MAP.get(sort, "title")
-        if direction == "desc":
-            sort_field = f"-{sort_field}"
-        qs = qs.order_by(sort_field)
+        # Filter by status (validated against RequestStatus)
+        if state.status:
+            qs = qs.filter(request__status=state.status)
 
-        return qs
-
-    def get_paginate_by(self, queryset):
-        """
-        Dynamically determine page size with clamping: 1..100
-        """
-        page_size = self.request.GET.get("page_size", self.paginate_by)
-        try:
-            page_size = min(max(int(page_size), 1), 100)
-        except ValueError:
-            page_size = self.paginate_by
-        return page_size
+        # Sorting (id tiebreaker keeps the order stable for cursor paging)
+        return self.order_queryset(qs)
 
     def get_context_data(self, **kwargs):
         """
         Add the same context fields you had in your FBV.
         """
         context = super().get_context_data(**kwargs)
-        request = self.request
-
-        q = request.GET.get("q", "").strip()
-        status_value = request.GET.get("status", "").strip()
-        sort = request.GET.get("sort", "title").strip()
-        direction = request.GET.get("dir", "asc").strip().lower()
-
-        # Ensure paginator/page_obj are available (ListView handles this)
-        # But we also expose `paginator` explicitly as you did
+        state = self.list_state
         context.update({
-            "q": q,
-            "status_value": status_value,
-            "sort": sort,
-            "dir": direction,
-            "page_size": self.get_paginate_by(self.get_queryset()),
-            "paginator": context.get("paginator"),
-            "page_obj": context.get("page_obj"),
-            # "object_list" is already provided as per context_object_name
+            "q": state.q,
+            "status_value": state.status,
+            "sort": state.sort,
+            "dir": state.direction,
+            "page_size": state.page_size,
+            # "paginator", "page_obj" and "object_list" come from ListView
         })
         context['RequestStatus']=RequestStatus
         return context
@@ -1,9 +1,15 @@
 # forms.py
+import uuid
 from decimal import Decimal
 from django import forms
+from campaign.eligibility import DonationRejected, snapshot_for
+from .ingest import IdempotencyConflict, build_donation, replay_of_rejected
 from .models import Donation, Campaign,Currency
 
 class DonationForm(forms.ModelForm):
+    # fresh per rendered form; a double submit or retry posts the same key
+    idempotency_key = forms.CharField(required=False, max_length=64, widget=forms.HiddenInput)
+
     class Meta:
         model = Donation
         fields = ['amount', 'currency', 'donor_display_name', 'description']
@@ -24,18 +30,45 @@ class DonationForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         # Keep the form concise
         self.fields['amount'].widget.attrs.update({'min': '0.01', 'step': '0.01'})
-        # Optional: lock currency to the campaign currency if needed
-        # self.fields['currency'].initial = self.campaign.default_currency if you have one
+        if not self.is_bound:
+            self.fields['idempotency_key'].initial = uuid.uuid4().hex
+        if self.campaign is not None:
+            self.fields['currency'].initial = self.campaign.currency
 
     def clean_amount(self):
         amount: Decimal = self.cleaned_data['amount']
         if amount <= Decimal('0'):
             raise forms.ValidationError("Amount must be greater than 0.")
-        if self.campaign:
-            min_amt = self.campaign.minimum_donation_amount or Decimal('0.00')
-            max_amt = self.campaign.maximum_donation_amount  # can be None
-            if amount < min_amt:
-                raise forms.ValidationError(f"Minimum allowed is {min_amt}.")
-            if max_amt is not None and amount > max_amt:
-                raise forms.ValidationError(f"Maximum allowed is {max_amt}.")
-        return amount
\ No newline at end of file
+        return amount
+
+    def clean(self):
+        # Builds the donation once, through donation_app.ingest; the view saves
+        # self.donation (or shows self.replayed) without validating it again.
+        cleaned_data = super().clean()
+        self.donation = self.replayed = None
+        amount = cleaned_data.get('amount')
+        if self.campaign is None or amount is None or self.errors:
+            return cleaned_data
+        snapshot = snapshot_for(self.campaign)
+        try:
+            self.donation = build_donation(
+                snapshot, amount, cleaned_data.get('currency'),
+                donor_display_name=cleaned_data.get('donor_display_name', ''),
+                description=cleaned_data.get('description', ''),
+                idempotency_key=cleaned_data.get('idempotency_key'),
+            )
+        except DonationRejected as e:
+            try:
+                self.replayed = replay_of_rejected(
+                    snapshot, amount, cleaned_data.get('currency'), cleaned_data.get('idempotency_key')
+                )
+            except IdempotencyConflict as conflict:
+                e = conflict
+            if self.replayed is None:
+                self.add_error(e.field if e.field in self.fields else None, str(e))
+        return cleaned_data
+
+    def _post_clean(self):
+        # clean() already checked the donation against the campaign; running
+        # Donation.clean through the model validation would check it twice
+        pass
@@ -0,0 +1,239 @@
+"""
+Donation ingestion.
+
+    snapshot = campaign_snapshot(slug)   # campaign.eligibility
+    donation, created = ingest_donation(snapshot, amount, currency, idempotency_key=key)
+    donation, created = save_donation(build_donation(snapshot, amount, currency))
+    results = ingest_batch(snapshot, rows)
+
+Validation runs once, in Python, against a cached CampaignSnapshot (see
+campaign.eligibility). Donation.save is then called with validate=False, so accepting a donation costs the INSERT plus
+the totals and audit writes, nothing more. Callers that validate first
+(DonationForm builds its donation in clean()) hand the result to
+save_donation rather than validating again.
+
+Idempotency: a donation may carry a client-supplied idempotency_key
+(unique). Re-submitting the same key returns the donation created the
+first time instead of a duplicate; re-using a key for a different
+donation is rejected.
+
+ingest_batch takes many donations for one campaign (a settlement file,
+an offline collection drive) and writes them with one bulk INSERT, one
+totals UPDATE and one audit insert, all in one transaction.
+
+Configured through settings.DONATION_INGEST:
+    SNAPSHOT_TTL  seconds a campaign snapshot is cached (read by campaign.eligibility)
+    BATCH_SIZE    rows per INSERT statement in ingest_batch
+"""
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from audit import log as audit_log
+from campaign.cache import invalidate_public_pages
+from campaign.eligibility import DonationRejected
+from campaign.models import CampaignTotals
+
+from .models import Currency, Donation
+
+DEFAULTS = {"BATCH_SIZE": 500}
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, "DONATION_INGEST", {})}
+
+
+class IdempotencyConflict(DonationRejected):
+    pass
+
+
+# -----------------------
+# Ingestion
+# -----------------------
+def clean_amount(value):
+    try:
+        amount = Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        raise DonationRejected(f"{value!r} is not a valid amount.", code="invalid", field="amount")
+    if not amount.is_finite() or amount <= 0:
+        raise DonationRejected("Amount must be greater than 0.", code="invalid", field="amount")
+    if amount != amount.quantize(Decimal("0.01")):
+        raise DonationRejected("Amount can have at most 2 decimal places.", code="invalid", field="amount")
+    return amount
+
+
+def build_donation(snapshot, amount, currency=Currency.INR, donor=None, donor_display_name="",
+                   description="", idempotency_key=None, now=None):
+    """
+    A validated, unsaved Donation for `snapshot`; raises DonationRejected.
+    """
+    amount = clean_amount(amount)
+    if currency not in Currency.values:
+        raise DonationRejected(f"Unsupported currency {currency!r}.", code="invalid", field="currency")
+    for field, value, limit in (
+        ("donor_display_name", donor_display_name, 100),
+        ("description", description, 100),
+        ("idempotency_key", idempotency_key or "", 64),
+    ):
+        if len(value) > limit:
+            raise DonationRejected(f"{field} is longer than {limit} characters.", code="invalid", field=field)
+    snapshot.check(amount, currency, now)
+    return Donation(
+        campaign_id=snapshot.id,
+        donor_id=getattr(donor, "pk", donor),
+        amount=amount,
+        currency=currency,
+        donor_display_name=donor_display_name,
+        description=description,
+        idempotency_key=idempotency_key or None,
+    )
+
+
+def _replay(existing, donation):
+    """
+    `existing` holds the same idempotency key as `donation`; it's a replay only if they agree.
+    """
+    if (existing.campaign_id, existing.amount, existing.currency) != (
+        donation.campaign_id, donation.amount, donation.currency
+    ):
+        raise IdempotencyConflict(
+            "This idempotency key was already used for a different donation.",
+            code="idempotency_conflict", field="idempotency_key",
+        )
+    return existing
+
+
+def ingest_donation(snapshot, amount, currency=Currency.INR, donor=None, donor_display_name="",
+                    description="", idempotency_key=None):
+    """
+    Accept one donation. Returns (donation, created); created is False when
+    `idempotency_key` was seen before and the original donation is returned.
+    """
+    key = idempotency_key or None
+    try:
+        donation = build_donation(snapshot, amount, currency, donor, donor_display_name, description, key)
+    except DonationRejected:
+        existing = replay_of_rejected(snapshot, amount, currency, key)
+        if existing is None:
+            raise
+        return existing, False
+    return save_donation(donation)
+
+
+def replay_of_rejected(snapshot, amount, currency, idempotency_key):
+    """
+    For a submission build_donation rejected: the donation its key created
+    earlier (a retry of a donation accepted before the campaign closed is
+    still a replay), or None. Raises IdempotencyConflict if they disagree.
+    """
+    key = idempotency_key or None
+    existing = Donation.objects.filter(idempotency_key=key).first() if key else None
+    if existing is None:
+        return None
+    try:
+        amount = clean_amount(amount)
+    except DonationRejected:
+        return None
+    return _replay(existing, Donation(campaign_id=snapshot.id, amount=amount, currency=currency))
+
+
+def save_donation(donation):
+    """
+    Insert a donation from build_donation. Returns (donation, created), like ingest_donation.
+    """
+    key = donation.idempotency_key
+    try:
+        with transaction.atomic():
+            donation.save(validate=False)
+    except IntegrityError:
+        existing = Donation.objects.filter(idempotency_key=key).first() if key else None
+        if existing is None:
+            raise
+        return _replay(existing, donation), False
+    return donation, True
+
+
+@dataclass
+class IngestResult:
+    donation: Optional[Donation] = None
+    created: bool = False
+    error: str = ""
+
+
+def ingest_batch(snapshot, rows, now=None):
+    """
+    Accept many donations to one campaign. `rows` are dicts of
+    ingest_donation's keyword arguments. Returns one IngestResult per row,
+    in order; rejected rows carry an error and are skipped, the rest are
+    written together or not at all.
+
+    Keys are checked against the table up front, so a concurrent import of
+    the same keys fails with IntegrityError and rolls back; retrying then
+    reports those rows as replays.
+    """
+    now = now or timezone.now()
+    batch_size = _config()["BATCH_SIZE"]
+    results = [IngestResult() for _ in rows]
+    built = {}  # row index -> validated, unsaved donation
+    first_by_key = {}  # idempotency key -> index of its first row in this batch
+    repeats = {}  # row index -> donation repeating a key seen earlier in this batch
+    for index, row in enumerate(rows):
+        try:
+            donation = build_donation(snapshot, now=now, **row)
+        except DonationRejected as e:
+            results[index].error = str(e)
+            continue
+        except TypeError as e:
+            results[index].error = f"Malformed row: {e}."
+            continue
+        key = donation.idempotency_key
+        if key is not None and key in first_by_key:
+            repeats[index] = donation
+            continue
+        if key is not None:
+            first_by_key[key] = index
+        built[index] = donation
+
+    keys = list(first_by_key)
+    existing = {}
+    for start in range(0, len(keys), batch_size):
+        existing.update(
+            (d.idempotency_key, d) for d in Donation.objects.filter(idempotency_key__in=keys[start:start + batch_size])
+        )
+    for key, index in first_by_key.items():
+        if key in existing:
+            _resolve(results[index], existing[key], built.pop(index))
+
+    if built:
+        with audit_log.batch():
+            created = Donation.objects.bulk_create(list(built.values()), batch_size=batch_size)
+            CampaignTotals.objects.record_donations(snapshot.id, created)
+            for donation in created:
+                audit_log.record(
+                    "donation.create", donation, actor=donation.donor_id,
+                    payload={"campaign": donation.campaign_id, "amount": donation.amount,
+                             "currency": donation.currency},
+                )
+            invalidate_public_pages()
+        for index, donation in zip(built, created):
+            results[index].donation = donation
+            results[index].created = True
+
+    for index, donation in repeats.items():
+        first = results[first_by_key[donation.idempotency_key]]
+        if first.donation is None:
+            results[index].error = first.error
+        else:
+            _resolve(results[index], first.donation, donation)
+    return results
+
+
+def _resolve(result, existing, donation):
+    try:
+        result.donation = _replay(existing, donation)
+    except IdempotencyConflict as e:
+        result.error = str(e)
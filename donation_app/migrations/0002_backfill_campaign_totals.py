@@ -0,0 +1,40 @@
+# Generated by Django 5.1.3 on 2026-10-17 20:10
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_campaign_totals(apps, schema_editor):
+    Campaign = apps.get_model('campaign', 'Campaign')
+    CampaignTotals = apps.get_model('campaign', 'CampaignTotals')
+    rows = Campaign.objects.order_by().values('pk').annotate(
+        amount_raised=Coalesce(Sum('donations__amount'), Decimal('0.00')),
+        donations_count=Count('donations'),
+        donor_count=Count('donations__donor', distinct=True),
+        last_donation_at=Max('donations__created_at'),
+    )
+    CampaignTotals.objects.bulk_create(
+        [CampaignTotals(campaign_id=row.pop('pk'), **row) for row in rows.iterator()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaign', '0005_campaigntotals'),
+        ('donation_app', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['campaign', 'donor'], name='donation_ap_campaig_e1db8f_idx'),
+        ),
+        migrations.RunPython(backfill_campaign_totals, migrations.RunPython.noop),
+    ]
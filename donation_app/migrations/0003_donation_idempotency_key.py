@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-17 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donation_app', '0002_backfill_campaign_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donation',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
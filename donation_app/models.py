@@ -1,16 +1,53 @@
 from decimal import Decimal
 
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from campaign.models import Campaign
-from request_app import models as request_models
-# Create your models here.
-class Currency(models.TextChoices):
-    INR = "INR", "INR"
-    USD = "USD", "USD"
-    EUR = "EUR", "EUR"
+from audit import log as audit_log
+from campaign.cache import invalidate_public_pages
+from campaign.eligibility import DonationRejected, campaign_snapshot, snapshot_for
+from campaign.fx import Currency
+from campaign.models import Campaign, CampaignTotals
+# Fields CampaignTotals is computed from
+TOTALS_FIELDS = {"campaign", "campaign_id", "donor", "donor_id", "amount", "currency", "created_at"}
+
+
+class DonationQuerySet(models.QuerySet):
+    """
+    update() and delete() skip Donation.save/delete, so they recount the
+    totals of every campaign they touch (before and after) themselves.
+    """
+    def _campaign_ids(self):
+        return set(self.order_by().values_list("campaign_id", flat=True).distinct())
+
+    def update(self, **kwargs):
+        if not TOTALS_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic():
+            campaign_ids = self._campaign_ids()
+            updated = super().update(**kwargs)
+            moved_to = kwargs.get("campaign_id", kwargs.get("campaign"))
+            if moved_to is not None:
+                campaign_ids.add(getattr(moved_to, "pk", moved_to))
+            if updated:
+                CampaignTotals.objects.rebuild(campaign_ids=campaign_ids)
+        return updated
+
+    update.alters_data = True
+
+    def delete(self):
+        with transaction.atomic():
+            campaign_ids = self._campaign_ids()
+            result = super().delete()
+            CampaignTotals.objects.rebuild(campaign_ids=campaign_ids)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
 
+
+# Create your models here.
 class Donation(models.Model):
     campaign = models.ForeignKey(Campaign, on_delete=models.PROTECT, related_name="donations")
     donor = models.ForeignKey(
@@ -25,13 +62,18 @@ class Donation(models.Model):
     dispaly_name = models.CharField(max_length=100, blank=True)
     donor_display_name = models.CharField(max_length=100, blank=True)
     description = models.CharField(max_length=100, blank=True)
+    # client-supplied; a retried submission with the same key returns the original donation
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True, unique=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = DonationQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["campaign", "created_at"]),
+            models.Index(fields=["campaign", "donor"]),
         ]
         constraints = [
             models.CheckConstraint(
@@ -41,23 +83,46 @@ class Donation(models.Model):
         ]
 
     def clean(self):
-        # enforce min/max per campaign
-        if hasattr(self, "campaign"):
-            min_amt = self.campaign.minimum_donation_amount or Decimal("0.00")
-            max_amt = self.campaign.maximum_donation_amount
-            if self.amount < min_amt:
-                raise ValueError(f"Donation must be at least {min_amt}.")
-            if max_amt and self.amount > max_amt:
-                raise ValueError(f"Donation must be at most {max_amt}.")
-
-            # only allow donations to ACTIVE + PUBLIC campaigns
-            if not (self.campaign.status() == request_models.RequestStatus.ACTIVE and self.campaign.visibility == Visibility.PUBLIC):
-                raise ValueError("Donations are allowed only for ACTIVE and PUBLIC campaigns.")
-
-
-    def save(self, *args, **kwargs):
-        self.clean()
-        super().save(*args, **kwargs)
+        # the same eligibility check as the donation form and importer, against
+        # a cached campaign snapshot, so it costs no query per donation
+        if self.campaign_id is None:
+            return
+        campaign = self.campaign if Donation.campaign.is_cached(self) else None
+        snapshot = snapshot_for(campaign) if campaign is not None else campaign_snapshot(pk=self.campaign_id)
+        if snapshot is None:
+            raise ValidationError({"campaign": "Unknown campaign."})
+        try:
+            snapshot.check(self.amount, self.currency)
+        except DonationRejected as e:
+            raise e.as_validation_error()
+
+
+    def save(self, *args, validate=True, **kwargs):
+        # donation_app.ingest validates against a campaign snapshot up front and passes validate=False
+        if validate:
+            self.clean()
+        adding = self._state.adding
+        with transaction.atomic():
+            if not adding:
+                previous = Donation.objects.filter(pk=self.pk).values_list("campaign_id", flat=True).first()
+            super().save(*args, **kwargs)
+            if adding:
+                CampaignTotals.objects.record_donation(self)
+                audit_log.record(
+                    "donation.create", self, actor=self.donor_id,
+                    payload={"campaign": self.campaign_id, "amount": self.amount, "currency": self.currency},
+                )
+            else:
+                # Edits are rare (admin only); recount the campaign from the
+                # ledger, and the one the donation was moved from, if any.
+                CampaignTotals.objects.rebuild(campaign_ids={self.campaign_id, previous} - {None})
+            invalidate_public_pages()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            CampaignTotals.objects.rebuild(campaign_ids=[self.campaign_id])
+        return result
 
     def __str__(self):
         return f"{self.campaign.title} - {self.amount} {self.currency}"
@@ -1,3 +1,344 @@
+import dataclasses
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.exceptions import ValidationError
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import CustomUser
+from audit.models import AuditEvent
+from campaign.models import CampaignTotals, Visibility
+from campaign.tests import make_campaign
+
+from campaign.eligibility import CampaignSnapshot, DonationRejected, campaign_snapshot
+from campaign import fx
+from campaign.models import Campaign, FxRate
+from request_app.transitions import apply_transition
+from .form import DonationForm
+from .ingest import IdempotencyConflict, ingest_batch, ingest_donation
+from request_app.models import RequestStatus
+
+from .models import Donation
+
+
+def make_open_campaign(user, slug, **extra):
+    campaign = make_campaign(user, slug, visibility=Visibility.PUBLIC, **extra)
+    campaign.request.status = RequestStatus.APPROVED
+    campaign.request.save()
+    return campaign
+
+
+class EligibilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("owner@example.com", "pw")
+        now = timezone.now()
+        cls.open = make_open_campaign(
+            cls.user, "open", minimum_donation_amount=Decimal("10.00"), maximum_donation_amount=Decimal("100.00"),
+        )
+        cls.private = make_campaign(cls.user, "private")
+        cls.unapproved = make_campaign(cls.user, "unapproved", visibility=Visibility.PUBLIC)
+        cls.upcoming = make_open_campaign(cls.user, "upcoming")
+        Campaign.objects.filter(pk=cls.upcoming.pk).update(start_date=now + timedelta(days=1))
+        cls.ended = make_open_campaign(cls.user, "ended")
+        Campaign.objects.filter(pk=cls.ended.pk).update(
+            start_date=now - timedelta(days=10), end_date=now - timedelta(days=1)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def rejection(self, slug, amount):
+        try:
+            campaign_snapshot(slug=slug).check(Decimal(amount))
+        except DonationRejected as e:
+            return e.code
+        return None
+
+    def test_every_rejection_reason(self):
+        cases = [
+            ("open", "50", None),
+            ("open", "5", "below_minimum"),
+            ("open", "500", "above_maximum"),
+            ("private", "50", "not_public"),
+            ("unapproved", "50", "not_open"),
+            ("upcoming", "50", "not_started"),
+            ("ended", "50", "ended"),
+        ]
+        for slug, amount, code in cases:
+            with self.subTest(slug=slug, amount=amount):
+                self.assertEqual(self.rejection(slug, amount), code)
+
+    def test_limits_apply_in_campaign_currency(self):
+        fx.clear_cache()
+        snapshot = campaign_snapshot(slug="open")
+        with self.assertRaises(DonationRejected) as raised:
+            snapshot.check(Decimal("5"), "USD")
+        self.assertEqual(raised.exception.code, "currency")
+
+        FxRate.objects.create(currency="USD", date=timezone.localdate(), rate=Decimal("80"))
+        fx.clear_cache()
+        snapshot.check(Decimal("1"), "USD")  # 80 INR
+        with self.assertRaises(DonationRejected) as raised:
+            snapshot.check(Decimal("2"), "USD")  # 160 INR
+        self.assertEqual(raised.exception.code, "above_maximum")
+        fx.clear_cache()
+
+    def test_clean_uses_the_shared_check(self):
+        for slug, amount, field in (("open", "5", "amount"), ("ended", "50", "__all__")):
+            donation = Donation(campaign=Campaign.objects.get(slug=slug), amount=Decimal(amount))
+            with self.subTest(slug=slug), self.assertRaises(ValidationError) as raised:
+                donation.save()
+            self.assertIn(field, raised.exception.message_dict)
+        self.assertFalse(Donation.objects.exists())
+
+    def test_clean_costs_no_query_once_cached(self):
+        campaign_snapshot(pk=self.open.pk)
+        donations = [Donation(campaign_id=self.open.pk, amount=Decimal("20")) for _ in range(10)]
+        with self.assertNumQueries(0):
+            for donation in donations:
+                donation.clean()
+
+    def test_save_validates_and_records(self):
+        Donation(campaign_id=self.open.pk, amount=Decimal("20"), donor=self.user).save()
+        self.assertEqual(CampaignTotals.objects.get(campaign=self.open).raised_inr, Decimal("20.00"))
+
+    def test_form_reports_rejection_on_its_field(self):
+        form = DonationForm({"amount": "500", "currency": "INR"}, campaign=self.open)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors["amount"], ["Maximum allowed is 100.00."])
+        form = DonationForm({"amount": "50", "currency": "INR"}, campaign=Campaign.objects.get(slug="ended"))
+        self.assertEqual(form.non_field_errors(), ["This campaign has ended."])
+
+    def test_approval_drops_cached_snapshot(self):
+        approver = CustomUser.objects.create_user("approver@example.com", "pw", is_approval_user=True)
+        campaign = make_campaign(self.user, "pending")
+        self.assertEqual(self.rejection("pending", "50"), "not_public")
+        campaign.request.status = RequestStatus.PENDING_REVIEW
+        campaign.request.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_transition(campaign.request, "approve", approver)
+        self.assertIsNone(self.rejection("pending", "50"))
+
+
+class DonationTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("owner@example.com", "pw")
+        cls.donor = CustomUser.objects.create_user("donor@example.com", "pw")
+        cls.first = make_open_campaign(cls.user, "first", minimum_donation_amount=Decimal("1.00"))
+        cls.second = make_open_campaign(cls.user, "second", minimum_donation_amount=Decimal("1.00"))
+
+    def setUp(self):
+        cache.clear()
+
+    def totals(self, campaign):
+        totals = CampaignTotals.objects.get(campaign=campaign)
+        return totals.raised_inr, totals.donations_count, totals.donor_count
+
+    def donate(self, campaign, amount, donor=None):
+        donation = Donation(campaign=campaign, amount=Decimal(amount), donor=donor)
+        donation.save()
+        return donation
+
+    def test_record_donation_folds_new_donations_in(self):
+        self.donate(self.first, "10.00", self.donor)
+        self.donate(self.first, "5.00", self.donor)
+        self.donate(self.first, "2.50")
+        self.assertEqual(self.totals(self.first), (Decimal("17.50"), 3, 1))
+        self.assertEqual(CampaignTotals.objects.rebuild(dry_run=True), [])
+
+    def test_edit_and_delete_recount(self):
+        donation = self.donate(self.first, "10.00", self.donor)
+        self.donate(self.first, "5.00")
+        donation.amount = Decimal("20.00")
+        donation.save()
+        self.assertEqual(self.totals(self.first), (Decimal("25.00"), 2, 1))
+        donation.delete()
+        self.assertEqual(self.totals(self.first), (Decimal("5.00"), 1, 0))
+
+    def test_moving_a_donation_recounts_both_campaigns(self):
+        donation = self.donate(self.first, "10.00", self.donor)
+        donation.campaign = self.second
+        donation.save()
+        self.assertEqual(self.totals(self.first), (Decimal("0.00"), 0, 0))
+        self.assertEqual(self.totals(self.second), (Decimal("10.00"), 1, 1))
+
+    def test_queryset_update_and_delete_recount(self):
+        self.donate(self.first, "10.00", self.donor)
+        self.donate(self.first, "5.00")
+        Donation.objects.filter(donor=self.donor).update(campaign=self.second)
+        self.assertEqual(self.totals(self.first), (Decimal("5.00"), 1, 0))
+        self.assertEqual(self.totals(self.second), (Decimal("10.00"), 1, 1))
+        Donation.objects.filter(campaign=self.first).update(amount=Decimal("7.00"))
+        self.assertEqual(self.totals(self.first), (Decimal("7.00"), 1, 0))
+        with self.assertNumQueries(1):
+            Donation.objects.update(description="thanks")
+        Donation.objects.all().delete()
+        self.assertEqual(self.totals(self.first), (Decimal("0.00"), 0, 0))
+        self.assertEqual(self.totals(self.second), (Decimal("0.00"), 0, 0))
+        self.assertEqual(CampaignTotals.objects.rebuild(dry_run=True), [])
+
+    def test_rebuild_command_checks_and_repairs_drift(self):
+        self.donate(self.first, "10.00", self.donor)
+        CampaignTotals.objects.filter(campaign=self.first).update(raised_inr=Decimal("99.00"))
+        with self.assertRaises(CommandError):
+            call_command("rebuild_campaign_totals", check=True, stdout=StringIO())
+        out = StringIO()
+        call_command("rebuild_campaign_totals", campaign_ids=[self.first.pk], stdout=out)
+        self.assertIn("Rebuilt totals for 1 campaign(s)", out.getvalue())
+        self.assertEqual(self.totals(self.first), (Decimal("10.00"), 1, 1))
+        call_command("rebuild_campaign_totals", check=True, stdout=StringIO())
+
+
+class IngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("owner@example.com", "pw")
+        cls.campaign = make_open_campaign(
+            cls.user, "drive", end_date=timezone.now() + timedelta(days=365),
+            minimum_donation_amount=Decimal("1.00"), maximum_donation_amount=Decimal("1000.00"),
+        )
+        FxRate.objects.create(currency="USD", date=timezone.localdate(), rate=Decimal("80"))
+
+    def setUp(self):
+        cache.clear()
+        fx.clear_cache()
+        self.snapshot = campaign_snapshot("drive")
+
+    def totals(self):
+        totals = CampaignTotals.objects.get(campaign=self.campaign)
+        return totals.raised_inr, totals.raised_usd, totals.donations_count, totals.donor_count
+
+    def test_snapshot_is_cached(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(campaign_snapshot("drive"), self.snapshot)
+
+    def test_retry_with_same_key_returns_original(self):
+        first, created = ingest_donation(self.snapshot, "25.00", donor=self.user, idempotency_key="k1")
+        self.assertTrue(created)
+        again, created = ingest_donation(self.snapshot, "25.00", donor=self.user, idempotency_key="k1")
+        self.assertFalse(created)
+        self.assertEqual(again.pk, first.pk)
+        self.assertEqual(self.totals(), (Decimal("25.00"), Decimal("0.00"), 1, 1))
+
+    def test_key_reused_for_different_donation_is_rejected(self):
+        ingest_donation(self.snapshot, "25.00", idempotency_key="k1")
+        with self.assertRaises(IdempotencyConflict):
+            ingest_donation(self.snapshot, "30.00", idempotency_key="k1")
+
+    def test_retry_after_close_must_match_the_original(self):
+        first, _ = ingest_donation(self.snapshot, "25.00", idempotency_key="k1")
+        closed = dataclasses.replace(self.snapshot, end_date=timezone.now() - timedelta(days=1))
+        again, created = ingest_donation(closed, "25.00", idempotency_key="k1")
+        self.assertEqual((again.pk, created), (first.pk, False))
+        with self.assertRaises(IdempotencyConflict):
+            ingest_donation(closed, "30.00", idempotency_key="k1")
+        with self.assertRaisesMessage(DonationRejected, "This campaign has ended."):
+            ingest_donation(closed, "25.00", idempotency_key="k2")
+
+    def test_rules_are_enforced(self):
+        for amount in ("0.50", "5000", "abc", "1.005"):
+            with self.subTest(amount=amount), self.assertRaises(DonationRejected):
+                ingest_donation(self.snapshot, amount)
+        with self.assertRaises(DonationRejected):
+            ingest_donation(self.snapshot, "10", currency="GBP")
+        self.assertFalse(Donation.objects.exists())
+
+    def test_batch_writes_valid_rows_once(self):
+        ingest_donation(self.snapshot, "10.00", idempotency_key="old")
+        rows = [
+            {"amount": "10.00", "idempotency_key": "old"},         # replay of an earlier import
+            {"amount": "20.00", "idempotency_key": "a", "donor": self.user},
+            {"amount": "20.00", "idempotency_key": "a", "donor": self.user},  # repeated in the file
+            {"amount": "99999"},                                   # over the maximum
+            {"amount": "5.00", "currency": "USD"},
+            {"amount": "7.00", "idempotency_key": "old"},          # key clash
+        ]
+        results = ingest_batch(self.snapshot, rows)
+
+        self.assertEqual([r.created for r in results], [False, True, False, False, True, False])
+        self.assertEqual(results[2].donation.pk, results[1].donation.pk)
+        self.assertEqual(results[0].donation.idempotency_key, "old")
+        self.assertIn("Maximum", results[3].error)
+        self.assertIn("different donation", results[5].error)
+        self.assertEqual(Donation.objects.count(), 3)
+        self.assertEqual(self.totals(), (Decimal("30.00"), Decimal("5.00"), 3, 1))
+        self.assertEqual(AuditEvent.objects.filter(kind="donation.create").count(), 3)
+        self.assertEqual(CampaignTotals.objects.rebuild(dry_run=True), [])
+
+    def test_closed_campaign_rejects_batch(self):
+        results = ingest_batch(self.snapshot, [{"amount": "10"}], now=timezone.now() + timedelta(days=400))
+        self.assertEqual(results[0].error, "This campaign has ended.")
+
+    def test_settlement_for_an_ended_campaign_imports_as_of_its_date(self):
+        now = timezone.now()
+        make_open_campaign(self.user, "ended")
+        Campaign.objects.filter(slug="ended").update(start_date=now - timedelta(days=30), end_date=now - timedelta(days=1))
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write("amount,idempotency_key\n10.00,s1\n15.00,s2\n")
+        self.addCleanup(os.remove, f.name)
+
+        err = StringIO()
+        call_command("import_donations", f.name, campaign="ended", stdout=StringIO(), stderr=err)
+        self.assertIn("This campaign has ended.", err.getvalue())
+        self.assertFalse(Donation.objects.exists())
+
+        out = StringIO()
+        as_of = (now - timedelta(days=5)).isoformat()
+        call_command("import_donations", f.name, campaign="ended", as_of=as_of, stdout=out, stderr=err)
+        self.assertIn("Imported 2 donation(s)", out.getvalue())
+        self.assertEqual(Donation.objects.filter(campaign__slug="ended").count(), 2)
+        with self.assertRaises(CommandError):
+            call_command("import_donations", f.name, campaign="ended", as_of="last week", stdout=StringIO())
+
+
+class DonationViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("owner@example.com", "pw")
+        cls.campaign = make_open_campaign(cls.user, "drive")
+
+    def test_double_submit_creates_one_donation(self):
+        url = reverse("donation_app:campaign_donate", args=["drive"])
+        data = {"amount": "50.00", "currency": "INR", "idempotency_key": "form-1"}
+        for _ in range(2):
+            response = self.client.post(url, data)
+            self.assertRedirects(response, "/campaign/drive/?thanks=1", fetch_redirect_response=False)
+        self.assertEqual(Donation.objects.count(), 1)
+
+    def test_rejected_donation_redirects_back_with_message(self):
+        url = reverse("donation_app:campaign_donate", args=["drive"])
+        response = self.client.post(url, {"amount": "1.00", "currency": "INR"})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Donation.objects.exists())
+        self.assertIn("Minimum allowed", [str(m) for m in response.wsgi_request._messages][0])
+
+    def test_form_post_checks_eligibility_once(self):
+        url = reverse("donation_app:campaign_donate", args=["drive"])
+        with mock.patch.object(CampaignSnapshot, "check", autospec=True) as check:
+            self.client.post(url, {"amount": "50.00", "currency": "INR"})
+        self.assertEqual(check.call_count, 1)
+        self.assertEqual(Donation.objects.get().donor_id, None)
 
-# Create your tests here.
+    def test_retry_after_close_is_a_replay(self):
+        url = reverse("donation_app:campaign_donate", args=["drive"])
+        self.client.force_login(self.user)
+        self.client.post(url, {"amount": "50.00", "currency": "INR", "idempotency_key": "form-1"})
+        self.assertEqual(Donation.objects.get().donor, self.user)
+        closed = dataclasses.replace(campaign_snapshot("drive"), end_date=timezone.now() - timedelta(days=1))
+        with mock.patch("donation_app.views.campaign_snapshot", return_value=closed):
+            response = self.client.post(url, {"amount": "50.00", "currency": "INR", "idempotency_key": "form-1"})
+            self.assertRedirects(response, "/campaign/drive/?thanks=1", fetch_redirect_response=False)
+            response = self.client.post(url, {"amount": "60.00", "currency": "INR", "idempotency_key": "form-1"})
+        self.assertIn("different donation", [str(m) for m in response.wsgi_request._messages][0])
+        self.assertEqual(Donation.objects.count(), 1)
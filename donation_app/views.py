@@ -1,32 +1,28 @@
-from django.shortcuts import render
+from django.contrib import messages
+from django.http import Http404
+from django.shortcuts import redirect
 from django.views.generic import FormView
-from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from django.utils import timezone
 
-from campaign.models import Campaign
-from donation_app.models import Donation
+from campaign.models import Visibility
 from . import form
+from campaign.eligibility import DonationRejected, campaign_snapshot
+from .ingest import save_donation
 # Create your views here.
 
 class DonationCreateView(FormView):
+    """
+    Accepts the donation form on the campaign page. The form validates and
+    builds the donation and the idempotent insert lives in
+    donation_app.ingest; the campaign comes from
+    its cached snapshot, so a donation costs no campaign query.
+    """
     form_class = form.DonationForm
-    template_name = "campaigns/donate_inline.html"
-
-    def get_success_url(self):
-        return self.request.META.get("HTTP_REFERER") or self.request.path
-
+    http_method_names = ["post"]
 
     def dispatch(self, request, *args, **kwargs):
-        slug = kwargs.get("slug")
-        now = timezone.now()
-        self.campaign = get_object_or_404(
-            Campaign.objects.filter(
-                visibility="PUBLIC",
-                start_date__lte=now
-            ).filter(Q(end_date__isnull=True) | Q(end_date__gte=now)),
-            slug=slug,
-        )
+        self.campaign = campaign_snapshot(kwargs.get("slug"))
+        if self.campaign is None or self.campaign.visibility != Visibility.PUBLIC:
+            raise Http404
         return super().dispatch(request, *args, **kwargs)
 
     def get_form_kwargs(self):
@@ -35,8 +31,18 @@ class DonationCreateView(FormView):
         return kwargs
 
     def form_valid(self, form):
-        donation: Donation = form.save(commit=False)
-        donation.campaign = self.campaign
-        donation.donor = self.request.user if self.request.user.is_authenticated else None
-        donation.save()
-        return redirect(self.campaign.get_absolute_url() + "?thanks=1")
\ No newline at end of file
+        if form.replayed is None:
+            donation = form.donation
+            donation.donor = self.request.user if self.request.user.is_authenticated else None
+            try:
+                save_donation(donation)
+            except DonationRejected as e:
+                form.add_error(e.field if e.field in form.fields else None, str(e))
+                return self.form_invalid(form)
+        return redirect(self.campaign.get_absolute_url() + "?thanks=1")
+
+    def form_invalid(self, form):
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(self.request, error)
+        return redirect(self.campaign.get_absolute_url())
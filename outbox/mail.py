@@ -0,0 +1,156 @@
+"""
+Outbound email through a database outbox.
+
+    enqueue(subject, body, [user.email], dedupe_key=f"verify-email:{user.pk}")
+
+enqueue() only INSERTs a row, in the caller's transaction: the mail goes
+out if and only if the request's changes commit, and SMTP latency never
+reaches the request. `manage.py send_outbox` (or send_pending()) claims
+due messages in batches and delivers each batch over one connection of
+settings.EMAIL_BACKEND; the console backend works as-is for local runs.
+
+A failed message is retried with exponential backoff (BACKOFF seconds,
+doubling, at most MAX_BACKOFF) and marked FAILED after MAX_ATTEMPTS.
+Claims are leases: if a worker dies mid-batch, its messages become due
+again after LEASE seconds, so delivery is at-least-once.
+
+Configured through settings.OUTBOX:
+    BATCH_SIZE     messages per batch / connection
+    MAX_ATTEMPTS   deliveries tried before a message is FAILED
+    BACKOFF        seconds before the first retry
+    MAX_BACKOFF    cap on the retry delay
+    LEASE          seconds a worker's claim on a batch lasts
+    DEDUPE_WINDOW  seconds a dedupe_key suppresses repeats
+    EAGER          send right after commit, in the request (local development without a
+                   worker; off by default, since it puts SMTP latency back into requests)
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxMessage, OutboxStatus
+
+DEFAULTS = {
+    "BATCH_SIZE": 50,
+    "MAX_ATTEMPTS": 6,
+    "BACKOFF": 30,
+    "MAX_BACKOFF": 3600,
+    "LEASE": 300,
+    "DEDUPE_WINDOW": 300,
+    "EAGER": False,
+}
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, "OUTBOX", {})}
+
+
+def enqueue(subject, body, to, from_email=None, html_body="", dedupe_key=""):
+    """
+    Queue one email. Returns the OutboxMessage, or None if a message with
+    the same `dedupe_key` was queued within DEDUPE_WINDOW seconds.
+    """
+    config = _config()
+    now = timezone.now()
+    if dedupe_key and OutboxMessage.objects.filter(
+        dedupe_key=dedupe_key,
+        created_at__gte=now - timedelta(seconds=config["DEDUPE_WINDOW"]),
+    ).exclude(status=OutboxStatus.FAILED).exists():
+        return None
+    message = OutboxMessage.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        dedupe_key=dedupe_key,
+        created_at=now,
+        next_attempt_at=now,
+    )
+    if config["EAGER"]:
+        transaction.on_commit(lambda: send_pending(ids=[message.pk]))
+    return message
+
+
+def backoff(attempts):
+    config = _config()
+    return timedelta(seconds=min(config["BACKOFF"] * 2 ** (attempts - 1), config["MAX_BACKOFF"]))
+
+
+def claim_batch(batch_size, ids=None):
+    """
+    Lease up to `batch_size` due messages to this worker and return them.
+    """
+    now = timezone.now()
+    due = OutboxMessage.objects.filter(status=OutboxStatus.PENDING, next_attempt_at__lte=now)
+    if ids is not None:
+        due = due.filter(pk__in=ids)
+    candidates = list(due.order_by("next_attempt_at", "id").values_list("pk", flat=True)[:batch_size])
+    if not candidates:
+        return []
+    token = uuid.uuid4().hex
+    # conditional UPDATE: a message another worker claimed in between is no longer due
+    due.filter(pk__in=candidates).update(
+        claim=token, next_attempt_at=now + timedelta(seconds=_config()["LEASE"])
+    )
+    return list(OutboxMessage.objects.filter(claim=token, status=OutboxStatus.PENDING))
+
+
+def send_pending(batch_size=None, ids=None, connection=None):
+    """
+    Deliver one batch of due messages over a single connection.
+    Returns (sent, failed) counts.
+    """
+    config = _config()
+    messages = claim_batch(batch_size or config["BATCH_SIZE"], ids)
+    if not messages:
+        return 0, 0
+
+    connection = connection or get_connection(fail_silently=False)
+    sent, failed = [], []
+    try:
+        connection.open()
+    except Exception as e:
+        # nothing could be sent; every message in the batch counts an attempt
+        failed = [(message, e) for message in messages]
+    else:
+        try:
+            for message in messages:
+                email = EmailMultiAlternatives(
+                    message.subject, message.body, message.from_email, message.to, connection=connection
+                )
+                if message.html_body:
+                    email.attach_alternative(message.html_body, "text/html")
+                try:
+                    email.send()
+                except Exception as e:
+                    failed.append((message, e))
+                else:
+                    sent.append(message)
+        finally:
+            connection.close()
+
+    now = timezone.now()
+    if sent:
+        OutboxMessage.objects.filter(pk__in=[m.pk for m in sent]).update(
+            status=OutboxStatus.SENT, sent_at=now, claim="", attempts=F("attempts") + 1
+        )
+    for message, error in failed:
+        message.attempts += 1
+        message.claim = ""
+        message.last_error = f"{type(error).__name__}: {error}"[:1000]
+        if message.attempts >= config["MAX_ATTEMPTS"]:
+            message.status = OutboxStatus.FAILED
+        else:
+            message.next_attempt_at = now + backoff(message.attempts)
+    if failed:
+        OutboxMessage.objects.bulk_update(
+            [message for message, _ in failed],
+            ["attempts", "claim", "last_error", "status", "next_attempt_at"],
+        )
+    return len(sent), len(failed)
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from outbox.mail import _config, send_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbox emails in batches, one connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Messages per batch (default: OUTBOX['BATCH_SIZE']).")
+        parser.add_argument("--loop", action="store_true", help="Keep running, polling for new messages.")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds to sleep when the queue is empty (--loop).")
+
+    def handle(self, *args, batch_size=None, loop=False, interval=5, **options):
+        batch_size = batch_size or _config()["BATCH_SIZE"]
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_pending(batch_size)
+            total_sent += sent
+            total_failed += failed
+            if failed:
+                self.stderr.write(f"{failed} message(s) failed; they will be retried.")
+            if sent + failed == batch_size:
+                # a full batch: there may be more due right away
+                continue
+            if not loop:
+                break
+            time.sleep(interval)
+        self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} message(s); {total_failed} failed."))
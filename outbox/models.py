@@ -0,0 +1,40 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxStatus(models.TextChoices):
+    PENDING = "PENDING", "Pending"
+    SENT = "SENT", "Sent"
+    FAILED = "FAILED", "Failed"
+
+
+class OutboxMessage(models.Model):
+    """
+    One queued email. Written by outbox.mail.enqueue() in the caller's
+    transaction, delivered by `manage.py send_outbox`.
+    """
+    created_at = models.DateTimeField(default=timezone.now)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    # e.g. "verify-email:<user id>"; repeats within the dedupe window are dropped
+    dedupe_key = models.CharField(max_length=150, blank=True, db_index=True)
+
+    status = models.CharField(max_length=10, choices=OutboxStatus.choices, default=OutboxStatus.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # due time for pending messages; pushed forward while a worker holds the claim
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim = models.CharField(max_length=32, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
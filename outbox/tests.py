@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import CustomUser
+
+from .mail import enqueue, send_pending
+from .models import OutboxMessage, OutboxStatus
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+
+class OutboxTests(TestCase):
+    def test_enqueue_does_not_send(self):
+        enqueue("Hi", "Body", ["a@example.com"])
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxStatus.PENDING)
+
+    @override_settings(EMAIL_BACKEND="outbox.tests.CountingBackend")
+    def test_batch_shares_one_connection(self):
+        CountingBackend.opened = 0
+        for i in range(5):
+            enqueue(f"Hi {i}", "Body", [f"{i}@example.com"], html_body="<p>Body</p>")
+        self.assertEqual(send_pending(batch_size=10), (5, 0))
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+        self.assertFalse(OutboxMessage.objects.exclude(status=OutboxStatus.SENT).exists())
+        self.assertEqual(send_pending(), (0, 0))
+
+    @override_settings(OUTBOX={"BACKOFF": 10, "MAX_ATTEMPTS": 2})
+    def test_failures_back_off_then_give_up(self):
+        message = enqueue("Hi", "Body", ["a@example.com"])
+        with mock.patch.object(EmailBackend, "send_messages", side_effect=OSError("relay down")):
+            self.assertEqual(send_pending(), (0, 1))
+            message.refresh_from_db()
+            self.assertEqual((message.status, message.attempts), (OutboxStatus.PENDING, 1))
+            self.assertGreater(message.next_attempt_at, timezone.now())
+            self.assertIn("relay down", message.last_error)
+            # not due yet
+            self.assertEqual(send_pending(), (0, 0))
+
+            OutboxMessage.objects.filter(pk=message.pk).update(next_attempt_at=timezone.now())
+            send_pending()
+            message.refresh_from_db()
+            self.assertEqual(message.status, OutboxStatus.FAILED)
+
+    def test_claimed_messages_are_skipped_until_the_lease_expires(self):
+        enqueue("Hi", "Body", ["a@example.com"])
+        OutboxMessage.objects.update(claim="other-worker", next_attempt_at=timezone.now() + timezone.timedelta(minutes=5))
+        self.assertEqual(send_pending(), (0, 0))
+
+    def test_dedupe_key_suppresses_repeats(self):
+        self.assertIsNotNone(enqueue("Hi", "Body", ["a@example.com"], dedupe_key="k"))
+        self.assertIsNone(enqueue("Hi", "Body", ["a@example.com"], dedupe_key="k"))
+        OutboxMessage.objects.update(created_at=timezone.now() - timezone.timedelta(hours=1))
+        self.assertIsNotNone(enqueue("Hi", "Body", ["a@example.com"], dedupe_key="k"))
+
+    def test_send_outbox_command(self):
+        for i in range(3):
+            enqueue("Hi", "Body", [f"{i}@example.com"])
+        call_command("send_outbox", "--batch-size", "2", stdout=mock.MagicMock())
+        self.assertEqual(len(mail.outbox), 3)
+
+
+class AccountMailTests(TestCase):
+    def test_repeated_resend_queues_one_verification_mail(self):
+        CustomUser.objects.create_user("new@example.com", "pw")
+        for _ in range(3):
+            self.client.post(reverse("resend_verification"), {"email": "new@example.com"})
+        self.assertEqual(OutboxMessage.objects.filter(dedupe_key__startswith="verify-email:").count(), 1)
+        self.assertEqual(mail.outbox, [])
+
+    def test_password_reset_is_queued(self):
+        CustomUser.objects.create_user("user@example.com", "pw", is_active=True)
+        self.client.post(reverse("password_reset"), {"email": "user@example.com"})
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.to, ["user@example.com"])
+        self.assertIn("password-reset-confirm", message.body + message.html_body)
+        send_pending()
+        self.assertEqual(len(mail.outbox), 1)
@@ -0,0 +1,208 @@
+"""
+Live updates for the request discussion thread.
+
+Writers publish "message" and "status" events once their transaction
+commits. Subscribers are Server-Sent Events streams (see
+RequestEventsView) running on the ASGI event loop; the in-process broker
+hands events to them with call_soon_threadsafe, so publishing from a sync
+view thread is safe.
+
+Streams only run under ASGI (see live_updates_supported). Under WSGI
+Django buffers an async streaming response, so every stream would hold a
+worker thread for MAX_DURATION and send nothing until the end; there the
+page doesn't subscribe and the stream URL answers 204 No Content, which
+also stops the browser from reconnecting.
+
+The broker only reaches streams in the same process. With several
+workers, each stream also polls the database every POLL_INTERVAL seconds
+for messages newer than the last one it sent and for a changed status;
+events are de-duplicated by message id, so both paths can deliver the
+same message without the client seeing it twice.
+
+Configured through settings.REQUEST_EVENTS:
+    POLL_INTERVAL  seconds between database polls (None: broker only, single process)
+    HEARTBEAT      seconds between keep-alive comments when polling is off
+    MAX_DURATION   seconds a stream stays open before the client reconnects
+    RETRY          milliseconds the browser waits before reconnecting
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+
+from .models import Request, RequestMessage
+
+DEFAULTS = {"POLL_INTERVAL": 5, "HEARTBEAT": 15, "MAX_DURATION": 300, "RETRY": 3000}
+POLL_BATCH = 50
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, "REQUEST_EVENTS", {})}
+
+
+def live_updates_supported(request):
+    """
+    Whether `request` is served by ASGI, where an open stream costs no thread.
+    """
+    return isinstance(request, ASGIRequest)
+
+
+class Broker:
+    """
+    In-process pub/sub keyed by request id.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)  # request id -> {(loop, queue)}
+
+    def subscribe(self, request_id):
+        subscription = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        with self._lock:
+            self._subscribers[request_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, request_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(request_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[request_id]
+
+    def publish(self, request_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(request_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # loop already closed; its stream is gone
+                pass
+
+
+def _offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # slow consumer; its next database poll catches it up
+        pass
+
+
+broker = Broker()
+
+
+# -----------------------
+# Events
+# -----------------------
+def message_event(msg):
+    sender = msg.sender
+    return {
+        "type": "message",
+        "id": msg.pk,
+        "sender_id": msg.sender_id,
+        "sender": sender.full_name().strip() or sender.email,
+        "message": msg.message,
+        "sent_at": msg.sent_at.isoformat(),
+    }
+
+
+def status_event(status):
+    return {"type": "status", "status": status}
+
+
+def publish_messages(messages):
+    """
+    Publish freshly created RequestMessage rows once the transaction commits.
+    """
+    # rows without a pk (bulk_create on backends that can't return ids) are left to polling
+    events = [(msg.request_id, message_event(msg)) for msg in messages if msg.pk is not None]
+
+    def send():
+        for request_id, event in events:
+            broker.publish(request_id, event)
+
+    transaction.on_commit(send)
+
+
+def publish_status(request_ids, status):
+    event = status_event(status)
+
+    def send():
+        for request_id in request_ids:
+            broker.publish(request_id, event)
+
+    transaction.on_commit(send)
+
+
+def load_events(request_id, after_id, status):
+    """
+    Events a stream that has seen messages up to `after_id` and `status` is missing.
+    """
+    events = []
+    current = Request.objects.filter(pk=request_id).values_list("status", flat=True).first()
+    if current is not None and current != status:
+        events.append(status_event(current))
+    newer = (
+        RequestMessage.objects.filter(request_id=request_id, pk__gt=after_id)
+        .select_related("sender")
+        .order_by("pk")[:POLL_BATCH]
+    )
+    events.extend(message_event(msg) for msg in newer)
+    return events
+
+
+def format_event(event):
+    lines = []
+    if event["type"] == "message":
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream(request_id, after_id, status):
+    """
+    Async iterator of SSE frames for one client.
+    """
+    config = _config()
+    poll_interval = config["POLL_INTERVAL"]
+    wait = poll_interval or config["HEARTBEAT"]
+    deadline = time.monotonic() + config["MAX_DURATION"]
+    poll = sync_to_async(load_events)
+
+    subscription = broker.subscribe(request_id)
+    _, queue = subscription
+    try:
+        yield f"retry: {config['RETRY']}\n\n"
+        # catch up on anything sent between the page render (or last event) and now
+        pending = await poll(request_id, after_id, status)
+        while True:
+            for event in pending:
+                if event["type"] == "message":
+                    if event["id"] <= after_id:
+                        continue
+                    after_id = event["id"]
+                elif event["status"] == status:
+                    continue
+                else:
+                    status = event["status"]
+                yield format_event(event)
+
+            if time.monotonic() >= deadline:
+                return
+            try:
+                pending = [await asyncio.wait_for(queue.get(), timeout=wait)]
+            except asyncio.TimeoutError:
+                pending = await poll(request_id, after_id, status) if poll_interval else []
+                if not pending:
+                    yield ": keep-alive\n\n"
+    finally:
+        broker.unsubscribe(request_id, subscription)
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-17 20:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('request_app', '0004_rename_massges_requestmessage_message_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='requestmessage',
+            options={'ordering': ['sent_at', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='requestmessage',
+            index=models.Index(fields=['request', 'sent_at'], name='request_app_request_43e37f_idx'),
+        ),
+    ]
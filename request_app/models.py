@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from a_core.utils.pagination import KeysetPaginator
+
 # Create your models here.
 class RequestedFor(models.TextChoices):
     CAMPAIGN = "CAMPAIGN", "Campaign"
@@ -14,12 +16,48 @@ class RequestStatus(models.TextChoices):
     CANCELED = "CANCELED", "Canceled"
     ARCHIVED = "ARCHIVED", "Archived"
 
+class RequestMessageQuerySet(models.QuerySet):
+    def thread_page(self, request_id, cursor=None, per_page=20):
+        """
+        The latest `per_page` messages of a request, oldest first; with
+        `cursor` (a previous page's next_cursor), the ones before that page.
+        Seeks on the (request, sent_at) index, so the cost does not grow
+        with the length of the thread.
+        """
+        paginator = KeysetPaginator(
+            self.filter(request_id=request_id).select_related("sender"),
+            [("sent_at", True)],
+            per_page,
+            signature=f"thread:{request_id}",
+        )
+        page = paginator.page(cursor)
+        page.object_list.reverse()
+        return page
+
+
 class RequestMessage(models.Model):
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT,related_name="sent_messages")
     request=models.ForeignKey('Request', on_delete=models.CASCADE,related_name="messages")
     message = models.CharField(max_length=200)
     sent_at = models.DateTimeField(auto_now_add=True)
 
+    objects = RequestMessageQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["sent_at", "id"]
+        indexes = [
+            models.Index(fields=["request", "sent_at"]),
+        ]
+
+class RequestQuerySet(models.QuerySet):
+    def for_detail(self):
+        """
+        The request with proposer, reviewer and linked campaign (+ category)
+        in one query. The thread is paged separately (RequestMessage.objects.thread_page).
+        """
+        return self.select_related("proposed_by", "reviewed_by", "request_obj__category")
+
+
 class Request(models.Model):
     proposed_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -37,55 +75,45 @@ class Request(models.Model):
     last_updated=models.DateTimeField(auto_now=True)
     requested_for = models.CharField(max_length=20, choices=RequestedFor.choices, default=RequestedFor.CAMPAIGN, db_index=True)
     status = models.CharField(max_length=20, choices=RequestStatus.choices, default=RequestStatus.DRAFT,db_index=True)
+
+    objects = RequestQuerySet.as_manager()
     
     # update status
+    # Each runs as a conditional UPDATE + audit message; see request_app.transitions.
+    def transition(self, name, user):
+        from .transitions import apply_transition
+        return apply_transition(self, name, user)
+
     def approve(self,user):
-        if not self.can_approve(user):
-            raise Exception("You don't have permission to approve this request")
-        RequestMessage.objects.create(request=self,sender=user,message=f"{RequestStatus[self.status]} -> APPROVED")
-        self.status=RequestStatus.APPROVED
-        self.reviewed_by=user
-        self.save()
-        if hasattr(self,'request_obj') and hasattr(self.request_obj,'on_approve'):
-            self.request_obj.on_approve()
+        self.transition("approve", user)
     def reject(self,user):
-        if not self.can_approve(user):
-            raise Exception("You don't have permission to reject this request")
-        RequestMessage.objects.create(request=self,sender=user,message=f"{self.status} -> REJECTED")
-        self.status=RequestStatus.REJECTED
-        self.save()
+        self.transition("reject", user)
     def cancel(self,user):
-        if not self.can_cancel(user):
-            raise Exception("You don't have permission to cancel this request")
-        RequestMessage.objects.create(request=self,sender=user,message=f"{self.status} -> CANCELED")
-        self.status=RequestStatus.CANCELED
-        self.save()
+        self.transition("cancel", user)
     def send_for_review(self,user):
-        if not self.can_send_for_review(user):
-            raise Exception("You don't have permission to send this request for review")
-        RequestMessage.objects.create(request=self,sender=user,message=f"{self.status} -> PENDING_REVIEW")
-        self.status=RequestStatus.PENDING_REVIEW
-        self.save()
+        self.transition("send_for_review", user)
     def send_for_draft(self,user):
-        if not self.can_draft(user):
-            raise Exception("You don't have permission to send this request to draft")
-        RequestMessage.objects.create(request=self,sender=user,message=f"{self.status} -> DRAFT")
-        self.status=RequestStatus.DRAFT
-        self.save()
-    
+        self.transition("send_for_draft", user)
+
+
+    def can(self, name, user):
+        from .transitions import TRANSITIONS
+        return TRANSITIONS[name].permits(user, self.status, self.proposed_by_id)
 
     def can_approve(self, user):
-        return  user.is_approval_user and self.status in (RequestStatus.PENDING_REVIEW)
+        return self.can("approve", user)
     def can_reject(self, user):
-        return  user.is_approval_user and self.status in (RequestStatus.PENDING_REVIEW)
+        return self.can("reject", user)
     def can_cancel(self, user):
-        return  self.proposed_by == user and self.status  in (RequestStatus.PENDING_REVIEW,RequestStatus.DRAFT)
+        return self.can("cancel", user)
+    def can_view_thread(self, user):
+        return user.is_approval_user or self.proposed_by_id == user.pk
     def can_chat(self, user):
-        return (user.is_approval_user or self.proposed_by == user) and self.status  in (RequestStatus.PENDING_REVIEW,RequestStatus.DRAFT)
+        return (user.is_approval_user or self.proposed_by_id == user.pk) and self.status  in (RequestStatus.PENDING_REVIEW,RequestStatus.DRAFT)
     def can_send_for_review(self, user):
-        return self.proposed_by == user and self.status in (RequestStatus.DRAFT)
+        return self.can("send_for_review", user)
     def can_draft(self, user):
-        return self.proposed_by == user and self.status in (RequestStatus.PENDING_REVIEW)
+        return self.can("send_for_draft", user)
     
 
     def is_draft(self):
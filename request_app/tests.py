@@ -1,3 +1,400 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import CustomUser
+from account.principal import principal_for
+from campaign.models import Campaign, CampaignCategory, Visibility
+
+from . import events, transitions
+from .models import Request, RequestMessage, RequestStatus
+from .transitions import TransitionConflict, TransitionNotAllowed, apply_bulk_transition, apply_transition
+
+
+class RequestListQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.approver = CustomUser.objects.create_user(
+            "approver@example.com", "pw", is_email_verified=True, is_approval_user=True
+        )
+        proposer = CustomUser.objects.create_user("owner@example.com", "pw", is_email_verified=True)
+        Request.objects.bulk_create([
+            Request(proposed_by=proposer, reviewed_by=cls.approver, status=RequestStatus.PENDING_REVIEW)
+            for _ in range(60)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.approver)
+        principal_for(self.approver.pk)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        # count, page (session and principal come from the cache)
+        for paging in ("offset", "cursor"):
+            for page_size in (5, 50):
+                with self.subTest(paging=paging, page_size=page_size), self.assertNumQueries(2):
+                    response = self.client.get(
+                        reverse("request_app:list"), {"page_size": page_size, "paging": paging}
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+
+
+class RequestDetailQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.approver = CustomUser.objects.create_user(
+            "approver@example.com", "pw", is_email_verified=True, is_approval_user=True
+        )
+        cls.proposer = CustomUser.objects.create_user("owner@example.com", "pw", is_email_verified=True)
+        cls.request_obj = Request.objects.create(
+            proposed_by=cls.proposer, reviewed_by=cls.approver, status=RequestStatus.PENDING_REVIEW
+        )
+        Campaign.objects.create(
+            title="Detail", slug="detail", request=cls.request_obj, start_date=timezone.now(),
+            category=CampaignCategory.objects.create(name="Health"),
+        )
+
+    def add_messages(self, count):
+        senders = [self.proposer, self.approver]
+        RequestMessage.objects.bulk_create([
+            RequestMessage(request=self.request_obj, sender=senders[i % 2], message=f"message {i}")
+            for i in range(count)
+        ])
+
+    def test_query_count_does_not_depend_on_thread_length(self):
+        url = reverse("request_app:detail", args=[self.request_obj.pk])
+        for user in (self.approver, self.proposer):
+            self.client.force_login(user)
+            principal_for(user.pk)
+            for count in (1, 20):
+                self.add_messages(count)
+                # request + people + campaign, messages + senders
+                with self.subTest(user=user.email, messages=count), self.assertNumQueries(2):
+                    response = self.client.get(url)
+                self.assertContains(response, "message 0")
+
+    def test_allowed_actions_follow_the_transition_table(self):
+        url = reverse("request_app:detail", args=[self.request_obj.pk])
+        self.client.force_login(self.approver)
+        self.assertEqual(
+            self.client.get(url).context["available_options"],
+            {RequestStatus.APPROVED: "Approve", RequestStatus.REJECTED: "Reject"},
+        )
+        self.client.force_login(self.proposer)
+        self.assertEqual(
+            self.client.get(url).context["available_options"],
+            {RequestStatus.CANCELED: "Cancel", RequestStatus.DRAFT: "Draft"},
+        )
+
+    def test_thread_is_paged_from_the_latest_message_back(self):
+        self.add_messages(45)
+        first = RequestMessage.objects.thread_page(self.request_obj.pk, per_page=20)
+        self.assertEqual([m.message for m in first][-1], "message 44")
+        self.assertEqual(len(first), 20)
+
+        self.client.force_login(self.approver)
+        url = reverse("request_app:messages", args=[self.request_obj.pk])
+        seen = [m.message for m in first]
+        cursor = first.next_cursor
+        while cursor:
+            data = self.client.get(url, {"before": cursor}, HTTP_ACCEPT="application/json").json()
+            seen = [m["message"] for m in data["messages"]] + seen
+            cursor = data["older_cursor"]
+        self.assertEqual(seen, [f"message {i}" for i in range(45)])
+
+def run_in_parallel(count, target):
+    """
+    Call target(i) for i in range(count) from `count` threads released at
+    the same moment; returns one result or exception per call.
+    """
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(i):
+        try:
+            barrier.wait()
+            results[i] = target(i)
+        except Exception as exc:
+            results[i] = exc
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.approver = CustomUser.objects.create_user("approver@example.com", "pw", is_approval_user=True)
+        cls.proposer = CustomUser.objects.create_user("owner@example.com", "pw")
+
+    def test_transition_updates_status_and_writes_one_audit_message(self):
+        request_obj = Request.objects.create(proposed_by=self.proposer, status=RequestStatus.PENDING_REVIEW)
+        apply_transition(request_obj, "approve", self.approver)
+        request_obj.refresh_from_db()
+        self.assertEqual(request_obj.status, RequestStatus.APPROVED)
+        self.assertEqual(request_obj.reviewed_by, self.approver)
+        self.assertEqual(
+            list(request_obj.messages.values_list("message", flat=True)), ["PENDING_REVIEW -> APPROVED"]
+        )
+
+    def test_stale_status_is_a_conflict(self):
+        request_obj = Request.objects.create(proposed_by=self.proposer, status=RequestStatus.PENDING_REVIEW)
+        stale = Request.objects.get(pk=request_obj.pk)
+        apply_transition(request_obj, "reject", self.approver)
+        with self.assertRaises(TransitionConflict):
+            apply_transition(stale, "approve", self.approver)
+        self.assertEqual(RequestMessage.objects.filter(request=request_obj).count(), 1)
+
+    def test_wrong_actor_is_not_allowed(self):
+        request_obj = Request.objects.create(proposed_by=self.proposer, status=RequestStatus.PENDING_REVIEW)
+        with self.assertRaises(TransitionNotAllowed):
+            apply_transition(request_obj, "approve", self.proposer)
+        with self.assertRaises(TransitionNotAllowed):
+            apply_transition(request_obj, "cancel", self.approver)
+
+
+class BulkTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.approver = CustomUser.objects.create_user(
+            "approver@example.com", "pw", is_approval_user=True, is_email_verified=True
+        )
+        cls.proposer = CustomUser.objects.create_user("owner@example.com", "pw", is_email_verified=True)
+
+    def setUp(self):
+        principal_for(self.approver.pk)
+
+    def make_requests(self, count, status=RequestStatus.PENDING_REVIEW):
+        requests = [Request.objects.create(proposed_by=self.proposer, status=status) for _ in range(count)]
+        for request_obj in requests:
+            Campaign.objects.create(
+                title=f"Bulk {request_obj.pk}", slug=f"bulk-{request_obj.pk}", request=request_obj,
+                start_date=timezone.now(),
+            )
+        return requests
+
+    def test_results_per_id(self):
+        pending = self.make_requests(2)
+        draft = self.make_requests(1, RequestStatus.DRAFT)[0]
+        results = apply_bulk_transition([pending[0].pk, draft.pk, 999999, pending[1].pk], "approve", self.approver)
+        self.assertEqual(list(results), [pending[0].pk, draft.pk, 999999, pending[1].pk])
+        self.assertIsNone(results[pending[0].pk])
+        self.assertIsNone(results[pending[1].pk])
+        self.assertEqual(results[draft.pk], "Request is DRAFT; it can't be moved to APPROVED.")
+        self.assertEqual(results[999999], "Request not found.")
+
+        results = apply_bulk_transition([p.pk for p in self.make_requests(1)], "approve", self.proposer)
+        self.assertIn("permission", list(results.values())[0])
+
+    def test_one_update_and_bulk_history_per_batch(self):
+        requests = self.make_requests(5)
+        with CaptureQueriesContext(connection) as queries:
+            apply_bulk_transition([r.pk for r in requests], "approve", self.approver)
+        updates = [q["sql"] for q in queries if q["sql"].startswith(f'UPDATE "{Request._meta.db_table}"')]
+        history = [q["sql"] for q in queries if q["sql"].startswith(f'INSERT INTO "{RequestMessage._meta.db_table}"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"status" = ', updates[0].split("WHERE")[1])
+        self.assertEqual(len(history), 1)
+        self.assertEqual(
+            list(RequestMessage.objects.filter(request__in=requests).values_list("message", flat=True)),
+            ["PENDING_REVIEW -> APPROVED"] * 5,
+        )
+        self.assertEqual(set(Request.objects.filter(pk__in=[r.pk for r in requests]).values_list("status", "reviewed_by")),
+                         {(RequestStatus.APPROVED, self.approver.pk)})
+        self.assertEqual(
+            set(Campaign.objects.filter(request__in=requests).values_list("visibility", flat=True)), {Visibility.PUBLIC}
+        )
+
+    def test_one_update_per_source_status(self):
+        requests = self.make_requests(2) + self.make_requests(2, RequestStatus.DRAFT)
+        with CaptureQueriesContext(connection) as queries:
+            results = apply_bulk_transition([r.pk for r in requests], "cancel", self.proposer)
+        self.assertEqual(list(results.values()), [None] * 4)
+        updates = [q for q in queries if q["sql"].startswith(f'UPDATE "{Request._meta.db_table}"')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(
+            list(RequestMessage.objects.filter(request__in=requests).order_by("request").values_list("message", flat=True)),
+            ["PENDING_REVIEW -> CANCELED"] * 2 + ["DRAFT -> CANCELED"] * 2,
+        )
+
+    def test_row_changed_after_the_read_is_skipped(self):
+        requests = self.make_requests(3)
+        changed = requests[1]
+        group_by_status = transitions._group_by_status
+
+        def change_then_group(accepted):
+            # a concurrent reject lands between the permission read and the UPDATE
+            Request.objects.filter(pk=changed.pk).update(status=RequestStatus.REJECTED)
+            return group_by_status(accepted)
+
+        with mock.patch.object(transitions, "_group_by_status", side_effect=change_then_group):
+            results = apply_bulk_transition([r.pk for r in requests], "approve", self.approver)
+        self.assertIsNone(results[requests[0].pk])
+        self.assertIn("changed by someone else", results[changed.pk])
+        self.assertIsNone(results[requests[2].pk])
+        changed.refresh_from_db()
+        self.assertEqual(changed.status, RequestStatus.REJECTED)
+        self.assertFalse(RequestMessage.objects.filter(request=changed).exists())
+        self.assertEqual(Campaign.objects.get(request=changed).visibility, Visibility.PRIVATE)
+        self.assertEqual(Campaign.objects.get(request=requests[0]).visibility, Visibility.PUBLIC)
+
+    def test_view_answers_json_per_id(self):
+        requests = self.make_requests(2)
+        self.client.force_login(self.approver)
+        response = self.client.post(
+            reverse("request_app:bulk_update"),
+            {"action": "approve", "ids": [requests[0].pk, requests[1].pk, "999999", "x"]},
+            HTTP_ACCEPT="application/json",
+        )
+        self.assertEqual(response.json(), {"action": "approve", "results": [
+            {"id": requests[0].pk, "ok": True, "error": None},
+            {"id": requests[1].pk, "ok": True, "error": None},
+            {"id": 999999, "ok": False, "error": "Request not found."},
+        ]})
+
+    def test_view_rejects_unknown_actions_and_redirects_with_a_summary(self):
+        requests = self.make_requests(1) + self.make_requests(1, RequestStatus.DRAFT)
+        self.client.force_login(self.approver)
+        url = reverse("request_app:bulk_update")
+        response = self.client.post(url, {"action": "send_for_review", "ids": [requests[0].pk]},
+                                    HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {"action": "approve", "ids": [r.pk for r in requests]})
+        self.assertRedirects(response, reverse("request_app:list"), fetch_redirect_response=False)
+        self.assertEqual(
+            [str(m) for m in response.wsgi_request._messages],
+            ["Approve: 1 request(s) updated", f"#{requests[1].pk}: Request is DRAFT; it can't be moved to APPROVED."],
+        )
+
+
+class ConcurrentTransitionTests(TransactionTestCase):
+    """
+    Many approvers acting on the same request at once: exactly one wins.
+    """
+    racers = 8
+
+    def setUp(self):
+        self.approvers = [
+            CustomUser.objects.create(email=f"approver{i}@example.com", is_approval_user=True)
+            for i in range(self.racers)
+        ]
+        proposer = CustomUser.objects.create(email="owner@example.com")
+        self.request_obj = Request.objects.create(proposed_by=proposer, status=RequestStatus.PENDING_REVIEW)
+
+    def race(self, actions):
+        # every racer has loaded the request before anyone writes
+        loaded = [Request.objects.get(pk=self.request_obj.pk) for _ in range(self.racers)]
+
+        def act(i):
+            return apply_transition(loaded[i], actions[i % len(actions)], self.approvers[i])
+
+        return run_in_parallel(self.racers, act)
+
+    def assertOneWinner(self, results):
+        winners = [r for r in results if isinstance(r, Request)]
+        losers = [r for r in results if not isinstance(r, Request)]
+        self.assertEqual(len(winners), 1, results)
+        for loser in losers:
+            self.assertIsInstance(loser, TransitionConflict)
+        self.assertEqual(RequestMessage.objects.filter(request=self.request_obj).count(), 1)
+        self.request_obj.refresh_from_db()
+        self.assertEqual(self.request_obj.status, winners[0].status)
+
+    def test_parallel_approvals(self):
+        self.assertOneWinner(self.race(["approve"]))
+
+    def test_parallel_approve_and_reject(self):
+        self.assertOneWinner(self.race(["approve", "reject"]))
+
+
+def parse_frames(body):
+    """
+    [(id, event, data)] of the SSE frames in `body`; comments are dropped.
+    """
+    frames = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in fields:
+            frames.append((fields.get("id"), fields["event"], json.loads(fields["data"])))
+    return frames
+
+
+@override_settings(REQUEST_EVENTS={"POLL_INTERVAL": None, "HEARTBEAT": 0.05, "MAX_DURATION": 0, "RETRY": 1000})
+class RequestEventsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.proposer = CustomUser.objects.create_user("owner@example.com", "pw", is_email_verified=True)
+        cls.request_obj = Request.objects.create(proposed_by=cls.proposer, status=RequestStatus.PENDING_REVIEW)
+        Campaign.objects.create(title="Events", slug="events", request=cls.request_obj, start_date=timezone.now())
+        cls.messages = [
+            RequestMessage.objects.create(request=cls.request_obj, sender=cls.proposer, message=f"message {i}")
+            for i in range(3)
+        ]
+        cls.url = reverse("request_app:events", args=[cls.request_obj.pk])
+
+    async def collect(self, after_id, status=RequestStatus.PENDING_REVIEW):
+        return "".join([frame async for frame in events.stream(self.request_obj.pk, after_id, status)])
+
+    async def test_broker_fans_out_to_every_subscriber_of_the_request(self):
+        first = events.broker.subscribe(1)
+        second = events.broker.subscribe(1)
+        other = events.broker.subscribe(2)
+        try:
+            events.broker.publish(1, {"type": "status", "status": "APPROVED"})
+            await asyncio.sleep(0)
+            for _, queue in (first, second):
+                self.assertEqual(queue.get_nowait(), {"type": "status", "status": "APPROVED"})
+            self.assertTrue(other[1].empty())
+        finally:
+            for request_id, subscription in ((1, first), (1, second), (2, other)):
+                events.broker.unsubscribe(request_id, subscription)
+        self.assertEqual(events.broker._subscribers, {})
+
+    async def test_catch_up_then_terminate(self):
+        body = await self.collect(self.messages[0].pk, status=RequestStatus.DRAFT)
+        self.assertTrue(body.startswith("retry: 1000"))
+        frames = parse_frames(body)
+        self.assertEqual(frames[0][1:], ("status", {"type": "status", "status": RequestStatus.PENDING_REVIEW}))
+        self.assertEqual([int(f[0]) for f in frames[1:]], [m.pk for m in self.messages[1:]])
+        self.assertEqual(events.broker._subscribers, {})
+
+    async def test_broker_events_already_sent_are_skipped(self):
+        with self.settings(REQUEST_EVENTS={"POLL_INTERVAL": None, "HEARTBEAT": 1, "MAX_DURATION": 5}):
+            frames = events.stream(self.request_obj.pk, self.messages[-1].pk, RequestStatus.PENDING_REVIEW)
+            self.assertTrue((await anext(frames)).startswith("retry:"))
+            pending = asyncio.ensure_future(anext(frames))
+            await asyncio.sleep(0.01)
+            # a replay of a message the client has, then a new one
+            old = events.message_event(self.messages[-1])
+            new = {**old, "id": old["id"] + 1, "message": "new"}
+            events.broker.publish(self.request_obj.pk, old)
+            events.broker.publish(self.request_obj.pk, new)
+            frame = await pending
+            await frames.aclose()
+        self.assertEqual(parse_frames(frame), [(str(new["id"]), "message", new)])
+
+    async def test_last_event_id_resumes_after_that_message(self):
+        await self.async_client.aforce_login(self.proposer)
+        response = await self.async_client.get(self.url, headers={"Last-Event-ID": str(self.messages[1].pk)})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual([f[0] for f in parse_frames(body)], [str(self.messages[2].pk)])
+
+    def test_wsgi_does_not_stream(self):
+        self.client.force_login(self.proposer)
+        self.assertEqual(self.client.get(self.url).status_code, 204)
+        detail = self.client.get(reverse("request_app:detail", args=[self.request_obj.pk]))
+        self.assertNotContains(detail, "data-events-url")
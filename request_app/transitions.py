@@ -0,0 +1,233 @@
+"""
+Declarative status transitions for Request.
+
+Every transition runs as one conditional UPDATE
+
+    UPDATE request SET status = <target>, ... WHERE id = <pk> AND status = <expected>
+
+plus one RequestMessage audit row, in a single transaction. `expected` is
+the status the caller saw; if somebody else changed the request in the
+meantime the UPDATE matches no row, nothing is written and the caller gets
+a TransitionConflict instead of silently acting on stale state.
+
+apply_bulk_transition does the same for many requests at once: one locked
+read to check permissions, one conditional UPDATE per source status (the
+same `AND status = <expected>` guard), one bulk INSERT of audit rows.
+
+Both also append a "request.transition" entry to the audit log.
+
+Side effects on the object the request is for (e.g. publishing a campaign
+on approval) are delegated to the related model: if it defines a
+classmethod `on_requests_<transition>(request_ids)`, it is called inside
+the same transaction.
+"""
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.utils import timezone
+
+from audit import log as audit_log
+
+from . import events
+from .models import Request, RequestMessage, RequestStatus
+
+APPROVER = "approver"
+PROPOSER = "proposer"
+
+
+class TransitionError(Exception):
+    pass
+
+
+class TransitionNotAllowed(TransitionError):
+    pass
+
+
+class TransitionConflict(TransitionError):
+    pass
+
+
+@dataclass(frozen=True)
+class Transition:
+    name: str
+    target: str
+    sources: tuple
+    actor: str
+    label: str
+    # record the acting user as Request.reviewed_by
+    sets_reviewer: bool = False
+
+    def permits(self, user, status, proposed_by_id):
+        if status not in self.sources:
+            return False
+        if self.actor == APPROVER:
+            return bool(user.is_approval_user)
+        return proposed_by_id == user.pk
+
+
+TRANSITIONS = {
+    t.name: t for t in (
+        Transition("approve", RequestStatus.APPROVED, (RequestStatus.PENDING_REVIEW,), APPROVER, "Approve",
+                   sets_reviewer=True),
+        Transition("reject", RequestStatus.REJECTED, (RequestStatus.PENDING_REVIEW,), APPROVER, "Reject"),
+        Transition("cancel", RequestStatus.CANCELED, (RequestStatus.PENDING_REVIEW, RequestStatus.DRAFT),
+                   PROPOSER, "Cancel"),
+        Transition("send_for_review", RequestStatus.PENDING_REVIEW, (RequestStatus.DRAFT,), PROPOSER,
+                   "Send for Review"),
+        Transition("send_for_draft", RequestStatus.DRAFT, (RequestStatus.PENDING_REVIEW,), PROPOSER, "Draft"),
+    )
+}
+# The status form posts the target status
+TRANSITIONS_BY_TARGET = {t.target: t for t in TRANSITIONS.values()}
+
+
+def get_transition(name):
+    try:
+        return TRANSITIONS[name]
+    except KeyError:
+        raise TransitionNotAllowed(f"Unknown action {name!r}.")
+
+
+def allowed_transitions(user, status, proposed_by_id):
+    """
+    Transitions `user` may apply to a request in `status` proposed by `proposed_by_id`.
+    """
+    return [t for t in TRANSITIONS.values() if t.permits(user, status, proposed_by_id)]
+
+
+def audit_message(transition, from_status):
+    return f"{from_status} -> {transition.target}"
+
+
+def run_side_effects(transition, request_ids):
+    """
+    Call `<related model>.on_requests_<name>(request_ids)` for every model
+    that hangs off Request and defines it.
+    """
+    for relation in Request._meta.related_objects:
+        if not relation.one_to_one:
+            continue
+        hook = getattr(relation.related_model, f"on_requests_{transition.name}", None)
+        if hook is not None:
+            hook(request_ids)
+
+
+def transition_changes(transition, user):
+    changes = {"status": transition.target, "last_updated": timezone.now()}
+    if transition.sets_reviewer:
+        changes["reviewed_by"] = user
+    return changes
+
+
+def apply_transition(request_obj, name, user):
+    """
+    Move `request_obj` from the status it was loaded with to the target of
+    transition `name`. Updates `request_obj` in place and returns it.
+    """
+    transition = get_transition(name)
+    expected = request_obj.status
+    if not transition.permits(user, expected, request_obj.proposed_by_id):
+        raise TransitionNotAllowed(
+            f"You don't have permission to {transition.label.lower()} this request."
+        )
+
+    changes = transition_changes(transition, user)
+    with transaction.atomic():
+        updated = Request.objects.filter(pk=request_obj.pk, status=expected).update(**changes)
+        if not updated:
+            current = Request.objects.filter(pk=request_obj.pk).values_list("status", flat=True).first()
+            raise TransitionConflict(
+                f"Request #{request_obj.pk} is now {current or 'deleted'}; "
+                f"it was changed by someone else. Reload and try again."
+            )
+        message = RequestMessage.objects.create(
+            request_id=request_obj.pk, sender=user, message=audit_message(transition, expected)
+        )
+        run_side_effects(transition, [request_obj.pk])
+        audit_log.record(
+            "request.transition", request_obj, actor=user,
+            payload={"action": transition.name, "from": expected, "to": transition.target},
+        )
+        events.publish_messages([message])
+        events.publish_status([request_obj.pk], transition.target)
+
+    for field, value in changes.items():
+        setattr(request_obj, field, value)
+    return request_obj
+
+
+def apply_bulk_transition(request_ids, name, user):
+    """
+    Apply transition `name` to every request in `request_ids` that `user`
+    may move. Returns {request id: None on success, else the reason it was skipped}.
+    """
+    transition = get_transition(name)
+    request_ids = list(dict.fromkeys(int(pk) for pk in request_ids))
+    results = {}
+
+    with audit_log.batch():
+        rows = (
+            Request.objects.select_for_update()
+            .filter(pk__in=request_ids)
+            .values_list("pk", "status", "proposed_by_id")
+        )
+        current = {pk: (status, proposed_by_id) for pk, status, proposed_by_id in rows}
+
+        accepted = {}  # pk -> status it is moving from
+        for pk in request_ids:
+            if pk not in current:
+                results[pk] = "Request not found."
+                continue
+            status, proposed_by_id = current[pk]
+            if transition.permits(user, status, proposed_by_id):
+                accepted[pk] = status
+            elif status not in transition.sources:
+                results[pk] = f"Request is {status}; it can't be moved to {transition.target}."
+            else:
+                results[pk] = f"You don't have permission to {transition.label.lower()} this request."
+
+        changes = transition_changes(transition, user)
+        for status, pks in _group_by_status(accepted).items():
+            for pk in _update_from(pks, status, changes):
+                del accepted[pk]
+                results[pk] = "Request was changed by someone else; reload and try again."
+
+        if accepted:
+            audit = RequestMessage.objects.bulk_create([
+                RequestMessage(request_id=pk, sender=user, message=audit_message(transition, status))
+                for pk, status in accepted.items()
+            ])
+            run_side_effects(transition, list(accepted))
+            for pk, status in accepted.items():
+                audit_log.record(
+                    "request.transition", (Request._meta.label, pk), actor=user,
+                    payload={"action": transition.name, "from": status, "to": transition.target},
+                )
+            events.publish_messages(audit)
+            events.publish_status(list(accepted), transition.target)
+
+    results.update(dict.fromkeys(accepted))
+    return {pk: results[pk] for pk in request_ids}
+
+
+def _group_by_status(accepted):
+    groups = {}
+    for pk, status in accepted.items():
+        groups.setdefault(status, []).append(pk)
+    return groups
+
+
+def _update_from(pks, status, changes):
+    """
+    Move `pks`, all expected to be in `status`, with one guarded UPDATE.
+    If some row no longer matches (a database without row locks), redo the
+    group row by row; returns the pks that had changed under us.
+    """
+    try:
+        with transaction.atomic():
+            if Request.objects.filter(pk__in=pks, status=status).update(**changes) == len(pks):
+                return []
+            raise TransitionConflict
+    except TransitionConflict:
+        pass
+    return [pk for pk in pks if not Request.objects.filter(pk=pk, status=status).update(**changes)]
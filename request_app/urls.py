@@ -4,8 +4,11 @@ from . import views
 app_name = "request_app"
 
 urlpatterns = [
+    path("bulk-update/", views.RequestBulkTransitionView.as_view(), name="bulk_update"),
     path("update/<int:pk>/", views.RequestUpdateStatusView.as_view(), name="update"),
     path("add-massage/<int:pk>/", views.RequestMessageCreateView.as_view(), name="add_message"),
     path("<int:pk>/", views.RequestDetailView.as_view(), name="detail"),
+    path("<int:pk>/messages/", views.RequestMessagesView.as_view(), name="messages"),
+    path("<int:pk>/events/", views.RequestEventsView.as_view(), name="events"),
     path("", views.RequestListView.as_view(), name="list"),
 ]
@@ -1,11 +1,18 @@
-from django.shortcuts import render,redirect
+from django.shortcuts import render,redirect,get_object_or_404
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.views import View
 from django.views.generic import DetailView,CreateView,UpdateView,ListView
 from django.db.models import Q
+from django.urls import reverse
 from django.contrib import messages
 from django.utils.decorators import method_decorator
 from account.decorators import email_verification_required
+from a_core.views import CursorPaginationMixin
 
-from . import models,form
+from . import events, models, form
+from .transitions import (
+    TRANSITIONS, TRANSITIONS_BY_TARGET, TransitionConflict, allowed_transitions, apply_bulk_transition,
+)
 
 
 # Create your views here.
@@ -14,28 +21,28 @@ class RequestDetailView(DetailView):
     model = models.Request
     template_name = "request/detail.html"
     context_object_name = "request_obj"
+    thread_page_size = 20
+
+    def get_queryset(self):
+        return models.Request.objects.for_detail()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        request_obj = self.get_object()
-
-        available_options = {}
-        if request_obj.can_approve(self.request.user):
-            available_options['APPROVED'] = 'Approve'
-        if request_obj.can_reject(self.request.user):
-            available_options['REJECTED'] = 'Reject'
-        if request_obj.can_cancel(self.request.user):
-            available_options['CANCELED'] = 'Cancel'
-        if request_obj.can_send_for_review(self.request.user):
-            print("-----------------","can reiwew")
-            available_options['PENDING_REVIEW'] = 'Send for Review'
-        if request_obj.can_draft(self.request.user):
-            available_options['DRAFT'] = 'Draft'
-        context['available_options'] = available_options
-        context['can_chat'] = request_obj.can_chat(self.request.user) 
-        context['req_messages'] = request_obj.messages.all()
-        context['form'] = form.RequestMessageForm(self.request.POST)
+        request_obj = self.object
+        user = self.request.principal
+
+        # allowed actions from ids / flags only; no extra queries
+        context['available_options'] = {
+            t.target: t.label
+            for t in allowed_transitions(user, request_obj.status, request_obj.proposed_by_id)
+        }
+        context['can_chat'] = request_obj.can_chat(user)
+        thread = models.RequestMessage.objects.thread_page(request_obj.pk, per_page=self.thread_page_size)
+        context['req_messages'] = thread.object_list
+        context['older_cursor'] = thread.next_cursor
+        context['form'] = form.RequestMessageForm(self.request.POST or None)
         context['back_url'] = self.request.META.get('HTTP_REFERER') or self.request.path
+        context['live_events'] = events.live_updates_supported(self.request)
         return context
 
 @method_decorator(email_verification_required, name='dispatch')
@@ -45,8 +52,68 @@ class RequestMessageCreateView(CreateView):
 
     def post(self,request,pk,*args,**kwargs):  
         requestMassge=models.RequestMessage.objects.create(sender=request.user,request=models.Request.objects.get(pk=pk),message=request.POST.get('message'))
+        events.publish_messages([requestMassge])
         return redirect('request_app:detail',pk=pk)
 
+@method_decorator(email_verification_required, name='dispatch')
+class RequestMessagesView(View):
+    """
+    Older pages of a request's discussion thread, for "Load older messages".
+    `before` is the cursor from the previous page. Returns the HTML fragment
+    (next cursor in the X-Older-Cursor header), or JSON when asked for it.
+    """
+    http_method_names = ['get']
+    page_size = 20
+
+    def get(self, request, pk, *args, **kwargs):
+        request_obj = get_object_or_404(models.Request.objects.only("proposed_by_id"), pk=pk)
+        if not request_obj.can_view_thread(request.principal):
+            return HttpResponseForbidden()
+
+        page = models.RequestMessage.objects.thread_page(
+            pk, cursor=request.GET.get('before'), per_page=self.page_size
+        )
+        if "application/json" in request.headers.get("Accept", ""):
+            return JsonResponse({
+                "messages": [events.message_event(m) for m in page.object_list],
+                "older_cursor": page.next_cursor,
+            })
+        response = render(request, "request/message_list.html", {"thread_messages": page.object_list})
+        if page.next_cursor:
+            response["X-Older-Cursor"] = page.next_cursor
+        return response
+
+
+class RequestEventsView(View):
+    """
+    Server-Sent Events stream of new messages and status changes for one request.
+    Async, so under ASGI an open stream costs no worker thread.
+    `after` / `status` (or the Last-Event-ID header on reconnect) say what the
+    client already has.
+    """
+    http_method_names = ['get']
+
+    async def get(self, request, pk, *args, **kwargs):
+        if not events.live_updates_supported(request):
+            # WSGI would buffer the whole stream in a worker thread
+            return HttpResponse(status=204)
+        user = await request.auser()
+        if not user.is_authenticated or not user.is_email_verified:
+            return HttpResponseForbidden()
+        request_obj = await models.Request.objects.filter(pk=pk).only("status", "proposed_by_id").afirst()
+        if request_obj is None or not request_obj.can_view_thread(user):
+            return HttpResponseForbidden()
+
+        after = request.headers.get("Last-Event-ID") or request.GET.get("after") or ""
+        status = request.GET.get("status") or request_obj.status
+        response = StreamingHttpResponse(
+            events.stream(pk, int(after) if after.isdigit() else 0, status),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # nginx: don't buffer the stream
+        return response
+
 @method_decorator(email_verification_required, name='dispatch')
 class RequestUpdateStatusView(UpdateView):
     model = models.Request
@@ -58,20 +125,13 @@ class RequestUpdateStatusView(UpdateView):
     def post(self,request,*args,**kwargs):
         try:
             req_object =self.get_object()
-            print(request.POST.get('status'))
-            switcher = {
-                models.RequestStatus.APPROVED: req_object.approve,
-                models.RequestStatus.CANCELED: req_object.cancel,
-                models.RequestStatus.REJECTED: req_object.reject,
-                models.RequestStatus.PENDING_REVIEW: req_object.send_for_review,
-                models.RequestStatus.DRAFT: req_object.send_for_draft
-            }
-            switcher[request.POST.get('status')](request.user)
+            transition = TRANSITIONS_BY_TARGET[request.POST.get('status')]
+            req_object.transition(transition.name, request.user)
             messages.success(request, "Updated successfully")
-        except AttributeError:
-            messages.error(request, "Invalid action")
         except KeyError:
             messages.error(request, "Invalid action")
+        except TransitionConflict as e:
+            messages.warning(request, str(e))
         except Exception as e:
             messages.error(request, str(e))
         return redirect(self.get_success_url())
@@ -87,12 +147,59 @@ class RequestUpdateStatusView(UpdateView):
         return redirect(self.get_success_url())
 
 @method_decorator(email_verification_required, name='dispatch')
-class RequestListView(ListView):
+class RequestBulkTransitionView(View):
+    """
+    Apply one action (approve / reject / cancel) to many requests.
+    POST `action` and one `ids` value per request; answers JSON when asked for it,
+    otherwise redirects back with a summary message.
+    """
+    http_method_names = ['post']
+    actions = ("approve", "reject", "cancel")
+    max_ids = 500
+
+    def post(self, request, *args, **kwargs):
+        action = request.POST.get('action')
+        ids = [pk for pk in request.POST.getlist('ids') if pk.isdigit()]
+        wants_json = "application/json" in request.headers.get("Accept", "")
+
+        if action not in self.actions or not ids or len(ids) > self.max_ids:
+            error = f"Choose an action and between 1 and {self.max_ids} requests."
+            if wants_json:
+                return JsonResponse({"error": error}, status=400)
+            messages.error(request, error)
+            return redirect(self.get_success_url())
+
+        results = apply_bulk_transition(ids, action, request.user)
+
+        if wants_json:
+            return JsonResponse({
+                "action": action,
+                "results": [{"id": pk, "ok": error is None, "error": error} for pk, error in results.items()],
+            })
+
+        done = sum(error is None for error in results.values())
+        failed = {pk: error for pk, error in results.items() if error is not None}
+        if done:
+            messages.success(request, f"{TRANSITIONS[action].label}: {done} request(s) updated")
+        for pk, error in list(failed.items())[:5]:
+            messages.error(request, f"#{pk}: {error}")
+        if len(failed) > 5:
+            messages.error(request, f"...and {len(failed) - 5} more request(s) were skipped")
+        return redirect(self.get_success_url())
+
+    def get_success_url(self):
+        return self.request.META.get('HTTP_REFERER') or reverse('request_app:list')
+
+@method_decorator(email_verification_required, name='dispatch')
+class RequestListView(CursorPaginationMixin, ListView):
     model = models.Request
     template_name = "request/list.html"
     context_object_name = "object_list"  # keeps the same name you used
     paginate_by = 10  # default; we'll override dynamically
-    ordering = "last_updated"  # default sort
+    default_sort = "last_updated"
+    status_choices = models.RequestStatus.values
+    # The approver queue grows without bound; seek instead of OFFSET by default
+    pagination_mode = "cursor"
 
     # Map friendly sort keys to model fields
     SORT_MAP = {
@@ -104,10 +211,7 @@ class RequestListView(ListView):
 
     def get_queryset(self):
         request = self.request
-        q = request.GET.get("q", "").strip()
-        status = request.GET.get("status", "").strip()
-        sort = request.GET.get("sort", self.ordering).strip()
-        direction = request.GET.get("dir", "asc").strip().lower()  # 'asc' or 'desc'
+        state = self.list_state
 
         # Base queryset with select_related/only for efficiency
         qs = (
@@ -116,14 +220,15 @@ class RequestListView(ListView):
                 "requested_for","status","start_date","last_updated","reviewed_by__first_name","reviewed_by__middel_name","reviewed_by__last_name","proposed_by__first_name","proposed_by__middel_name","proposed_by__last_name"
             )
         )
-        if not request.user.is_approval_user:
-            qs = qs.filter(Q(proposed_by=request.user))
+        if not request.principal.is_approval_user:
+            qs = qs.filter(Q(proposed_by_id=request.principal.id))
         else:
             qs = qs.filter(~Q(status=models.RequestStatus.DRAFT))
 
 
         # Search (title, short_description, description, category name, status)
-        if q:
+        if state.q:
+            q = state.q
             qs = qs.filter(
                 Q(proposed_by__first_name__icontains=q)
                 | Q(proposed_by__middel_name__icontains=q)
@@ -138,52 +243,26 @@ class RequestListView(ListView):
             # If you want to include tags (JSONField) and you're on PostgreSQL:
             # qs = qs.filter(Q(tags__icontains=q) | Q(...existing...))
 
-        # Filter by status (ensure values match your CampaignStatus choices)
-        if status:
-            qs = qs.filter(status=status)
+        # Filter by status (validated against RequestStatus)
+        if state.status:
+            qs = qs.filter(status=state.status)
 
-        # Sorting
-        sort_field = self.SORT_MAP.get(sort, self.ordering)
-        if direction == "desc":
-            sort_field = f"-{sort_field}"
-        qs = qs.order_by(sort_field)
-
-        return qs
-
-    def get_paginate_by(self, queryset):
-        """
-        Dynamically determine page size with clamping: 1..100
-        """
-        page_size = self.request.GET.get("page_size", f"{self.paginate_by}")
-        try:
-            page_size = min(max(int(page_size), 1), 100)
-        except ValueError:
-            page_size = self.paginate_by
-        return page_size
+        # Sorting (id tiebreaker keeps the order stable for cursor paging)
+        return self.order_queryset(qs)
 
     def get_context_data(self, **kwargs):
         """
         Add the same context fields you had in your FBV.
         """
         context = super().get_context_data(**kwargs)
-        request = self.request
-
-        q = request.GET.get("q", "").strip()
-        status_value = request.GET.get("status", "").strip()
-        sort = request.GET.get("sort", self.ordering).strip()
-        direction = request.GET.get("dir", "asc").strip().lower()
-
-        # Ensure paginator/page_obj are available (ListView handles this)
-        # But we also expose `paginator` explicitly as you did
+        state = self.list_state
         context.update({
-            "q": q,
-            "status_value": status_value,
-            "sort": sort,
-            "dir": direction,
-            "page_size": self.get_paginate_by(self.get_queryset()),
-            "paginator": context.get("paginator"),
-            "page_obj": context.get("page_obj"),
-            # "object_list" is already provided as per context_object_name
+            "q": state.q,
+            "status_value": state.status,
+            "sort": state.sort,
+            "dir": state.direction,
+            "page_size": state.page_size,
+            # "paginator", "page_obj" and "object_list" come from ListView
         })
         context['RequestStatus']=models.RequestStatus
         return context